@@ -0,0 +1,131 @@
+import asyncio
+import gzip
+import json
+import os
+import re
+import tempfile
+from typing import Dict, Iterator, List, NamedTuple
+from app.config import settings
+from app.blocks import BlockHeader
+
+
+SEGMENT_PATTERN = re.compile(r"^(\d{12})-(\d{12})\.jsonl\.gz$")
+
+
+class Segment(NamedTuple):
+    from_block: int
+    to_block: int
+    path: str
+
+
+class ArchiveGapError(RuntimeError):
+    """归档不连续（缺少区块范围或段无法按需截取），重放必须停在最后一个连续的区块"""
+
+
+class LogArchive:
+    """原始日志和区块头的本地只追加归档
+
+    每个已应用的区块范围写成一个gzip JSONL段文件（文件名为区块范围），
+    每行是一个区块头 {"header": [number, hash, parent_hash, timestamp]}
+    或一条eth_getLogs原始日志 {"log": {...}}。重组回滚时截断分叉点之后的内容。
+    """
+
+    def __init__(self, directory: str = None):
+        self.directory = directory or settings.ARCHIVE_DIR
+        self.segments_written = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _segment_path(self, from_block: int, to_block: int) -> str:
+        return os.path.join(self.directory, f"{from_block:012d}-{to_block:012d}.jsonl.gz")
+
+    def segments(self, from_block: int = None, to_block: int = None) -> List[Segment]:
+        """按区块顺序列出与[from_block, to_block]有交集的段"""
+        segments = []
+        for name in os.listdir(self.directory):
+            match = SEGMENT_PATTERN.match(name)
+            if not match:
+                continue
+            segment = Segment(int(match.group(1)), int(match.group(2)), os.path.join(self.directory, name))
+            if from_block is not None and segment.to_block < from_block:
+                continue
+            if to_block is not None and segment.from_block > to_block:
+                continue
+            segments.append(segment)
+        return sorted(segments)
+
+    def _write(self, from_block: int, to_block: int, logs: list, headers: Dict[int, BlockHeader]):
+        path = self._segment_path(from_block, to_block)
+        # 先写临时文件再原子替换，崩溃时不会留下半个段
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as f:
+            for number in sorted(headers):
+                f.write(json.dumps({"header": list(headers[number])}).encode() + b"\n")
+            for log in logs:
+                f.write(json.dumps({"log": log}, separators=(",", ":")).encode() + b"\n")
+        os.replace(tmp_path, path)
+
+    def read(self, segment: Segment) -> tuple:
+        """读取一个段，返回(原始日志列表, 区块头字典)"""
+        logs = []
+        headers = {}
+        with gzip.open(segment.path, "rb") as f:
+            for line in f:
+                record = json.loads(line)
+                if "log" in record:
+                    logs.append(record["log"])
+                else:
+                    header = BlockHeader(*record["header"])
+                    headers[header.number] = header
+        return logs, headers
+
+    def iter_ranges(self, from_block: int = None, to_block: int = None) -> Iterator[tuple]:
+        """按顺序产出(from_block, to_block, 原始日志, 区块头)，跳过与上一个段重叠的部分
+        
+        遇到缺口或无法截取的段时抛出ArchiveGapError：之前产出的范围都是连续的，
+        检查点不会越过没有重放的区块。
+        """
+        next_block = from_block
+        for segment in self.segments(from_block, to_block):
+            if next_block is not None and segment.to_block < next_block:
+                continue
+            start = segment.from_block if next_block is None else max(segment.from_block, next_block)
+            end = segment.to_block if to_block is None else min(segment.to_block, to_block)
+            if next_block is not None and start > next_block:
+                raise ArchiveGapError(f"Archive gap: blocks {next_block} to {start - 1} are missing")
+            logs, headers = self.read(segment)
+            if (start, end) != (segment.from_block, segment.to_block):
+                logs = [log for log in logs if start <= int(log["blockNumber"], 16) <= end]
+                headers = {number: header for number, header in headers.items() if start <= number <= end}
+            if start not in headers or end not in headers:
+                raise ArchiveGapError(
+                    f"Archive segment {segment.from_block}-{segment.to_block} has no headers for blocks {start}-{end}"
+                )
+            yield start, end, logs, headers
+            next_block = end + 1
+
+    def _truncate_after(self, fork: BlockHeader):
+        for segment in self.segments(from_block=fork.number + 1):
+            if segment.from_block > fork.number:
+                os.remove(segment.path)
+                continue
+            # 跨越分叉点的段：只保留分叉点及之前的内容
+            logs, headers = self.read(segment)
+            logs = [log for log in logs if int(log["blockNumber"], 16) <= fork.number]
+            headers = {number: header for number, header in headers.items() if number <= fork.number}
+            headers[fork.number] = fork
+            self._write(segment.from_block, fork.number, logs, headers)
+            os.remove(segment.path)
+
+    async def append(self, from_block: int, to_block: int, logs: list, headers: Dict[int, BlockHeader]):
+        await asyncio.to_thread(self._write, from_block, to_block, logs, headers)
+        self.segments_written += 1
+
+    async def truncate_after(self, fork: BlockHeader):
+        """重组回滚后删除分叉点之后的归档"""
+        await asyncio.to_thread(self._truncate_after, fork)
+
+    def stats(self) -> dict:
+        return {
+            "directory": self.directory,
+            "segments_written": self.segments_written,
+        }
@@ -0,0 +1,142 @@
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, NamedTuple, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app import crud
+from app.rpc import RPCPool
+
+
+class BlockHeader(NamedTuple):
+    number: int
+    hash: str
+    parent_hash: str
+    timestamp: int
+
+    @property
+    def datetime(self) -> datetime:
+        return datetime.fromtimestamp(self.timestamp)
+
+
+class BlockHeaderService:
+    """区块头服务：批量获取区块头，LRU缓存 + blocks表持久化
+    
+    未确认的区块优先使用newHeads推送的区块头，只有沿parentHash连到最新推送区块的部分才可信，
+    其余（推送缺失、已被重组替换）仍从RPC获取。
+    """
+
+    def __init__(self, rpc: RPCPool, cache_size: int = None, batch_size: int = None):
+        self.rpc = rpc
+        self.cache_size = cache_size or settings.BLOCK_CACHE_SIZE
+        self.batch_size = batch_size or settings.BLOCK_BATCH_SIZE
+        self._cache: "OrderedDict[int, BlockHeader]" = OrderedDict()
+        self._pushed: Dict[int, BlockHeader] = {}
+        self.pushed_hits = 0
+
+    def remember(self, header: BlockHeader):
+        self._cache[header.number] = header
+        self._cache.move_to_end(header.number)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def push(self, header: BlockHeader):
+        """记录newHeads推送的区块头"""
+        # 重组到更短的链时，新head之后的旧推送作废
+        for number in [number for number in self._pushed if number >= header.number]:
+            del self._pushed[number]
+        self._pushed[header.number] = header
+        while len(self._pushed) > self.cache_size:
+            del self._pushed[min(self._pushed)]
+
+    def pushed_chain(self) -> Dict[int, BlockHeader]:
+        """从最新推送的区块头沿parentHash回溯，返回哈希连续的部分"""
+        if not self._pushed:
+            return {}
+        header = self._pushed[max(self._pushed)]
+        chain = {header.number: header}
+        parent = self._pushed.get(header.number - 1)
+        while parent and parent.hash == header.parent_hash:
+            header = parent
+            chain[header.number] = header
+            parent = self._pushed.get(header.number - 1)
+        return chain
+
+    async def fetch_headers(self, block_numbers: Iterable[int]) -> Dict[int, BlockHeader]:
+        """通过JSON-RPC批量请求获取区块头"""
+        numbers = sorted(set(block_numbers))
+        headers = {}
+
+        for i in range(0, len(numbers), self.batch_size):
+            chunk = numbers[i:i + self.batch_size]
+            blocks = await self.rpc.batch([
+                ("eth_getBlockByNumber", [hex(number), False]) for number in chunk
+            ])
+            for number, block in zip(chunk, blocks):
+                if not block:
+                    raise RuntimeError(f"Block {number} not found")
+                header = BlockHeader(
+                    number=int(block["number"], 16),
+                    hash=block["hash"],
+                    parent_hash=block["parentHash"],
+                    timestamp=int(block["timestamp"], 16),
+                )
+                headers[header.number] = header
+
+        return headers
+
+    def forget_after(self, block_number: int):
+        """回滚后丢弃分叉点之后的缓存区块头"""
+        for number in [number for number in self._cache if number > block_number]:
+            del self._cache[number]
+        for number in [number for number in self._pushed if number > block_number]:
+            del self._pushed[number]
+
+    async def get_headers(
+        self,
+        db: AsyncSession,
+        block_numbers: Iterable[int],
+        fresh_after: Optional[int] = None,
+    ) -> Dict[int, BlockHeader]:
+        """获取区块头：依次查询LRU缓存、blocks表、RPC
+        
+        高于fresh_after的区块（尚未确认，可能被重组）不读缓存和blocks表，
+        使用哈希连续的推送区块头，否则从RPC重新获取。
+        """
+        headers = {}
+        missing = set()
+        pushed = []
+        chain = self.pushed_chain() if fresh_after is not None else {}
+        for number in set(block_numbers):
+            if fresh_after is not None and number > fresh_after:
+                if number in chain:
+                    headers[number] = chain[number]
+                    pushed.append(chain[number])
+                else:
+                    missing.add(number)
+                continue
+            header = self._cache.get(number)
+            if header:
+                self._cache.move_to_end(number)
+                headers[number] = header
+            else:
+                missing.add(number)
+
+        stored = {number for number in missing if fresh_after is None or number <= fresh_after}
+        if stored:
+            for block in await crud.get_blocks(db, stored):
+                header = BlockHeader(block.number, block.hash, block.parent_hash, block.timestamp)
+                headers[header.number] = header
+                self.remember(header)
+                missing.discard(header.number)
+
+        fetched = await self.fetch_headers(missing) if missing else {}
+        self.pushed_hits += len(pushed)
+        new_headers = pushed + list(fetched.values())
+        if new_headers:
+            # 与RPC获取的一样写入blocks表，供重组检测使用
+            await crud.save_blocks(db, [header._asdict() for header in new_headers])
+            for header in new_headers:
+                headers[header.number] = header
+                self.remember(header)
+
+        return headers
@@ -0,0 +1,300 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy.ext.asyncio import AsyncConnection
+from app.database import engine
+from app.config import settings
+from app import metrics
+
+# 数据库触发器（V9迁移）在nfts变更提交后发送的通知频道
+INVALIDATION_CHANNEL = "nft_cache"
+
+# 不带分类/拥有者/创作者筛选的列表，任何NFT变更都可能影响
+ALL_LISTS_TAG = "nfts:all"
+
+
+def make_key(endpoint: str, params: dict) -> str:
+    """按规范化的查询参数生成缓存键：去掉空参数、地址小写、参数排序"""
+    normalized = {}
+    for name, value in params.items():
+        if value is None:
+            continue
+        if name in ("owner", "creator") and isinstance(value, str):
+            value = value.lower()
+        normalized[name] = value
+    return f"{endpoint}:{json.dumps(normalized, sort_keys=True, separators=(',', ':'), default=str)}"
+
+
+def token_tag(token_id: int) -> str:
+    return f"token:{token_id}"
+
+
+def list_tags(category: Optional[str] = None, owner: Optional[str] = None, creator: Optional[str] = None) -> List[str]:
+    """列表缓存的失效标签
+
+    列表中的NFT在变更前或变更后一定属于筛选的分类/拥有者/创作者，
+    所以这些标签足以覆盖；没有这类筛选的列表用ALL_LISTS_TAG。
+    """
+    tags = []
+    if category:
+        tags.append(f"category:{category}")
+    if owner:
+        tags.append(f"owner:{owner.lower()}")
+    if creator:
+        tags.append(f"creator:{creator.lower()}")
+    return tags or [ALL_LISTS_TAG]
+
+
+def tags_from_notification(payload: dict) -> Optional[List[str]]:
+    """把触发器的通知转换为失效标签，返回None表示全部失效"""
+    if payload.get("all"):
+        return None
+    tags = [ALL_LISTS_TAG]
+    tags += [token_tag(token_id) for token_id in payload.get("tokens") or []]
+    tags += [f"category:{category}" for category in payload.get("categories") or []]
+    tags += [f"owner:{owner.lower()}" for owner in payload.get("owners") or []]
+    tags += [f"creator:{creator.lower()}" for creator in payload.get("creators") or []]
+    return tags
+
+
+class MemoryBackend:
+    """进程内LRU + TTL缓存，按标签索引缓存键"""
+
+    def __init__(self, max_entries: int = None):
+        self.max_entries = max_entries or settings.CACHE_MAX_ENTRIES
+        # 缓存键 → (过期时间, 响应, 标签)
+        self._entries: "OrderedDict[str, Tuple[float, bytes, Tuple[str, ...]]]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    async def set(self, key: str, value: bytes, tags: Iterable[str], ttl: int):
+        self._remove(key)
+        tags = tuple(tags)
+        self._entries[key] = (time.monotonic() + ttl, value, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    async def invalidate(self, tags: Iterable[str]) -> int:
+        keys = set()
+        for tag in tags:
+            keys |= self._tags.get(tag, set())
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    async def clear(self) -> int:
+        count = len(self._entries)
+        self._entries.clear()
+        self._tags.clear()
+        return count
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisBackend:
+    """多个API进程共享的Redis缓存：响应用SET EX保存，标签用集合记录缓存键
+
+    容量由TTL和Redis的maxmemory淘汰策略限制。
+    """
+
+    def __init__(self, url: str, prefix: str = "nftcache:"):
+        # 只有配置了CACHE_REDIS_URL才需要redis包
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.prefix}tag:{tag}"
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes, tags: Iterable[str], ttl: int):
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.set(self.prefix + key, value, ex=ttl)
+            for tag in tags:
+                pipe.sadd(self._tag_key(tag), self.prefix + key)
+                pipe.expire(self._tag_key(tag), ttl)
+            await pipe.execute()
+
+    async def invalidate(self, tags: Iterable[str]) -> int:
+        tag_keys = [self._tag_key(tag) for tag in tags]
+        async with self.client.pipeline(transaction=False) as pipe:
+            for tag_key in tag_keys:
+                pipe.smembers(tag_key)
+            members = await pipe.execute()
+        keys = set().union(*members) if members else set()
+        if tag_keys:
+            await self.client.delete(*keys, *tag_keys)
+        return len(keys)
+
+    async def clear(self) -> int:
+        keys = [key async for key in self.client.scan_iter(match=f"{self.prefix}*")]
+        if keys:
+            await self.client.delete(*keys)
+        return len(keys)
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class ResponseCache:
+    """读穿透的API响应缓存：缓存序列化后的JSON，按标签精确失效"""
+
+    def __init__(self, backend=None, ttl: int = None, enabled: bool = None):
+        self.enabled = settings.CACHE_ENABLED if enabled is None else enabled
+        if backend is None:
+            backend = RedisBackend(settings.CACHE_REDIS_URL) if settings.CACHE_REDIS_URL else MemoryBackend()
+        self.backend = backend
+        self.ttl = ttl or settings.CACHE_TTL
+        # 每次失效递增：查询期间发生过失效时不写入缓存，避免缓存失效前读到的旧数据
+        self.generation = 0
+
+    async def get_or_load(
+        self,
+        endpoint: str,
+        key: str,
+        tags: Iterable[str],
+        loader: Callable[[], Awaitable[bytes]],
+    ) -> bytes:
+        if not self.enabled:
+            return await loader()
+
+        try:
+            cached = await self.backend.get(key)
+        except Exception as e:
+            print(f"⚠️  Response cache get failed: {e}")
+            cached = None
+        if cached is not None:
+            metrics.RESPONSE_CACHE_LOOKUPS.inc(endpoint=endpoint, result="hit")
+            return cached
+
+        metrics.RESPONSE_CACHE_LOOKUPS.inc(endpoint=endpoint, result="miss")
+        generation = self.generation
+        value = await loader()
+        if generation == self.generation:
+            try:
+                await self.backend.set(key, value, tags, self.ttl)
+            except Exception as e:
+                print(f"⚠️  Response cache set failed: {e}")
+        return value
+
+    async def invalidate(self, tags: Optional[Iterable[str]]) -> int:
+        """按标签失效，tags为None时全部失效"""
+        self.generation += 1
+        if tags is None:
+            count = await self.backend.clear()
+        else:
+            count = await self.backend.invalidate(tags)
+        metrics.RESPONSE_CACHE_INVALIDATIONS.inc(count)
+        return count
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "backend": type(self.backend).__name__,
+            "ttl": self.ttl,
+            "entries": len(self.backend) if isinstance(self.backend, MemoryBackend) else None,
+            "generation": self.generation,
+        }
+
+
+class CacheInvalidationListener:
+    """在专用连接上LISTEN触发器的通知并失效缓存
+
+    连接断开期间可能漏掉通知，重连后清空整个缓存。
+    """
+
+    def __init__(self, cache: ResponseCache, poll_interval: float = None):
+        self.cache = cache
+        self.poll_interval = poll_interval or settings.LEADER_POLL_INTERVAL
+        self.notifications = 0
+        self._conn: Optional[AsyncConnection] = None
+        self._driver_conn = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _on_notify(self, connection, pid, channel, payload: str):
+        self.notifications += 1
+        try:
+            tags = tags_from_notification(json.loads(payload))
+        except (ValueError, AttributeError):
+            tags = None
+        task = asyncio.create_task(self._invalidate(tags))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _invalidate(self, tags: Optional[List[str]]):
+        try:
+            await self.cache.invalidate(tags)
+        except Exception as e:
+            print(f"⚠️  Cache invalidation failed: {e}")
+
+    async def _listen(self):
+        conn = await engine.connect()
+        self._conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        raw = await self._conn.get_raw_connection()
+        self._driver_conn = raw.driver_connection
+        await self._driver_conn.add_listener(INVALIDATION_CHANNEL, self._on_notify)
+        # 连接建立前的变更没有收到通知
+        await self.cache.invalidate(None)
+        print(f"👂 Listening for cache invalidations on '{INVALIDATION_CHANNEL}'")
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            await self._conn.exec_driver_sql("SELECT 1")
+
+    async def close(self):
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        driver_conn, self._driver_conn = self._driver_conn, None
+        try:
+            # 连接会回到连接池，先移除监听
+            if driver_conn is not None:
+                await driver_conn.remove_listener(INVALIDATION_CHANNEL, self._on_notify)
+            await conn.close()
+        except Exception:
+            await conn.invalidate()
+
+    async def run(self):
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  Cache invalidation listener error: {e}")
+            finally:
+                await self.close()
+            await asyncio.sleep(self.poll_interval)
+
+
+response_cache = ResponseCache()
+metrics.RESPONSE_CACHE_ENTRIES.set_function(
+    lambda: len(response_cache.backend) if isinstance(response_cache.backend, MemoryBackend) else None
+)
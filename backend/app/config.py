@@ -9,20 +9,103 @@ class Settings(BaseSettings):
     # Blockchain
     CONTRACT_ADDRESS: str
     RPC_URL: str
+    RPC_URLS: str = ""  # 逗号分隔的备用RPC节点，与RPC_URL组成节点池
+    RPC_HEDGE_DELAY: float = 2.0  # getLogs超过该时间未返回时对冲到第二个节点
+    RPC_QUARANTINE_THRESHOLD: int = 3  # 连续失败多少次后隔离节点
+    RPC_QUARANTINE_SECONDS: int = 60
     CHAIN_ID: int
+    WS_RPC_URL: str = ""  # WebSocket RPC地址，配置后通过newHeads订阅跟随最新区块
+    HEAD_RECONNECT_MAX_BACKOFF: int = 60
+    RPC_MAX_CONCURRENCY: int = 4  # 同时进行的RPC请求上限
+    RPC_TIMEOUT: float = 30.0
+    RPC_BATCH_WINDOW: float = 0.005  # 收集并发请求合并成批量请求的时间窗口（秒），0表示不合并
+    RPC_MAX_BATCH_SIZE: int = 50
+    RPC_THROTTLE_RETRIES: int = 5  # 所有节点都限流时getLogs的退避重试次数
+    RPC_THROTTLE_BACKOFF: float = 1.0  # 限流退避基数（秒），每次翻倍
+    RPC_THROTTLE_BACKOFF_MAX: float = 30.0
     
     # IPFS
     IPFS_GATEWAY: str = "https://gateway.pinata.cloud/ipfs/"
+    IPFS_GATEWAYS: str = ""  # 逗号分隔的备用网关列表（按优先级），为空时只用IPFS_GATEWAY
+    GATEWAY_RACE_DELAY: float = 1.0  # 网关未在该时间内返回时启动下一个网关
+    METADATA_CACHE_DIR: str = ".cache/metadata"
+    METADATA_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    
+    # 元数据补全队列
+    METADATA_CONCURRENCY: int = 8  # 同时进行的元数据请求上限
+    METADATA_TIMEOUT: float = 10.0
+    METADATA_BATCH_SIZE: int = 50
+    METADATA_POLL_INTERVAL: int = 5
+    METADATA_MAX_ATTEMPTS: int = 8
+    METADATA_RETRY_BASE: int = 30  # 重试退避基数（秒），每次失败翻倍
+    METADATA_RETRY_MAX: int = 3600
+    GATEWAY_FAILURE_THRESHOLD: int = 5  # 网关连续失败多少次后熔断
+    GATEWAY_COOLDOWN: int = 60  # 熔断持续时间（秒）
     
     # API
     API_HOST: str = "0.0.0.0"
     API_PORT: int = 8000
     CORS_ORIGINS: str = "http://localhost:5173,http://localhost:5174"
     
+    # API响应缓存（由数据库触发器的NOTIFY按token/分类/拥有者失效）
+    CACHE_ENABLED: bool = True
+    CACHE_TTL: int = 30  # 秒，漏掉失效通知时的兜底
+    CACHE_MAX_ENTRIES: int = 10000  # 进程内缓存的条数上限（LRU淘汰）
+    CACHE_REDIS_URL: str = ""  # 配置后多个API进程共享Redis缓存（需要安装redis包）
+    
     # Indexer
     INDEXER_START_BLOCK: int = 0
     INDEXER_INTERVAL: int = 5
-    MAX_BLOCK_RANGE: int = 50
+    # getLogs区块范围（AIMD自适应：从INITIAL开始，在MIN和MAX之间调整）
+    INITIAL_BLOCK_RANGE: int = 50
+    MIN_BLOCK_RANGE: int = 1
+    MAX_BLOCK_RANGE: int = 2000
+    BLOCK_RANGE_INCREASE: int = 50
+    BLOCK_RANGE_TARGET_LOGS: int = 1000  # 单次结果数低于该值才扩大窗口
+    BLOCK_RANGE_TARGET_SECONDS: float = 5.0  # 单次耗时低于该值才扩大窗口
+    # 链重组
+    CONFIRMATIONS: int = 64  # 确认深度，更新的数据标记为pending
+    REORG_MAX_DEPTH: int = 256  # 向前查找分叉点的最大区块数
+    
+    # 并行分片回填
+    BACKFILL_WORKERS: int = 4
+    BACKFILL_SHARD_SIZE: int = 2000
+    BACKFILL_RETRIES: int = 3
+    BACKFILL_LAG_THRESHOLD: int = 20000  # 落后超过该区块数时自动回填
+    BLOCK_CACHE_SIZE: int = 10000  # 区块头LRU缓存条数
+    BLOCK_BATCH_SIZE: int = 100  # 每个JSON-RPC批量请求的区块头数量
+    
+    # 索引流水线（获取日志 → 解码 → 区块头 → 有序写库）
+    PIPELINE_QUEUE_SIZE: int = 4  # 每个阶段输出队列的长度，满时上游阻塞
+    PIPELINE_FETCH_WORKERS: int = 2
+    PIPELINE_DECODE_WORKERS: int = 1
+    PIPELINE_HEADER_WORKERS: int = 2
+    
+    # 后台任务与选主
+    RUN_INDEXER: bool = True  # API进程内是否运行索引器等后台任务（独立运行worker.py时设为false）
+    INDEXER_LOCK_ID: int = 724001  # 索引器选主使用的advisory lock id
+    LEADER_POLL_INTERVAL: float = 5.0  # 备用实例抢锁/主节点心跳间隔（秒）
+    METRICS_PORT: int = 9100  # 独立worker提供/metrics的端口，0表示不提供
+    
+    # 原始日志归档（为空时不归档），用于离线重放重建数据库
+    ARCHIVE_DIR: str = ""
+    
+    # 链上状态对账
+    MULTICALL3_ADDRESS: str = "0xcA11bde05977b3631167028862bE2a173976CA11"
+    RECONCILE_BATCH_SIZE: int = 1000  # 每次Multicall3聚合的token数
+    RECONCILE_INTERVAL: int = 0  # 定期对账间隔（秒），0表示不定期运行
+    
+    @property
+    def rpc_urls_list(self) -> List[str]:
+        urls = [self.RPC_URL] + [url.strip() for url in self.RPC_URLS.split(",") if url.strip()]
+        return list(dict.fromkeys(urls))
+    
+    @property
+    def ipfs_gateways_list(self) -> List[str]:
+        gateways = [self.IPFS_GATEWAY]
+        gateways += [gateway.strip() for gateway in self.IPFS_GATEWAYS.split(",") if gateway.strip()]
+        # 去重并保持顺序，网关地址统一以/结尾
+        return list(dict.fromkeys(gateway.rstrip("/") + "/" for gateway in gateways))
     
     @property
     def cors_origins_list(self) -> List[str]:
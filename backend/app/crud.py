@@ -1,10 +1,13 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_, desc
+from sqlalchemy import select, update, delete, bindparam, tuple_, func, or_
 from sqlalchemy.sql import Select
-from typing import Optional, List
-from app.models import NFT, Transaction, IndexerState
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import Optional, List, Iterable, Dict
+from app.models import NFT, Transaction, IndexerState, Block, MetadataTask, MarketStats, LegacyLogIndex
 from app.schemas import NFTCreate, NFTUpdate, TransactionCreate
+from app import pagination
 from decimal import Decimal
+from datetime import datetime, timedelta
 
 
 # NFT CRUD操作
@@ -40,6 +43,41 @@ async def update_nft(db: AsyncSession, token_id: int, nft_update: NFTUpdate) ->
     return db_nft
 
 
+# 列表可用的排序列
+NFT_SORT_COLUMNS = {
+    "created_at": NFT.created_at,
+    "price": NFT.price,
+    "token_id": NFT.token_id,
+}
+
+
+def _like_pattern(text: str) -> str:
+    """转义LIKE通配符，用户输入按字面匹配"""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_condition(search: str, mode: str = "substring") -> tuple:
+    """返回(过滤条件, 相关度表达式)
+
+    fulltext: 名称/分类/描述全文检索（search_vector的GIN索引），按ts_rank_cd排序
+    substring: 名称或描述包含关键字（三元组GIN索引）
+    prefix: 名称以关键字开头，用于自动补全
+    """
+    if mode == "fulltext":
+        ts_query = func.websearch_to_tsquery("simple", search)
+        return NFT.search_vector.op("@@")(ts_query), func.ts_rank_cd(NFT.search_vector, ts_query)
+
+    pattern = _like_pattern(search)
+    if mode == "prefix":
+        return NFT.name.ilike(f"{pattern}%", escape="\\"), func.similarity(NFT.name, search)
+
+    condition = or_(
+        NFT.name.ilike(f"%{pattern}%", escape="\\"),
+        NFT.description.ilike(f"%{pattern}%", escape="\\"),
+    )
+    return condition, func.similarity(NFT.name, search)
+
+
 async def get_nfts(
     db: AsyncSession,
     skip: int = 0,
@@ -51,7 +89,16 @@ async def get_nfts(
     search: Optional[str] = None,
     sort_by: str = "created_at",
     sort_order: str = "desc",
-) -> tuple[List[NFT], int]:
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    search_mode: str = "substring",
+) -> tuple[List[NFT], Optional[int], Optional[str]]:
+    """返回(本页NFT, 总数, 下一页游标)
+    
+    传入cursor时按(排序列, id)做keyset分页，代价与翻到第几页无关；
+    否则兼容旧的skip/limit。include_total为False时不执行count(*)。
+    sort_by="relevance"按搜索相关度排序，只支持skip分页。
+    """
     # 构建查询
     query = select(NFT).where(NFT.is_burned == False)
     
@@ -68,44 +115,55 @@ async def get_nfts(
     if creator:
         query = query.where(NFT.creator == creator.lower())
     
+    relevance = None
     if search:
-        search_pattern = f"%{search}%"
-        query = query.where(
-            or_(
-                NFT.name.ilike(search_pattern),
-                NFT.description.ilike(search_pattern)
-            )
-        )
+        condition, relevance = search_condition(search, search_mode)
+        query = query.where(condition)
     
-    # 计算总数
-    count_query = select(func.count()).select_from(query.subquery())
-    total_result = await db.execute(count_query)
-    total = total_result.scalar()
+    # 相关度依赖查询词，没有可做keyset的索引顺序；没有查询词时按创建时间排序
+    if sort_by == "relevance" and cursor:
+        raise pagination.InvalidCursor("Cursor pagination is not supported for relevance sort")
+    if sort_by == "relevance" and relevance is None:
+        sort_by = "created_at"
     
-    # 排序
-    if sort_by == "price":
-        if sort_order == "asc":
-            query = query.order_by(NFT.price.asc().nulls_last())
-        else:
-            query = query.order_by(NFT.price.desc().nulls_last())
-    elif sort_by == "token_id":
-        if sort_order == "asc":
-            query = query.order_by(NFT.token_id.asc())
-        else:
-            query = query.order_by(NFT.token_id.desc())
-    else:  # created_at
-        if sort_order == "asc":
-            query = query.order_by(NFT.created_at.asc())
-        else:
-            query = query.order_by(NFT.created_at.desc())
+    column = NFT_SORT_COLUMNS.get(sort_by, NFT.created_at)
+    descending = sort_order != "asc"
+    nullable = column is NFT.price
+    
+    # 先解析游标：无效游标不应执行任何查询（包括count）
+    keyset = None
+    if cursor:
+        keyset = pagination.decode_cursor(cursor, f"{sort_by}:{sort_order}", column)
+    
+    # 计算总数（可选）
+    total = None
+    if include_total:
+        count_query = select(func.count()).select_from(query.subquery())
+        total_result = await db.execute(count_query)
+        total = total_result.scalar()
+    
+    if sort_by == "relevance":
+        query = query.order_by(relevance.desc(), NFT.id.desc()).offset(skip).limit(limit)
+        result = await db.execute(query)
+        return list(result.scalars().all()), total, None
+    
+    # 排序：排序列 + id作为唯一的次序键，保证翻页稳定
+    query = query.order_by(*pagination.order_by(column, NFT.id, descending, nullable))
     
     # 分页
-    query = query.offset(skip).limit(limit)
+    if keyset:
+        value, row_id = keyset
+        query = query.where(pagination.keyset_condition(column, NFT.id, value, row_id, descending, nullable))
+    else:
+        query = query.offset(skip)
+    query = query.limit(limit + 1)
     
     result = await db.execute(query)
-    nfts = result.scalars().all()
+    nfts, next_cursor = pagination.next_cursor(
+        list(result.scalars().all()), limit, f"{sort_by}:{sort_order}", column.key
+    )
     
-    return list(nfts), total
+    return nfts, total, next_cursor
 
 
 # Transaction CRUD操作
@@ -131,7 +189,10 @@ async def get_transactions(
     token_id: Optional[int] = None,
     tx_type: Optional[str] = None,
     address: Optional[str] = None,
-) -> tuple[List[Transaction], int]:
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+) -> tuple[List[Transaction], Optional[int], Optional[str]]:
+    """返回(本页交易, 总数, 下一页游标)，分页方式同get_nfts，按时间倒序"""
     query = select(Transaction)
     
     # 筛选条件
@@ -150,65 +211,63 @@ async def get_transactions(
             )
         )
     
-    # 计算总数
-    count_query = select(func.count()).select_from(query.subquery())
-    total_result = await db.execute(count_query)
-    total = total_result.scalar()
+    # 与get_nfts相同：先解析游标再执行查询
+    keyset = None
+    if cursor:
+        keyset = pagination.decode_cursor(cursor, "timestamp:desc", Transaction.timestamp)
+    
+    # 计算总数（可选）
+    total = None
+    if include_total:
+        count_query = select(func.count()).select_from(query.subquery())
+        total_result = await db.execute(count_query)
+        total = total_result.scalar()
     
     # 排序和分页
-    query = query.order_by(desc(Transaction.timestamp)).offset(skip).limit(limit)
+    query = query.order_by(*pagination.order_by(Transaction.timestamp, Transaction.id, descending=True))
+    if keyset:
+        value, row_id = keyset
+        query = query.where(
+            pagination.keyset_condition(Transaction.timestamp, Transaction.id, value, row_id, descending=True)
+        )
+    else:
+        query = query.offset(skip)
+    query = query.limit(limit + 1)
     
     result = await db.execute(query)
-    transactions = result.scalars().all()
+    transactions, next_cursor = pagination.next_cursor(
+        list(result.scalars().all()), limit, "timestamp:desc", "timestamp"
+    )
     
-    return list(transactions), total
+    return transactions, total, next_cursor
 
 
 # 统计数据
 async def get_stats(db: AsyncSession) -> dict:
-    # 总NFT数量（未销毁）
-    total_nfts_result = await db.execute(
-        select(func.count(NFT.id)).where(NFT.is_burned == False)
-    )
-    total_nfts = total_nfts_result.scalar()
-    
-    # 在售NFT数量
-    total_listed_result = await db.execute(
-        select(func.count(NFT.id)).where(
-            and_(NFT.is_listed == True, NFT.is_burned == False)
-        )
-    )
-    total_listed = total_listed_result.scalar()
-    
-    # 总销售数量
-    total_sold_result = await db.execute(
-        select(func.count(Transaction.id)).where(Transaction.tx_type == "buy")
-    )
-    total_sold = total_sold_result.scalar()
-    
-    # 总交易量
-    total_volume_result = await db.execute(
-        select(func.sum(Transaction.price)).where(Transaction.tx_type == "buy")
-    )
-    total_volume = total_volume_result.scalar() or 0
-    
-    # 地板价
-    floor_price_result = await db.execute(
-        select(func.min(NFT.price)).where(
-            and_(NFT.is_listed == True, NFT.is_burned == False)
-        )
-    )
-    floor_price = floor_price_result.scalar()
+    """读取由触发器维护的market_stats汇总行，不扫描nfts/transactions"""
+    result = await db.execute(select(MarketStats).where(MarketStats.id == 1))
+    stats = result.scalar_one_or_none()
+    if stats is None:
+        # 汇总行尚未初始化
+        await refresh_market_stats(db)
+        result = await db.execute(select(MarketStats).where(MarketStats.id == 1))
+        stats = result.scalar_one()
     
     return {
-        "total_nfts": total_nfts,
-        "total_listed": total_listed,
-        "total_sold": total_sold,
-        "total_volume": str(total_volume),
-        "floor_price": str(floor_price) if floor_price else None,
+        "total_nfts": stats.total_nfts,
+        "total_listed": stats.total_listed,
+        "total_sold": stats.total_sold,
+        "total_volume": str(stats.total_volume),
+        "floor_price": str(stats.floor_price) if stats.floor_price else None,
     }
 
 
+async def refresh_market_stats(db: AsyncSession) -> None:
+    """全量重算market_stats（增量维护出现偏差时使用）"""
+    await db.execute(select(func.refresh_market_stats()))
+    await db.commit()
+
+
 # Indexer状态
 async def get_indexer_state(db: AsyncSession) -> Optional[IndexerState]:
     result = await db.execute(select(IndexerState).where(IndexerState.id == 1))
@@ -228,3 +287,448 @@ async def update_indexer_state(db: AsyncSession, last_block: int) -> IndexerStat
     await db.commit()
     await db.refresh(state)
     return state
+
+
+# 多行INSERT每条语句的行数上限（asyncpg单条语句最多32767个参数）
+INSERT_CHUNK_SIZE = 1000
+
+
+def _chunks(rows: List[dict], size: int = INSERT_CHUNK_SIZE):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+# 随事件变化的NFT列（铸造时确定的列和元数据不会被事件覆盖）
+NFT_STATE_COLUMNS = (
+    "owner",
+    "is_listed",
+    "price",
+    "seller",
+    "is_burned",
+    "last_event_block",
+    "last_event_log_index",
+    "is_final",
+)
+
+
+async def write_indexed_range(
+    db: AsyncSession,
+    nfts: List[dict],
+    nft_changes: Dict[int, dict],
+    transactions: List[dict],
+    last_block: int,
+    last_hash: Optional[str] = None,
+    final_block: Optional[int] = None,
+) -> None:
+    """在一个事务中批量写入一个区块范围的索引结果并推进检查点
+    
+    nfts是本范围内铸造的NFT（已合并后续变化的最终行），
+    nft_changes是已存在NFT合并后的变更字段，每个token只写一次。
+    所有写入都是幂等的，任意区块范围都可以安全地重新索引。
+    高于final_block（未达到确认深度）的行标记为pending（is_final=False）。
+    """
+    if transactions:
+        blocks = [tx["block_number"] for tx in transactions]
+        await ensure_no_legacy_log_index(db, min(blocks), max(blocks))
+    
+    if final_block is None:
+        final_block = last_block
+    nfts = [
+        {**nft, "is_final": nft["last_event_block"] <= final_block}
+        for nft in nfts
+    ]
+    nft_changes = {
+        token_id: {**changes, "is_final": changes["last_event_block"] <= final_block}
+        for token_id, changes in nft_changes.items()
+    }
+    transactions = [
+        {**tx, "is_final": tx["block_number"] <= final_block}
+        for tx in transactions
+    ]
+    
+    # 新铸造的NFT：分块多行upsert，已存在时只在事件更新时才覆盖状态
+    for chunk in _chunks(nfts):
+        stmt = pg_insert(NFT).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[NFT.token_id],
+            set_={
+                column: getattr(stmt.excluded, column)
+                for column in NFT_STATE_COLUMNS
+            },
+            where=tuple_(NFT.last_event_block, NFT.last_event_log_index)
+            < tuple_(stmt.excluded.last_event_block, stmt.excluded.last_event_log_index),
+        )
+        await db.execute(stmt)
+        
+        # 新铸造的NFT进入元数据队列，由MetadataEnricher异步补全
+        await db.execute(
+            pg_insert(MetadataTask)
+            .values([{"token_id": nft["token_id"], "token_uri": nft["token_uri"]} for nft in chunk])
+            .on_conflict_do_nothing(index_elements=[MetadataTask.token_id])
+        )
+    
+    # 已存在的NFT：按变更的列组合分组，每组一次executemany
+    groups: Dict[tuple, List[dict]] = {}
+    for token_id, changes in nft_changes.items():
+        params = {"b_token_id": token_id}
+        params.update({f"b_{column}": value for column, value in changes.items()})
+        groups.setdefault(tuple(sorted(changes)), []).append(params)
+    
+    conn = await db.connection()
+    for columns, params in groups.items():
+        stmt = (
+            update(NFT)
+            .where(
+                NFT.token_id == bindparam("b_token_id"),
+                tuple_(NFT.last_event_block, NFT.last_event_log_index)
+                < tuple_(bindparam("b_last_event_block"), bindparam("b_last_event_log_index")),
+            )
+            .values({column: bindparam(f"b_{column}") for column in columns})
+        )
+        await conn.execute(stmt, params)
+    
+    # 交易记录：以(tx_hash, log_index)为自然键，重复写入直接忽略
+    for chunk in _chunks(transactions):
+        await db.execute(
+            pg_insert(Transaction)
+            .values(chunk)
+            .on_conflict_do_nothing(index_elements=[Transaction.tx_hash, Transaction.log_index])
+        )
+    
+    # 达到确认深度的pending行转为final
+    await finalize_rows(db, final_block)
+    
+    # 检查点（同时记录该区块哈希，用于检测重组）
+    await _set_checkpoint(db, last_block, last_hash)
+    
+    await db.commit()
+
+
+class LegacyLogIndexError(RuntimeError):
+    """区块范围内还有log_index未核实的旧交易记录，重新索引会产生重复行"""
+
+
+async def ensure_no_legacy_log_index(db: AsyncSession, from_block: int, to_block: int) -> None:
+    result = await db.execute(
+        select(func.min(LegacyLogIndex.block_number), func.max(LegacyLogIndex.block_number))
+        .where(LegacyLogIndex.block_number.between(from_block, to_block))
+    )
+    first, last = result.one()
+    if first is not None:
+        raise LegacyLogIndexError(
+            f"Blocks {first}-{last} contain transactions written before log_index was recorded; "
+            f"run repair_log_index.py before re-indexing them"
+        )
+
+
+async def get_legacy_log_index_span(db: AsyncSession) -> Optional[tuple]:
+    """log_index待核实的旧交易记录所在的区块区间，没有时返回None"""
+    result = await db.execute(
+        select(func.min(LegacyLogIndex.block_number), func.max(LegacyLogIndex.block_number))
+    )
+    first, last = result.one()
+    return None if first is None else (first, last)
+
+
+async def repair_legacy_log_index(db: AsyncSession, from_block: int, to_block: int, events: List[dict]) -> dict:
+    """按链上日志修正区块范围内旧交易记录的log_index
+    
+    events是该范围内全部市场事件的(tx_hash, tx_type, log_index)。
+    V3之前tx_hash唯一，每笔交易最多一条旧记录，按交易类型对应到链上事件；
+    重新索引已经写入了同一事件时删除旧行（触发器同步扣减market_stats）。
+    链上找不到对应事件的行保留待核实，需要人工处理。
+    """
+    by_tx: Dict[str, Dict[str, int]] = {}
+    for event in events:
+        by_tx.setdefault(event["tx_hash"], {}).setdefault(event["tx_type"], event["log_index"])
+    
+    result = await db.execute(
+        select(Transaction)
+        .join(LegacyLogIndex, LegacyLogIndex.transaction_id == Transaction.id)
+        .where(LegacyLogIndex.block_number.between(from_block, to_block))
+    )
+    legacy = list(result.scalars().all())
+    report = {"fixed": 0, "deduplicated": 0, "unmatched": 0}
+    if not legacy:
+        return report
+    legacy_ids = {tx.id for tx in legacy}
+    
+    result = await db.execute(
+        select(Transaction.tx_hash, Transaction.log_index)
+        .where(Transaction.tx_hash.in_({tx.tx_hash for tx in legacy}))
+        .where(Transaction.id.notin_(legacy_ids))
+    )
+    indexed = set(result.all())
+    
+    duplicates = []
+    resolved = []
+    for tx in legacy:
+        log_index = by_tx.get(tx.tx_hash, {}).get(tx.tx_type)
+        if log_index is None:
+            report["unmatched"] += 1
+        elif (tx.tx_hash, log_index) in indexed:
+            duplicates.append(tx.id)
+            report["deduplicated"] += 1
+        else:
+            if tx.log_index != log_index:
+                tx.log_index = log_index
+                report["fixed"] += 1
+            resolved.append(tx.id)
+    
+    await db.flush()
+    if duplicates:
+        # 级联删除legacy_log_index中的记录
+        await db.execute(delete(Transaction).where(Transaction.id.in_(duplicates)))
+    if resolved:
+        await db.execute(delete(LegacyLogIndex).where(LegacyLogIndex.transaction_id.in_(resolved)))
+    await db.commit()
+    return report
+
+
+async def _set_checkpoint(db: AsyncSession, last_block: int, last_hash: Optional[str]) -> None:
+    stmt = pg_insert(IndexerState).values(id=1, last_indexed_block=last_block, last_indexed_hash=last_hash)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[IndexerState.id],
+        set_={
+            "last_indexed_block": stmt.excluded.last_indexed_block,
+            "last_indexed_hash": stmt.excluded.last_indexed_hash,
+        },
+    )
+    await db.execute(stmt)
+
+
+async def finalize_rows(db: AsyncSession, final_block: int) -> None:
+    """把final_block及之前的pending交易和NFT标记为final"""
+    await db.execute(
+        update(Transaction)
+        .where(Transaction.is_final == False, Transaction.block_number <= final_block)
+        .values(is_final=True)
+    )
+    await db.execute(
+        update(NFT)
+        .where(NFT.is_final == False, NFT.last_event_block <= final_block)
+        .values(is_final=True)
+    )
+
+
+def fold_nft_state(transactions: List[Transaction]) -> Optional[dict]:
+    """按链上顺序重放一个token的交易记录，得到NFT的状态列；没有铸造记录时返回None"""
+    state = None
+    for tx in transactions:
+        if tx.tx_type == "mint":
+            state = {"owner": tx.to_address, "is_listed": False, "price": None, "seller": None, "is_burned": False}
+        elif state is None:
+            continue
+        elif tx.tx_type == "list":
+            state.update(is_listed=True, price=tx.price, seller=tx.from_address)
+        elif tx.tx_type == "buy":
+            state.update(owner=tx.from_address, is_listed=False, price=None, seller=None)
+        elif tx.tx_type == "cancel":
+            state.update(is_listed=False, price=None, seller=None)
+        elif tx.tx_type == "burn":
+            state.update(is_burned=True, is_listed=False, price=None, seller=None)
+        state.update(last_event_block=tx.block_number, last_event_log_index=tx.log_index)
+    return state
+
+
+async def rollback_to_block(db: AsyncSession, fork_block: int, fork_hash: str, final_block: int) -> List[int]:
+    """链重组回滚：删除分叉点之后的交易和区块头，并由剩余交易重新计算受影响的NFT
+    
+    只有铸造交易本身被回滚的NFT才会删除。铸造早于索引起点（或由对账插入）的NFT
+    无法由交易记录重算，保留该行并返回其token，由调用方按分叉点的链上状态对账修复。
+    """
+    result = await db.execute(
+        select(Transaction.token_id, Transaction.tx_type).where(Transaction.block_number > fork_block)
+    )
+    rolled_back = result.all()
+    token_ids = sorted({row.token_id for row in rolled_back})
+    minted = {row.token_id for row in rolled_back if row.tx_type == "mint"}
+    unresolved = []
+    
+    await db.execute(delete(Transaction).where(Transaction.block_number > fork_block))
+    await db.execute(delete(Block).where(Block.number > fork_block))
+    
+    if token_ids:
+        result = await db.execute(
+            select(Transaction)
+            .where(Transaction.token_id.in_(token_ids))
+            .order_by(Transaction.token_id, Transaction.block_number, Transaction.log_index)
+        )
+        history: Dict[int, List[Transaction]] = {token_id: [] for token_id in token_ids}
+        for tx in result.scalars().all():
+            history[tx.token_id].append(tx)
+        
+        for token_id, transactions in history.items():
+            state = fold_nft_state(transactions)
+            if state is None:
+                if token_id in minted:
+                    # 铸造本身被回滚
+                    await db.execute(delete(NFT).where(NFT.token_id == token_id))
+                    await db.execute(delete(MetadataTask).where(MetadataTask.token_id == token_id))
+                else:
+                    # 没有铸造记录：保留该行，位置退回分叉点，使新分支的事件和对账修复都能覆盖
+                    await db.execute(
+                        update(NFT)
+                        .where(NFT.token_id == token_id)
+                        .values(last_event_block=fork_block, last_event_log_index=0)
+                    )
+                    unresolved.append(token_id)
+                continue
+            state["is_final"] = state["last_event_block"] <= final_block
+            await db.execute(update(NFT).where(NFT.token_id == token_id).values(**state))
+    
+    await _set_checkpoint(db, fork_block, fork_hash)
+    await db.commit()
+    return unresolved
+
+
+# 链上状态对账
+# 对账修复记为该区块内最后的位置，只有之后的事件才能再覆盖
+RECONCILE_LOG_INDEX = 2 ** 31 - 1
+
+
+async def get_nfts_by_token_ids(db: AsyncSession, token_ids: Iterable[int]) -> List[NFT]:
+    result = await db.execute(
+        select(NFT).where(NFT.token_id.in_(list(token_ids)))
+    )
+    return list(result.scalars().all())
+
+
+async def repair_nfts(db: AsyncSession, repairs: Dict[int, dict], missing: List[dict], block: int) -> None:
+    """按区块block的链上状态修复NFT
+
+    repairs是已存在NFT需要修复的列，missing是数据库中缺失的NFT（插入并加入元数据队列）。
+    索引器已写入更新事件的行不会被覆盖。
+    """
+    position = {"last_event_block": block, "last_event_log_index": RECONCILE_LOG_INDEX, "is_final": True}
+
+    if missing:
+        rows = [
+            {"name": f"NFT #{nft['token_id']}", "description": "", "image_url": "", **nft, **position}
+            for nft in missing
+        ]
+        await db.execute(
+            pg_insert(NFT).values(rows).on_conflict_do_nothing(index_elements=[NFT.token_id])
+        )
+        await db.execute(
+            pg_insert(MetadataTask)
+            .values([{"token_id": nft["token_id"], "token_uri": nft["token_uri"]} for nft in missing])
+            .on_conflict_do_nothing(index_elements=[MetadataTask.token_id])
+        )
+
+    # 与write_indexed_range相同：按修复的列组合分组executemany
+    groups: Dict[tuple, List[dict]] = {}
+    for token_id, changes in repairs.items():
+        changes = {**changes, **position}
+        params = {"b_token_id": token_id}
+        params.update({f"b_{column}": value for column, value in changes.items()})
+        groups.setdefault(tuple(sorted(changes)), []).append(params)
+
+    conn = await db.connection()
+    for columns, params in groups.items():
+        stmt = (
+            update(NFT)
+            .where(
+                NFT.token_id == bindparam("b_token_id"),
+                tuple_(NFT.last_event_block, NFT.last_event_log_index)
+                < tuple_(bindparam("b_last_event_block"), bindparam("b_last_event_log_index")),
+            )
+            .values({column: bindparam(f"b_{column}") for column in columns})
+        )
+        await conn.execute(stmt, params)
+
+    await db.commit()
+
+
+# 元数据队列
+async def claim_metadata_tasks(db: AsyncSession, limit: int, lease_seconds: int) -> List[MetadataTask]:
+    """领取到期的元数据任务，并把下次执行时间推后作为租约（多个实例互不冲突）"""
+    due = (
+        select(MetadataTask.token_id)
+        .where(
+            MetadataTask.status == "pending",
+            MetadataTask.next_attempt_at <= func.now(),
+        )
+        .order_by(MetadataTask.next_attempt_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(
+        update(MetadataTask)
+        .where(MetadataTask.token_id.in_(due))
+        .values(next_attempt_at=func.now() + timedelta(seconds=lease_seconds))
+        .returning(MetadataTask)
+        .execution_options(synchronize_session=False)
+    )
+    tasks = list(result.scalars().all())
+    await db.commit()
+    return tasks
+
+
+async def complete_metadata_task(db: AsyncSession, token_id: int, name: str, description: str, image_url: str) -> None:
+    await db.execute(
+        update(NFT)
+        .where(NFT.token_id == token_id)
+        .values(name=name, description=description, image_url=image_url)
+    )
+    await db.execute(
+        update(MetadataTask)
+        .where(MetadataTask.token_id == token_id)
+        .values(status="done", last_error=None)
+    )
+    await db.commit()
+
+
+async def retry_metadata_task(
+    db: AsyncSession,
+    token_id: int,
+    next_attempt_at: datetime,
+    error: Optional[str] = None,
+    count_attempt: bool = True,
+    give_up: bool = False,
+) -> None:
+    values = {"next_attempt_at": next_attempt_at, "last_error": error}
+    if count_attempt:
+        values["attempts"] = MetadataTask.attempts + 1
+    if give_up:
+        values["status"] = "failed"
+    await db.execute(
+        update(MetadataTask).where(MetadataTask.token_id == token_id).values(**values)
+    )
+    await db.commit()
+
+
+# 区块头缓存
+async def get_blocks(db: AsyncSession, block_numbers: Iterable[int]) -> List[Block]:
+    result = await db.execute(
+        select(Block).where(Block.number.in_(list(block_numbers)))
+    )
+    return list(result.scalars().all())
+
+
+async def get_blocks_between(db: AsyncSession, from_block: int, to_block: int) -> List[Block]:
+    """获取区块范围内已记录的区块头（按区块号降序）"""
+    result = await db.execute(
+        select(Block)
+        .where(Block.number >= from_block, Block.number <= to_block)
+        .order_by(Block.number.desc())
+    )
+    return list(result.scalars().all())
+
+
+async def save_blocks(db: AsyncSession, blocks: List[dict]) -> None:
+    if not blocks:
+        return
+    
+    for chunk in _chunks(blocks):
+        stmt = pg_insert(Block).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Block.number],
+            set_={
+                "hash": stmt.excluded.hash,
+                "parent_hash": stmt.excluded.parent_hash,
+                "timestamp": stmt.excluded.timestamp,
+            },
+        )
+        await db.execute(stmt)
+    await db.commit()
@@ -0,0 +1,117 @@
+from typing import Callable, Dict, Iterable, Optional
+from eth_utils import event_abi_to_log_topic
+
+
+class EventRecord:
+    """解码后的市场事件（紧凑记录，地址和哈希均为小写十六进制字符串）"""
+
+    __slots__ = ("name", "args", "block_number", "log_index", "tx_hash", "block_hash")
+
+    def __init__(self, name: str, args: dict, block_number: int, log_index: int, tx_hash: str, block_hash: str):
+        self.name = name
+        self.args = args
+        self.block_number = block_number
+        self.log_index = log_index
+        self.tx_hash = tx_hash
+        self.block_hash = block_hash
+
+    def __repr__(self):
+        return f"EventRecord({self.name}, block={self.block_number}, log={self.log_index}, args={self.args})"
+
+
+# 从32字节的word中取值
+def _uint(word: bytes):
+    return int.from_bytes(word, "big")
+
+
+def _address(word: bytes):
+    return "0x" + word[12:].hex()
+
+
+def _bool(word: bytes):
+    return word[-1] == 1
+
+
+STATIC_TYPES = {
+    "uint256": _uint,
+    "uint8": _uint,
+    "address": _address,
+    "bool": _bool,
+}
+
+
+def _topic_value(abi_type: str) -> Callable[[str], object]:
+    """indexed参数直接从topic的十六进制字符串取值"""
+    if abi_type.startswith("uint"):
+        return lambda topic: int(topic, 16)
+    if abi_type == "address":
+        return lambda topic: "0x" + topic[-40:].lower()
+    if abi_type == "bool":
+        return lambda topic: topic[-1] == "1"
+    raise ValueError(f"Unsupported indexed type {abi_type}")
+
+
+def compile_event_decoder(event_abi: dict) -> Callable[[dict], EventRecord]:
+    """按事件ABI生成专用解码函数：预先算好每个参数在topics/data中的位置"""
+    name = event_abi["name"]
+    topic_fields = []  # (参数名, topics下标, 取值函数)
+    data_fields = []  # (参数名, data中的word下标, 取值函数或None表示动态string/bytes)
+    for param in event_abi["inputs"]:
+        if param["indexed"]:
+            topic_fields.append((param["name"], len(topic_fields) + 1, _topic_value(param["type"])))
+        elif param["type"] in STATIC_TYPES:
+            data_fields.append((param["name"], len(data_fields), STATIC_TYPES[param["type"]]))
+        elif param["type"] in ("string", "bytes"):
+            data_fields.append((param["name"], len(data_fields), param["type"]))
+        else:
+            raise ValueError(f"Unsupported type {param['type']} in event {name}")
+
+    def decode(log: dict) -> EventRecord:
+        topics = log["topics"]
+        data = bytes.fromhex(log["data"][2:])
+        args = {}
+        for field, index, convert in topic_fields:
+            args[field] = convert(topics[index])
+        for field, index, convert in data_fields:
+            word = data[index * 32:index * 32 + 32]
+            if isinstance(convert, str):
+                # 动态类型：word是偏移量，偏移处先是长度再是内容
+                offset = int.from_bytes(word, "big")
+                length = int.from_bytes(data[offset:offset + 32], "big")
+                value = data[offset + 32:offset + 32 + length]
+                args[field] = value.decode("utf-8", errors="replace") if convert == "string" else value
+            else:
+                args[field] = convert(word)
+        return EventRecord(
+            name,
+            args,
+            int(log["blockNumber"], 16),
+            int(log["logIndex"], 16),
+            log["transactionHash"],
+            log["blockHash"],
+        )
+
+    return decode
+
+
+class LogDecoder:
+    """topic0 → 专用解码函数，直接处理eth_getLogs返回的原始JSON"""
+
+    def __init__(self, abi: list, event_names: Iterable[str]):
+        self.decoders: Dict[str, Callable[[dict], EventRecord]] = {}
+        events = {item["name"]: item for item in abi if item.get("type") == "event"}
+        for event_name in event_names:
+            event_abi = events[event_name]
+            topic = "0x" + event_abi_to_log_topic(event_abi).hex()
+            self.decoders[topic] = compile_event_decoder(event_abi)
+
+    @property
+    def topics(self) -> list:
+        return list(self.decoders)
+
+    def decode(self, log: dict) -> Optional[EventRecord]:
+        """解码单条日志；不认识的事件或已被移除的日志返回None"""
+        if not log["topics"] or log.get("removed"):
+            return None
+        decoder = self.decoders.get(log["topics"][0].lower())
+        return decoder(log) if decoder else None
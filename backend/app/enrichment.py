@@ -0,0 +1,240 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse
+from app.database import AsyncSessionLocal
+from app.config import settings
+from app import crud, metrics
+from app.metadata_cache import MetadataCache, LatencyStats, ipfs_content_key
+import httpx
+
+
+class GatewayUnavailable(Exception):
+    """网关处于熔断状态"""
+
+
+class CircuitBreaker:
+    """按网关熔断：连续失败达到阈值后暂停请求一段时间"""
+
+    def __init__(self, threshold: int = None, cooldown: int = None):
+        self.threshold = threshold or settings.GATEWAY_FAILURE_THRESHOLD
+        self.cooldown = cooldown or settings.GATEWAY_COOLDOWN
+        self._failures = {}
+        self._open_until = {}
+
+    def is_open(self, gateway: str) -> bool:
+        return self._open_until.get(gateway, 0) > time.monotonic()
+
+    def record_success(self, gateway: str):
+        self._failures.pop(gateway, None)
+        self._open_until.pop(gateway, None)
+
+    def record_failure(self, gateway: str):
+        failures = self._failures.get(gateway, 0) + 1
+        self._failures[gateway] = failures
+        if failures >= self.threshold:
+            self._open_until[gateway] = time.monotonic() + self.cooldown
+            print(f"🔌 Gateway {gateway} circuit open for {self.cooldown}s")
+
+
+class MetadataEnricher:
+    """元数据补全：从metadata_queue领取任务，并发获取元数据并回填nfts表"""
+
+    def __init__(self, gateways: list = None, cache: MetadataCache = None):
+        # 按优先级排列的IPFS网关
+        self.gateways = gateways or settings.ipfs_gateways_list
+        self.ipfs_gateway = self.gateways[0]
+        self.concurrency = settings.METADATA_CONCURRENCY
+        self.breaker = CircuitBreaker()
+        self.cache = cache or MetadataCache()
+        self.latency = LatencyStats()
+        self.failures = 0
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        # 所有任务共享一个连接池
+        self._client = httpx.AsyncClient(
+            timeout=settings.METADATA_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=self.concurrency),
+        )
+
+    async def close(self):
+        await self._client.aclose()
+
+    def to_http_url(self, uri: str) -> str:
+        """转换IPFS URL"""
+        if uri.startswith("ipfs://"):
+            return uri.replace("ipfs://", self.ipfs_gateway)
+        return uri
+
+    async def fetch_url(self, http_url: str) -> bytes:
+        """请求单个地址，结果计入对应网关的熔断统计"""
+        gateway = urlparse(http_url).netloc
+        if self.breaker.is_open(gateway):
+            raise GatewayUnavailable(gateway)
+
+        try:
+            async with self._semaphore:
+                response = await self._client.get(http_url)
+            response.raise_for_status()
+        except Exception:
+            self.breaker.record_failure(gateway)
+            raise
+
+        self.breaker.record_success(gateway)
+        return response.content
+
+    async def fetch_from_gateways(self, key: str) -> bytes:
+        """按顺序错开启动各网关请求，取最先成功的结果"""
+        gateways = [
+            gateway for gateway in self.gateways
+            if not self.breaker.is_open(urlparse(gateway).netloc)
+        ]
+        if not gateways:
+            raise GatewayUnavailable("all gateways")
+
+        tasks = []
+        errors = []
+        try:
+            for gateway in gateways:
+                tasks.append(asyncio.create_task(self.fetch_url(gateway + key)))
+                # 当前网关在错开时间内没有返回，再启动下一个
+                done, _ = await asyncio.wait(tasks, timeout=settings.GATEWAY_RACE_DELAY)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    errors.append(task.exception())
+                    tasks.remove(task)
+
+            while tasks:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    errors.append(task.exception())
+                    tasks.remove(task)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        raise errors[-1]
+
+    async def fetch_metadata(self, token_uri: str) -> dict:
+        """获取NFT元数据：IPFS内容先查本地缓存，未命中时在多个网关间竞速"""
+        key = ipfs_content_key(token_uri)
+        if key:
+            content = await self.cache.get(key)
+            metrics.METADATA_CACHE_LOOKUPS.inc(result="miss" if content is None else "hit")
+            if content is not None:
+                return json.loads(content)
+
+        started = time.monotonic()
+        try:
+            if key:
+                content = await self.fetch_from_gateways(key)
+            else:
+                content = await self.fetch_url(token_uri)
+            metadata = json.loads(content)
+        except GatewayUnavailable:
+            metrics.METADATA_FETCH_FAILURES.inc(reason="circuit_open")
+            raise
+        except Exception as e:
+            self.failures += 1
+            metrics.METADATA_FETCH_FAILURES.inc(reason=type(e).__name__)
+            raise
+        elapsed = time.monotonic() - started
+        self.latency.record(elapsed)
+        metrics.METADATA_FETCH_LATENCY.observe(elapsed)
+
+        # IPFS内容不可变，可以永久缓存；缓存写不进去（磁盘满、目录只读）不影响本次结果
+        if key:
+            try:
+                await self.cache.put(key, content)
+            except OSError as e:
+                print(f"⚠️  Failed to cache metadata {key}: {e}")
+        return metadata
+
+    def stats(self) -> dict:
+        return {
+            "cache": self.cache.stats(),
+            "fetch_latency": self.latency.stats(),
+            "fetch_failures": self.failures,
+        }
+
+    @staticmethod
+    def retry_delay(attempts: int) -> int:
+        """指数退避"""
+        return min(settings.METADATA_RETRY_BASE * 2 ** attempts, settings.METADATA_RETRY_MAX)
+
+    async def process_task(self, task):
+        """处理单个元数据任务"""
+        now = datetime.now(timezone.utc)
+        try:
+            metadata = await self.fetch_metadata(task.token_uri)
+        except GatewayUnavailable:
+            # 熔断期间不计入重试次数，冷却后再试
+            async with AsyncSessionLocal() as db:
+                await crud.retry_metadata_task(
+                    db,
+                    task.token_id,
+                    now + timedelta(seconds=self.breaker.cooldown),
+                    count_attempt=False,
+                )
+            return
+        except Exception as e:
+            attempts = task.attempts + 1
+            give_up = attempts >= settings.METADATA_MAX_ATTEMPTS
+            print(f"Error fetching metadata for token {task.token_id} from {task.token_uri}: {e}")
+            async with AsyncSessionLocal() as db:
+                await crud.retry_metadata_task(
+                    db,
+                    task.token_id,
+                    now + timedelta(seconds=self.retry_delay(task.attempts)),
+                    error=str(e)[:500],
+                    give_up=give_up,
+                )
+            return
+
+        name = metadata.get('name') or f'NFT #{task.token_id}'
+        description = metadata.get('description', '')
+        image_url = self.to_http_url(metadata.get('image', ''))
+
+        async with AsyncSessionLocal() as db:
+            with metrics.DB_WRITE_LATENCY.time(operation="metadata"):
+                await crud.complete_metadata_task(db, task.token_id, name, description, image_url)
+        print(f"🖼️  Enriched metadata: Token ID {task.token_id}")
+
+    async def run_once(self) -> int:
+        """领取一批到期任务并处理，返回任务数"""
+        async with AsyncSessionLocal() as db:
+            tasks = await crud.claim_metadata_tasks(
+                db,
+                settings.METADATA_BATCH_SIZE,
+                lease_seconds=int(settings.METADATA_TIMEOUT * 3),
+            )
+        if tasks:
+            await asyncio.gather(*(self.process_task(task) for task in tasks))
+        return len(tasks)
+
+    async def run(self):
+        """运行元数据补全循环"""
+        print("🚀 Starting metadata enricher...")
+
+        while True:
+            try:
+                if await self.run_once() == 0:
+                    await asyncio.sleep(settings.METADATA_POLL_INTERVAL)
+            except Exception as e:
+                print(f"❌ Metadata enricher error: {e}")
+                import traceback
+                traceback.print_exc()
+                await asyncio.sleep(settings.METADATA_POLL_INTERVAL)
+
+
+async def start_enricher(enricher: MetadataEnricher = None):
+    """启动元数据补全"""
+    enricher = enricher or MetadataEnricher()
+    try:
+        await enricher.run()
+    finally:
+        await enricher.close()
@@ -0,0 +1,74 @@
+import asyncio
+import json
+from typing import Callable, Optional
+from app.config import settings
+from app.blocks import BlockHeader
+import websockets
+
+
+class HeadFollower:
+    """通过WebSocket订阅newHeads，新区块到达时立即回调
+
+    连接断开后按指数退避重连；断开期间connected为False，
+    索引器会退回到按INDEXER_INTERVAL轮询。
+    """
+
+    def __init__(self, ws_url: str, on_head: Callable[[BlockHeader], None]):
+        self.ws_url = ws_url
+        self.on_head = on_head
+        self.connected = False
+        self.latest: Optional[BlockHeader] = None
+        self.reconnects = 0
+
+    async def subscribe(self):
+        """建立订阅并持续接收新区块头，连接断开时返回"""
+        async with websockets.connect(self.ws_url, ping_interval=20) as ws:
+            await ws.send(json.dumps({
+                "jsonrpc": "2.0",
+                "id": 1,
+                "method": "eth_subscribe",
+                "params": ["newHeads"],
+            }))
+            reply = json.loads(await ws.recv())
+            if reply.get("error"):
+                raise RuntimeError(f"eth_subscribe failed: {reply['error']}")
+            subscription = reply["result"]
+
+            self.connected = True
+            print(f"🔔 Subscribed to new heads via {self.ws_url}")
+
+            async for message in ws:
+                data = json.loads(message)
+                params = data.get("params") or {}
+                if data.get("method") != "eth_subscription" or params.get("subscription") != subscription:
+                    continue
+                block = params["result"]
+                header = BlockHeader(
+                    number=int(block["number"], 16),
+                    hash=block["hash"],
+                    parent_hash=block["parentHash"],
+                    timestamp=int(block["timestamp"], 16),
+                )
+                self.latest = header
+                self.on_head(header)
+
+    async def run(self):
+        """保持订阅，断开后指数退避重连"""
+        backoff = 1
+        while True:
+            try:
+                await self.subscribe()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  Head subscription error: {e}")
+
+            if self.connected:
+                # 曾经订阅成功，重新从最短间隔开始重连
+                self.connected = False
+                backoff = 1
+
+            self.reconnects += 1
+            print(f"🔁 Falling back to polling, reconnecting in {backoff}s...")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, settings.HEAD_RECONNECT_MAX_BACKOFF)
@@ -1,15 +1,20 @@
 import asyncio
 import json
+import time
+from typing import List
 from web3 import Web3
-from web3.middleware import geth_poa_middleware
 from web3.contract import Contract
 from datetime import datetime
-from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import AsyncSessionLocal
 from app.config import settings
-from app import crud, schemas
-from app.models import NFT
-import httpx
+from app import crud, schemas, metrics
+from app.blocks import BlockHeader, BlockHeaderService
+from app.head_follower import HeadFollower
+from app.rpc import RPCPool, is_endpoint_failure
+from app.ranges import AdaptiveRangeController, is_range_error
+from app.pipeline import IndexPipeline
+from app.decoder import EventRecord, LogDecoder
+from app.archive import LogArchive
 
 
 # 加载合约ABI（现在是纯数组格式）
@@ -19,95 +24,132 @@ with open(abi_path, "r") as f:
     CONTRACT_ABI = json.load(f)
 
 
+class ReorgDetected(Exception):
+    """区块哈希链不连续：已应用的区块被重组"""
+    
+    def __init__(self, block_number: int):
+        super().__init__(f"Chain reorg detected at block {block_number}")
+        self.block_number = block_number
+
+
+class RangeWrites:
+    """一个区块范围内待写入数据库的数据
+    
+    同一token在范围内的多次状态变化会被合并成最终状态，
+    每个被触及的token只写一次；交易记录则完整保留。
+    每行记录最后一个事件的位置(区块号, logIndex)，重放旧范围时不会覆盖更新的状态。
+    """
+    
+    def __init__(self):
+        self.nfts = {}  # 本范围内铸造的NFT: token_id → 完整行
+        self.nft_changes = {}  # 已存在的NFT: token_id → 合并后的变更字段
+        self.transactions = []
+    
+    @staticmethod
+    def _position(event) -> dict:
+        return {
+            'last_event_block': event.block_number,
+            'last_event_log_index': event.log_index,
+        }
+    
+    def add_nft(self, nft: schemas.NFTCreate, event):
+        self.nfts[nft.token_id] = {
+            **nft.model_dump(),
+            'is_listed': False,
+            'price': None,
+            'seller': None,
+            'is_burned': False,
+            **self._position(event),
+        }
+    
+    def update_nft(self, token_id: int, nft_update: schemas.NFTUpdate, event):
+        changes = {**nft_update.model_dump(exclude_unset=True), **self._position(event)}
+        if token_id in self.nfts:
+            self.nfts[token_id].update(changes)
+        else:
+            self.nft_changes.setdefault(token_id, {}).update(changes)
+    
+    def add_transaction(self, tx: schemas.TransactionCreate):
+        self.transactions.append(tx.model_dump())
+
+
 class BlockchainIndexer:
     def __init__(self):
-        self.w3 = Web3(Web3.HTTPProvider(settings.RPC_URL))
-        # 添加POA中间件以支持Polygon
-        self.w3.middleware_onion.inject(geth_poa_middleware, layer=0)
+        # 所有链上请求都走非阻塞的RPC节点池，web3只用于ABI编解码
+        self.rpc = RPCPool()
+        self.w3 = Web3()
         self.contract: Contract = self.w3.eth.contract(
             address=Web3.to_checksum_address(settings.CONTRACT_ADDRESS),
             abi=CONTRACT_ABI
         )
-        self.ipfs_gateway = settings.IPFS_GATEWAY
-    
-    async def fetch_metadata(self, token_uri: str) -> dict:
-        """从IPFS获取NFT元数据"""
-        try:
-            # 转换IPFS URL
-            if token_uri.startswith("ipfs://"):
-                http_url = token_uri.replace("ipfs://", self.ipfs_gateway)
-            else:
-                http_url = token_uri
-            
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(http_url)
-                response.raise_for_status()
-                return response.json()
-        except Exception as e:
-            print(f"Error fetching metadata from {token_uri}: {e}")
-            return {}
-    
-    async def process_nft_minted_event(self, event, db: AsyncSession):
-        """处理NFT铸造事件"""
-        token_id = event['args']['tokenId']
-        creator = event['args']['creator'].lower()
-        token_uri = event['args']['tokenURI']
-        royalty_percent = event['args']['royaltyPercent']
-        category = event['args']['category']
-        
-        # 检查NFT是否已存在
-        existing_nft = await crud.get_nft_by_token_id(db, token_id)
-        if existing_nft:
-            print(f"NFT {token_id} already exists, skipping...")
-            return
+        self.blocks = BlockHeaderService(self.rpc)
+        self.ranges = AdaptiveRangeController()
+        self.pipeline = None
+        # 原始日志归档（配置了ARCHIVE_DIR时启用），可用于离线重放
+        self.archive = LogArchive() if settings.ARCHIVE_DIR else None
+        self.last_indexed_block = None
+        self.last_indexed_timestamp = None
+        self.latest_block = None
+        self.register_metrics()
         
-        # 获取元数据
-        metadata = await self.fetch_metadata(token_uri)
-        name = metadata.get('name', f'NFT #{token_id}')
-        description = metadata.get('description', '')
-        image_url = metadata.get('image', '')
+        # newHeads订阅（配置了WS_RPC_URL时启用），新区块到达时唤醒索引循环
+        self.new_head = asyncio.Event()
+        self.heads = HeadFollower(settings.WS_RPC_URL, self.on_new_head) if settings.WS_RPC_URL else None
         
-        # 转换IPFS URL
-        if image_url.startswith("ipfs://"):
-            image_url = image_url.replace("ipfs://", self.ipfs_gateway)
+        # 事件名 → 处理函数；日志由预编译的解码器直接从原始JSON解码
+        self.event_handlers = {
+            'NFTMinted': self.process_nft_minted_event,
+            'NFTListed': self.process_nft_listed_event,
+            'NFTSold': self.process_nft_sold_event,
+            'ListingCancelled': self.process_listing_cancelled_event,
+            'NFTBurned': self.process_nft_burned_event,
+        }
+        self.decoder = LogDecoder(CONTRACT_ABI, self.event_handlers)
+    
+    async def process_nft_minted_event(self, event, block_time: datetime, writes: RangeWrites):
+        """处理NFT铸造事件"""
+        token_id = event.args['tokenId']
+        creator = event.args['creator'].lower()
+        token_uri = event.args['tokenURI']
+        royalty_percent = event.args['royaltyPercent']
+        category = event.args['category']
         
-        # 创建NFT记录
+        # 创建NFT记录（先用占位名称，元数据由MetadataEnricher异步补全）
         nft_create = schemas.NFTCreate(
             token_id=token_id,
             token_uri=token_uri,
-            name=name,
-            description=description,
-            image_url=image_url,
+            name=f'NFT #{token_id}',
+            description='',
+            image_url='',
             creator=creator,
             owner=creator,
             category=category,
             royalty_percent=royalty_percent,
         )
         
-        await crud.create_nft(db, nft_create)
+        writes.add_nft(nft_create, event)
         
         # 创建交易记录
         tx_create = schemas.TransactionCreate(
-            tx_hash=event['transactionHash'].hex(),
-            block_number=event['blockNumber'],
+            tx_hash=event.tx_hash,
+            block_number=event.block_number,
+            log_index=event.log_index,
             tx_type='mint',
             token_id=token_id,
             from_address=None,
             to_address=creator,
             price=None,
-            timestamp=datetime.fromtimestamp(
-                self.w3.eth.get_block(event['blockNumber'])['timestamp']
-            ),
+            timestamp=block_time,
         )
         
-        await crud.create_transaction(db, tx_create)
+        writes.add_transaction(tx_create)
         print(f"✅ Indexed NFT Minted: Token ID {token_id}")
     
-    async def process_nft_listed_event(self, event, db: AsyncSession):
+    async def process_nft_listed_event(self, event, block_time: datetime, writes: RangeWrites):
         """处理NFT挂单事件"""
-        token_id = event['args']['tokenId']
-        seller = event['args']['seller'].lower()
-        price = str(event['args']['price'])
+        token_id = event.args['tokenId']
+        seller = event.args['seller'].lower()
+        price = str(event.args['price'])
         
         # 更新NFT状态
         nft_update = schemas.NFTUpdate(
@@ -116,31 +158,30 @@ class BlockchainIndexer:
             seller=seller,
         )
         
-        await crud.update_nft(db, token_id, nft_update)
+        writes.update_nft(token_id, nft_update, event)
         
         # 创建交易记录
         tx_create = schemas.TransactionCreate(
-            tx_hash=event['transactionHash'].hex(),
-            block_number=event['blockNumber'],
+            tx_hash=event.tx_hash,
+            block_number=event.block_number,
+            log_index=event.log_index,
             tx_type='list',
             token_id=token_id,
             from_address=seller,
             to_address=None,
             price=price,
-            timestamp=datetime.fromtimestamp(
-                self.w3.eth.get_block(event['blockNumber'])['timestamp']
-            ),
+            timestamp=block_time,
         )
         
-        await crud.create_transaction(db, tx_create)
+        writes.add_transaction(tx_create)
         print(f"✅ Indexed NFT Listed: Token ID {token_id}, Price {price}")
     
-    async def process_nft_sold_event(self, event, db: AsyncSession):
+    async def process_nft_sold_event(self, event, block_time: datetime, writes: RangeWrites):
         """处理NFT售出事件"""
-        token_id = event['args']['tokenId']
-        seller = event['args']['seller'].lower()
-        buyer = event['args']['buyer'].lower()
-        price = str(event['args']['price'])
+        token_id = event.args['tokenId']
+        seller = event.args['seller'].lower()
+        buyer = event.args['buyer'].lower()
+        price = str(event.args['price'])
         
         # 更新NFT状态
         nft_update = schemas.NFTUpdate(
@@ -150,29 +191,28 @@ class BlockchainIndexer:
             seller=None,
         )
         
-        await crud.update_nft(db, token_id, nft_update)
+        writes.update_nft(token_id, nft_update, event)
         
         # 创建交易记录
         tx_create = schemas.TransactionCreate(
-            tx_hash=event['transactionHash'].hex(),
-            block_number=event['blockNumber'],
+            tx_hash=event.tx_hash,
+            block_number=event.block_number,
+            log_index=event.log_index,
             tx_type='buy',
             token_id=token_id,
             from_address=buyer,
             to_address=seller,
             price=price,
-            timestamp=datetime.fromtimestamp(
-                self.w3.eth.get_block(event['blockNumber'])['timestamp']
-            ),
+            timestamp=block_time,
         )
         
-        await crud.create_transaction(db, tx_create)
+        writes.add_transaction(tx_create)
         print(f"✅ Indexed NFT Sold: Token ID {token_id}, Buyer {buyer}")
     
-    async def process_listing_cancelled_event(self, event, db: AsyncSession):
+    async def process_listing_cancelled_event(self, event, block_time: datetime, writes: RangeWrites):
         """处理取消挂单事件"""
-        token_id = event['args']['tokenId']
-        seller = event['args']['seller'].lower()
+        token_id = event.args['tokenId']
+        seller = event.args['seller'].lower()
         
         # 更新NFT状态
         nft_update = schemas.NFTUpdate(
@@ -181,29 +221,28 @@ class BlockchainIndexer:
             seller=None,
         )
         
-        await crud.update_nft(db, token_id, nft_update)
+        writes.update_nft(token_id, nft_update, event)
         
         # 创建交易记录
         tx_create = schemas.TransactionCreate(
-            tx_hash=event['transactionHash'].hex(),
-            block_number=event['blockNumber'],
+            tx_hash=event.tx_hash,
+            block_number=event.block_number,
+            log_index=event.log_index,
             tx_type='cancel',
             token_id=token_id,
             from_address=seller,
             to_address=None,
             price=None,
-            timestamp=datetime.fromtimestamp(
-                self.w3.eth.get_block(event['blockNumber'])['timestamp']
-            ),
+            timestamp=block_time,
         )
         
-        await crud.create_transaction(db, tx_create)
+        writes.add_transaction(tx_create)
         print(f"✅ Indexed Listing Cancelled: Token ID {token_id}")
     
-    async def process_nft_burned_event(self, event, db: AsyncSession):
+    async def process_nft_burned_event(self, event, block_time: datetime, writes: RangeWrites):
         """处理NFT销毁事件"""
-        token_id = event['args']['tokenId']
-        burner = event['args']['burner'].lower()
+        token_id = event.args['tokenId']
+        burner = event.args['burner'].lower()
         
         # 更新NFT状态
         nft_update = schemas.NFTUpdate(
@@ -213,107 +252,262 @@ class BlockchainIndexer:
             seller=None,
         )
         
-        await crud.update_nft(db, token_id, nft_update)
+        writes.update_nft(token_id, nft_update, event)
         
         # 创建交易记录
         tx_create = schemas.TransactionCreate(
-            tx_hash=event['transactionHash'].hex(),
-            block_number=event['blockNumber'],
+            tx_hash=event.tx_hash,
+            block_number=event.block_number,
+            log_index=event.log_index,
             tx_type='burn',
             token_id=token_id,
             from_address=burner,
             to_address=None,
             price=None,
-            timestamp=datetime.fromtimestamp(
-                self.w3.eth.get_block(event['blockNumber'])['timestamp']
-            ),
+            timestamp=block_time,
         )
         
-        await crud.create_transaction(db, tx_create)
+        writes.add_transaction(tx_create)
         print(f"✅ Indexed NFT Burned: Token ID {token_id}")
     
-    async def index_events(self, from_block: int, to_block: int):
-        """索引指定区块范围的事件"""
-        async with AsyncSessionLocal() as db:
-            # 使用getLogs代替create_filter，更兼容公共RPC
-            # NFTMinted事件
-            minted_events = self.contract.events.NFTMinted.get_logs(
-                fromBlock=from_block,
-                toBlock=to_block
-            )
-            for event in minted_events:
-                await self.process_nft_minted_event(event, db)
+    async def fetch_logs(self, from_block: int, to_block: int) -> list:
+        """获取区块范围内的市场事件日志，范围过大时对半拆分重试"""
+        for attempt in range(settings.RPC_THROTTLE_RETRIES + 1):
+            started = time.monotonic()
+            try:
+                # 一次getLogs取回五种事件（topic0取OR），减少RPC往返
+                logs = await self.rpc.get_raw_logs({
+                    'address': self.contract.address,
+                    'fromBlock': from_block,
+                    'toBlock': to_block,
+                    'topics': [self.decoder.topics],
+                })
+            except Exception as e:
+                if is_range_error(e) and from_block < to_block:
+                    self.ranges.on_failure()
+                    middle = (from_block + to_block) // 2
+                    print(f"✂️  Splitting blocks {from_block}-{to_block} ({e})")
+                    return (
+                        await self.fetch_logs(from_block, middle)
+                        + await self.fetch_logs(middle + 1, to_block)
+                    )
+                if not is_endpoint_failure(e) or attempt == settings.RPC_THROTTLE_RETRIES:
+                    raise
+                # 所有节点都在限流：保持范围不变，指数退避后重试
+                delay = min(settings.RPC_THROTTLE_BACKOFF * 2 ** attempt, settings.RPC_THROTTLE_BACKOFF_MAX)
+                print(f"🐢 RPC throttled ({e}), retrying blocks {from_block}-{to_block} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
             
-            # NFTListed事件
-            listed_events = self.contract.events.NFTListed.get_logs(
-                fromBlock=from_block,
-                toBlock=to_block
-            )
-            for event in listed_events:
-                await self.process_nft_listed_event(event, db)
+            self.ranges.on_success(len(logs), time.monotonic() - started)
+            return logs
+    
+    def final_block(self) -> int:
+        """已达到确认深度的最高区块，之后的区块可能被重组"""
+        return (self.latest_block or 0) - settings.CONFIRMATIONS
+    
+    def decode_logs(self, logs: list) -> List[EventRecord]:
+        """解码原始日志并按链上顺序排列；不认识的日志被忽略"""
+        events = [event for event in map(self.decoder.decode, logs) if event is not None]
+        
+        # 严格按链上顺序处理，保证同一范围内 挂单→售出→再挂单 的结果正确
+        events.sort(key=lambda event: (event.block_number, event.log_index))
+        return events
+    
+    async def fetch_range_headers(self, from_block: int, to_block: int, events: List[EventRecord]) -> dict:
+        """一次批量请求取回本范围涉及的所有区块头（含首尾区块，用于检查哈希链）"""
+        block_numbers = {from_block, to_block} | {event.block_number for event in events}
+        async with AsyncSessionLocal() as db:
+            return await self.blocks.get_headers(db, block_numbers, fresh_after=self.final_block())
+    
+    async def fetch_range(self, from_block: int, to_block: int) -> tuple:
+        """获取区块范围内的原始日志、已解码的事件和区块头（只访问RPC，不写业务表）"""
+        logs = await self.fetch_logs(from_block, to_block)
+        events = self.decode_logs(logs)
+        headers = await self.fetch_range_headers(from_block, to_block, events)
+        return logs, events, headers
+    
+    async def apply_range(self, from_block: int, to_block: int, events: list, headers: dict, logs: list = None):
+        """按顺序应用已解码的事件，并推进检查点到to_block
+        
+        传入logs时，提交成功后把原始日志和区块头追加到归档。
+        """
+        async with AsyncSessionLocal() as db:
+            # 范围首个区块的父哈希必须等于上次应用的区块哈希，否则发生了重组
+            state = await crud.get_indexer_state(db)
+            if (
+                state
+                and state.last_indexed_hash
+                and state.last_indexed_block == from_block - 1
+                and headers[from_block].parent_hash != state.last_indexed_hash
+            ):
+                raise ReorgDetected(from_block)
             
-            # NFTSold事件
-            sold_events = self.contract.events.NFTSold.get_logs(
-                fromBlock=from_block,
-                toBlock=to_block
-            )
-            for event in sold_events:
-                await self.process_nft_sold_event(event, db)
+            writes = RangeWrites()
+            for event in events:
+                # 日志与区块头来自不同的链视图，说明期间发生了重组
+                if event.block_hash != headers[event.block_number].hash:
+                    raise ReorgDetected(event.block_number)
+                handler = self.event_handlers[event.name]
+                await handler(event, headers[event.block_number].datetime, writes)
             
-            # ListingCancelled事件
-            cancelled_events = self.contract.events.ListingCancelled.get_logs(
-                fromBlock=from_block,
-                toBlock=to_block
-            )
-            for event in cancelled_events:
-                await self.process_listing_cancelled_event(event, db)
+            # 整个范围的写入和检查点在同一个事务中提交
+            with metrics.DB_WRITE_LATENCY.time(operation="index_range"):
+                await crud.write_indexed_range(
+                    db,
+                    list(writes.nfts.values()),
+                    writes.nft_changes,
+                    writes.transactions,
+                    to_block,
+                    headers[to_block].hash,
+                    self.final_block(),
+                )
+        self.last_indexed_block = to_block
+        self.last_indexed_timestamp = headers[to_block].timestamp
+        metrics.BLOCKS_INDEXED.inc(to_block - from_block + 1)
+        for event in events:
+            metrics.EVENTS_INDEXED.inc(event=event.name)
+        
+        if self.archive and logs is not None:
+            await self.archive.append(from_block, to_block, logs, headers)
+    
+    async def index_events(self, from_block: int, to_block: int):
+        """索引指定区块范围的事件"""
+        logs, events, headers = await self.fetch_range(from_block, to_block)
+        await self.apply_range(from_block, to_block, events, headers, logs)
+    
+    async def handle_reorg(self):
+        """找到分叉点，回滚其后的数据，之后由索引循环重新应用"""
+        async with AsyncSessionLocal() as db:
+            state = await crud.get_indexer_state(db)
+            last_block = state.last_indexed_block
             
-            # NFTBurned事件
-            burned_events = self.contract.events.NFTBurned.get_logs(
-                fromBlock=from_block,
-                toBlock=to_block
+            # 从已记录的区块中找最高的、哈希仍与链上一致的区块作为分叉点
+            stored = await crud.get_blocks_between(db, last_block - settings.REORG_MAX_DEPTH, last_block)
+            canonical = await self.blocks.fetch_headers([block.number for block in stored])
+            fork = next(
+                (block for block in stored if canonical[block.number].hash == block.hash),
+                None,
             )
-            for event in burned_events:
-                await self.process_nft_burned_event(event, db)
+            if fork is None:
+                raise RuntimeError(
+                    f"Reorg deeper than {settings.REORG_MAX_DEPTH} blocks below {last_block}"
+                )
             
-            # 更新索引器状态
-            await crud.update_indexer_state(db, to_block)
+            if fork.number < last_block:
+                print(f"🔀 Chain reorg: rolling back blocks {fork.number + 1} to {last_block}")
+                with metrics.DB_WRITE_LATENCY.time(operation="rollback"):
+                    unresolved = await crud.rollback_to_block(db, fork.number, fork.hash, self.final_block())
+                metrics.REORGS.inc()
+                if unresolved:
+                    await self.reconcile_after_rollback(unresolved, fork.number)
+            self.blocks.forget_after(fork.number)
+            if self.archive:
+                await self.archive.truncate_after(
+                    BlockHeader(fork.number, fork.hash, fork.parent_hash, fork.timestamp)
+                )
+            self.last_indexed_block = fork.number
+    
+    async def reconcile_after_rollback(self, token_ids: List[int], fork_block: int):
+        """没有铸造记录的NFT在回滚后按分叉点的链上状态修复；失败时留给定期对账"""
+        # 避免与reconcile模块循环导入
+        from app.reconcile import Reconciler
+        
+        reconciler = Reconciler(self.rpc)
+        try:
+            for i in range(0, len(token_ids), settings.RECONCILE_BATCH_SIZE):
+                await reconciler.reconcile_tokens(token_ids[i:i + settings.RECONCILE_BATCH_SIZE], fork_block)
+        except Exception as e:
+            print(f"⚠️  Reconciling {len(token_ids)} tokens after rollback failed: {e}")
+    
+    def on_new_head(self, header: BlockHeader):
+        """newHeads回调：记录推送的区块头（未确认区块直接使用）并唤醒索引循环"""
+        self.blocks.push(header)
+        self.latest_block = header.number
+        self.new_head.set()
+    
+    async def get_latest_block(self) -> int:
+        """订阅正常时直接使用推送的最新区块，否则查询RPC"""
+        if self.heads and self.heads.connected and self.heads.latest:
+            return self.heads.latest.number
+        return await self.rpc.block_number()
+    
+    async def wait_for_new_head(self):
+        """等待新区块：订阅正常时由newHeads推送唤醒，否则按INDEXER_INTERVAL轮询"""
+        if not (self.heads and self.heads.connected):
+            print(f"⏳ Waiting for new blocks... (current: {self.latest_block})")
+        try:
+            await asyncio.wait_for(self.new_head.wait(), timeout=settings.INDEXER_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        self.new_head.clear()
+    
+    def register_metrics(self):
+        """由当前索引器提供采集时计算的指标"""
+        metrics.LAST_INDEXED_BLOCK.set_function(lambda: self.last_indexed_block)
+        metrics.LATEST_BLOCK.set_function(lambda: self.latest_block)
+        metrics.HEAD_LAG_BLOCKS.set_function(
+            lambda: max(self.latest_block - self.last_indexed_block, 0)
+            if self.latest_block is not None and self.last_indexed_block is not None else None
+        )
+        metrics.HEAD_LAG_SECONDS.set_function(
+            lambda: max(time.time() - self.last_indexed_timestamp, 0)
+            if self.last_indexed_timestamp is not None else None
+        )
+        metrics.BLOCK_RANGE.set_function(lambda: self.ranges.window)
+        metrics.BLOCKS_PER_SECOND.set_function(lambda: self.ranges.blocks_per_sec)
+    
+    def stats(self) -> dict:
+        """索引器运行状态"""
+        return {
+            "last_indexed_block": self.last_indexed_block,
+            "latest_block": self.latest_block,
+            "final_block": self.final_block(),
+            "head_subscription": self.heads.connected if self.heads else None,
+            "pushed_header_hits": self.blocks.pushed_hits,
+            **self.ranges.stats(),
+            "pipeline": self.pipeline.stats() if self.pipeline else None,
+            "archive": self.archive.stats() if self.archive else None,
+            "rpc_endpoints": self.rpc.stats(),
+        }
     
     async def run(self):
         """运行索引器"""
         print("🚀 Starting blockchain indexer...")
         
-        # 每次最多索引的区块数（减小以适应公共RPC限制）
-        MAX_BLOCK_RANGE = 50
-        
+        heads_task = asyncio.create_task(self.heads.run()) if self.heads else None
+        try:
+            await self._index_loop()
+        finally:
+            if heads_task:
+                heads_task.cancel()
+    
+    async def _index_loop(self):
         while True:
             try:
-                # 让出控制权，避免阻塞事件循环
-                await asyncio.sleep(0)
-                
                 async with AsyncSessionLocal() as db:
                     # 获取上次索引的区块
                     state = await crud.get_indexer_state(db)
                     last_block = state.last_indexed_block if state else settings.INDEXER_START_BLOCK
-                    
-                    # 获取最新区块
-                    latest_block = self.w3.eth.block_number
-                    
-                    if last_block < latest_block:
-                        # 限制每次索引的区块范围
-                        to_block = min(last_block + MAX_BLOCK_RANGE, latest_block)
-                        
-                        print(f"📊 Indexing blocks {last_block + 1} to {to_block}...")
-                        await self.index_events(last_block + 1, to_block)
-                        print(f"✅ Indexed up to block {to_block}")
-                        
-                        # 索引完一批后立即让出控制权
-                        await asyncio.sleep(0.1)
-                    else:
-                        print(f"⏳ Waiting for new blocks... (current: {latest_block})")
                 
-                # 等待一段时间再检查（增加到30秒，减少RPC调用频率）
-                await asyncio.sleep(30)
+                # 获取最新区块
+                latest_block = await self.get_latest_block()
+                self.last_indexed_block = last_block
+                self.latest_block = latest_block
+                
+                if latest_block - last_block > settings.BACKFILL_LAG_THRESHOLD:
+                    # 落后太多时切换到并行分片回填
+                    print(f"🚚 Lagging {latest_block - last_block} blocks, starting backfill...")
+                    await run_backfill(self, last_block + 1, latest_block)
+                    continue
+                
+                # 获取、解码、区块头和写库分阶段并行，直到出错才返回
+                self.pipeline = IndexPipeline(self)
+                await self.pipeline.run(last_block)
+                
+            except ReorgDetected as e:
+                print(f"🔀 Reorg detected at block {e.block_number}")
+                await self.handle_reorg()
                 
             except Exception as e:
                 print(f"❌ Indexer error: {e}")
@@ -322,7 +516,119 @@ class BlockchainIndexer:
                 await asyncio.sleep(30)
 
 
-async def start_indexer():
+async def run_backfill(
+    indexer: BlockchainIndexer,
+    from_block: int,
+    to_block: int,
+    workers: int = None,
+    shard_size: int = None,
+):
+    """并行分片回填历史区块
+    
+    多个worker并发获取各分片的日志和区块头，应用阶段严格按分片顺序写库，
+    检查点只会推进到已完整应用的分片末尾。
+    """
+    workers = workers or settings.BACKFILL_WORKERS
+    shard_size = shard_size or settings.BACKFILL_SHARD_SIZE
+    shards = [
+        (start, min(start + shard_size - 1, to_block))
+        for start in range(from_block, to_block + 1, shard_size)
+    ]
+    if not shards:
+        return
+    
+    loop = asyncio.get_running_loop()
+    results = [loop.create_future() for _ in shards]
+    pending = iter(enumerate(shards))
+    # 限制已取回但尚未应用的分片数量，避免内存无限增长
+    window = asyncio.Semaphore(workers * 2)
+    
+    async def fetch_worker():
+        while True:
+            # 先占用窗口再领取分片，保证最早的分片总能拿到名额
+            await window.acquire()
+            try:
+                index, (start, end) = next(pending)
+            except StopIteration:
+                window.release()
+                return
+            
+            for attempt in range(settings.BACKFILL_RETRIES + 1):
+                try:
+                    results[index].set_result(await indexer.fetch_range(start, end))
+                    break
+                except Exception as e:
+                    if attempt == settings.BACKFILL_RETRIES:
+                        results[index].set_exception(e)
+                        return
+                    print(f"⚠️  Backfill shard {start}-{end} failed ({e}), retrying...")
+                    await asyncio.sleep(2 ** attempt)
+    
+    print(f"🚚 Backfilling blocks {from_block} to {to_block} "
+          f"({len(shards)} shards, {workers} workers)")
+    tasks = [asyncio.create_task(fetch_worker()) for _ in range(workers)]
+    started = time.monotonic()
+    try:
+        for index, (start, end) in enumerate(shards):
+            logs, events, headers = await results[index]
+            await indexer.apply_range(start, end, events, headers, logs)
+            window.release()
+            
+            elapsed = time.monotonic() - started
+            indexer.ranges.record_progress(end - start + 1, elapsed)
+            started = time.monotonic()
+            print(f"✅ Backfilled up to block {end} ({index + 1}/{len(shards)})")
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def replay_archive(
+    indexer: BlockchainIndexer,
+    archive: LogArchive,
+    from_block: int = None,
+    to_block: int = None,
+) -> dict:
+    """从本地归档重建数据库，不访问RPC
+    
+    按段顺序解码并应用归档中的原始日志，区块头同时写入blocks表，
+    之后的重组检测与在线索引一致。返回吞吐统计。
+    """
+    segments = archive.segments(from_block, to_block)
+    if not segments:
+        print("✅ Nothing to replay")
+        return {"blocks": 0, "logs": 0, "seconds": 0}
+    
+    # 归档中的范围都已应用过，以归档末尾作为最新区块计算确认深度
+    indexer.latest_block = segments[-1].to_block if to_block is None else min(segments[-1].to_block, to_block)
+    
+    print(f"📼 Replaying {len(segments)} archive segments...")
+    blocks = 0
+    log_count = 0
+    started = time.monotonic()
+    for start, end, logs, headers in archive.iter_ranges(from_block, to_block):
+        async with AsyncSessionLocal() as db:
+            await crud.save_blocks(db, [header._asdict() for header in headers.values()])
+        await indexer.apply_range(start, end, indexer.decode_logs(logs), headers)
+        blocks += end - start + 1
+        log_count += len(logs)
+        print(f"✅ Replayed blocks {start} to {end}")
+    
+    elapsed = time.monotonic() - started
+    return {
+        "blocks": blocks,
+        "logs": log_count,
+        "seconds": round(elapsed, 2),
+        "blocks_per_second": round(blocks / elapsed, 1) if elapsed else None,
+        "logs_per_second": round(log_count / elapsed, 1) if elapsed else None,
+    }
+
+
+async def start_indexer(indexer: BlockchainIndexer = None):
     """启动索引器"""
-    indexer = BlockchainIndexer()
-    await indexer.run()
+    indexer = indexer or BlockchainIndexer()
+    try:
+        await indexer.run()
+    finally:
+        await indexer.rpc.close()
@@ -0,0 +1,99 @@
+import asyncio
+from typing import Awaitable, Callable, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from app.database import engine
+from app.config import settings
+
+
+class LeaderElection:
+    """基于PostgreSQL会话级advisory lock的主节点选举
+
+    持有锁的连接就是租约：进程退出或连接断开时数据库自动释放锁，
+    备用实例在下一次轮询时接管。
+    """
+
+    def __init__(self, lock_id: int = None, poll_interval: float = None):
+        self.lock_id = lock_id if lock_id is not None else settings.INDEXER_LOCK_ID
+        self.poll_interval = poll_interval or settings.LEADER_POLL_INTERVAL
+        self.is_leader = False
+        self.elections = 0
+        self._conn: Optional[AsyncConnection] = None
+
+    async def try_acquire(self) -> bool:
+        """尝试获取锁；成功后保持专用连接"""
+        conn = await engine.connect()
+        try:
+            # 自动提交，避免长时间idle in transaction
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            result = await conn.execute(text("SELECT pg_try_advisory_lock(:lock_id)"), {"lock_id": self.lock_id})
+            acquired = bool(result.scalar())
+        except Exception:
+            await conn.close()
+            raise
+
+        if not acquired:
+            await conn.close()
+            return False
+
+        self._conn = conn
+        self.is_leader = True
+        self.elections += 1
+        return True
+
+    async def heartbeat(self):
+        """确认持锁连接仍然可用，连接断开时抛出异常"""
+        await self._conn.execute(text("SELECT 1"))
+
+    async def release(self):
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        self.is_leader = False
+        try:
+            await conn.execute(text("SELECT pg_advisory_unlock(:lock_id)"), {"lock_id": self.lock_id})
+            await conn.close()
+        except Exception:
+            # 连接已不可用：丢弃连接，锁随会话一起释放
+            await conn.invalidate()
+
+    async def run(self, work: Callable[[], Awaitable[None]]):
+        """成为主节点后运行work，失去锁时取消work并重新参与选举"""
+        while True:
+            try:
+                acquired = await self.try_acquire()
+            except Exception as e:
+                print(f"⚠️  Leader election error: {e}")
+                acquired = False
+
+            if not acquired:
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            print(f"👑 Acquired leader lock {self.lock_id}")
+            task = asyncio.create_task(work())
+            try:
+                while not task.done():
+                    await asyncio.wait({task}, timeout=self.poll_interval)
+                    if not task.done():
+                        await self.heartbeat()
+                if task.exception() is not None:
+                    print(f"❌ Leader task failed: {task.exception()}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  Lost leader lock {self.lock_id}: {e}")
+            finally:
+                if not task.done():
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+                await self.release()
+
+            await asyncio.sleep(self.poll_interval)
+
+    def stats(self) -> dict:
+        return {
+            "lock_id": self.lock_id,
+            "is_leader": self.is_leader,
+            "elections": self.elections,
+        }
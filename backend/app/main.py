@@ -1,32 +1,57 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
 import asyncio
 from app.config import settings
 from app.routers import nfts, transactions
-from app.indexer import start_indexer
+from app.indexer import BlockchainIndexer
+from app.enrichment import MetadataEnricher
+from app.leader import LeaderElection
+from app.worker import start_worker
+from app.cache import response_cache, CacheInvalidationListener
+from app import metrics
 
 
 # 后台任务
-indexer_task = None
+indexer = None
+enricher = None
+election = None
+worker_task = None
+cache_listener = None
+cache_listener_task = None
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # 启动时
-    global indexer_task
+    global indexer, enricher, election, worker_task, cache_listener, cache_listener_task
     print("🚀 Starting NFT Marketplace API...")
     
-    # 启动索引器（后台任务）
-    indexer_task = asyncio.create_task(start_indexer())
-    print("✅ Indexer started in background")
+    if response_cache.enabled:
+        # 索引器提交后数据库触发器发送NOTIFY，按token/分类/拥有者失效响应缓存
+        cache_listener = CacheInvalidationListener(response_cache)
+        cache_listener_task = asyncio.create_task(cache_listener.run())
+    
+    if settings.RUN_INDEXER:
+        # 索引器通过advisory lock选主，多个API进程只有一个在索引；
+        # 元数据补全与索引解耦，各进程都可以运行
+        indexer = BlockchainIndexer()
+        enricher = MetadataEnricher()
+        election = LeaderElection()
+        worker_task = asyncio.create_task(start_worker(indexer, enricher, election))
+        print("✅ Background worker started")
+    else:
+        print("ℹ️  Indexer disabled (RUN_INDEXER=false), run worker.py separately")
     
     yield
     
     # 关闭时
     print("👋 Shutting down...")
-    if indexer_task:
-        indexer_task.cancel()
+    if worker_task:
+        worker_task.cancel()
+    if cache_listener_task:
+        cache_listener_task.cancel()
 
 
 # 创建FastAPI应用
@@ -62,4 +87,20 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "indexer": indexer.stats() if election and election.is_leader else None,
+        "leader": election.stats() if election else None,
+        "metadata": enricher.stats() if enricher else None,
+        "cache": {
+            **response_cache.stats(),
+            "notifications": cache_listener.notifications if cache_listener else None,
+        },
+        "metrics": metrics.summary(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus文本格式的指标（索引器在独立worker中运行时，由worker的METRICS_PORT提供）"""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
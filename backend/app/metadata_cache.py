@@ -0,0 +1,144 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+from collections import deque
+from typing import Optional
+from urllib.parse import urlparse
+from app.config import settings
+
+
+def ipfs_content_key(uri: str) -> Optional[str]:
+    """提取IPFS内容地址(CID/路径)；非IPFS地址返回None（内容可能变化，不缓存）"""
+    if uri.startswith("ipfs://"):
+        key = uri[len("ipfs://"):]
+        if key.startswith("ipfs/"):
+            key = key[len("ipfs/"):]
+        return key.strip("/") or None
+
+    # 网关地址 https://<gateway>/ipfs/<cid>/<path>
+    path = urlparse(uri).path
+    if "/ipfs/" in path:
+        return path.split("/ipfs/", 1)[1].strip("/") or None
+    return None
+
+
+class LatencyStats:
+    """请求耗时统计（保留最近的样本计算分位数）"""
+
+    def __init__(self, size: int = 1000):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+    def stats(self) -> dict:
+        p50 = self.percentile(0.5)
+        p95 = self.percentile(0.95)
+        return {
+            "count": self.count,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+class MetadataCache:
+    """按IPFS内容地址存储的本地磁盘缓存，超出容量时淘汰最久未使用的文件"""
+
+    def __init__(self, directory: str = None, max_bytes: int = None):
+        self.directory = directory or settings.METADATA_CACHE_DIR
+        self.max_bytes = max_bytes or settings.METADATA_CACHE_MAX_BYTES
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+        self._lock = asyncio.Lock()
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def _read(self, path: str) -> Optional[bytes]:
+        try:
+            with open(path, "rb") as f:
+                content = f.read()
+        except FileNotFoundError:
+            return None
+        # 更新访问时间，用于LRU淘汰
+        os.utime(path)
+        return content
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_mtime, stat.st_size
+
+    def _write(self, path: str, content: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 覆盖已有文件时先减去旧文件的大小
+        try:
+            replaced = os.path.getsize(path)
+        except FileNotFoundError:
+            replaced = 0
+        # 先写临时文件再原子替换，避免读到半个文件
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+        if self._size is None:
+            self._size = sum(size for _, _, size in self._entries())
+        else:
+            self._size += len(content) - replaced
+
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        """淘汰最久未使用的文件，直到降到容量的90%"""
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        target = self.max_bytes * 0.9
+        for path, _, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._size = total
+
+    async def get(self, key: str) -> Optional[bytes]:
+        content = await asyncio.to_thread(self._read, self._path(key))
+        if content is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return content
+
+    async def put(self, key: str, content: bytes):
+        async with self._lock:
+            await asyncio.to_thread(self._write, self._path(key), content)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "size_bytes": self._size,
+            "max_bytes": self.max_bytes,
+        }
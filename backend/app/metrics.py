@@ -0,0 +1,276 @@
+import asyncio
+import bisect
+import math
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+
+# 默认直方图分桶（秒），覆盖本地数据库写入到慢RPC/IPFS请求
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """返回(样本名, 标签, 值)"""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self.values.get(self._key(labels), 0)
+
+    def samples(self):
+        return [
+            (self.name, _format_labels(self.label_names, key), value)
+            for key, value in sorted(self.values.items())
+        ]
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], Optional[float]]] = None
+
+    def set(self, value: float, **labels):
+        self.values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], Optional[float]]):
+        """采集时调用function取值（无标签的gauge），返回None表示暂无数据"""
+        self._function = function
+
+    def value(self, **labels) -> Optional[float]:
+        if self._function is not None:
+            return self._function()
+        return self.values.get(self._key(labels))
+
+    def samples(self):
+        if self._function is not None:
+            value = self._function()
+            return [] if value is None else [(self.name, "", value)]
+        return [
+            (self.name, _format_labels(self.label_names, key), value)
+            for key, value in sorted(self.values.items())
+        ]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # 标签 → [各分桶计数, 总和, 总数]
+        self.values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        entry = self.values.get(key)
+        if entry is None:
+            entry = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - started, **labels)
+
+    def summary(self) -> Dict[str, dict]:
+        """按标签汇总次数和平均值，用于/health"""
+        return {
+            ",".join(key) or "all": {
+                "count": count,
+                "avg_ms": round(total / count * 1000, 1) if count else None,
+            }
+            for key, (_, total, count) in sorted(self.values.items())
+        }
+
+    def samples(self):
+        samples = []
+        for key, (counts, total, count) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.label_names + ("le",), key + (_format_value(bound),))
+                samples.append((f"{self.name}_bucket", labels, cumulative))
+            labels = _format_labels(self.label_names, key)
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, count))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Prometheus文本格式"""
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labels))
+
+
+def gauge(name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labels))
+
+
+def histogram(name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labels, buckets))
+
+
+# 索引器
+BLOCKS_INDEXED = counter("indexer_blocks_indexed_total", "Blocks applied to the database")
+BLOCKS_PER_SECOND = gauge("indexer_blocks_per_second", "Smoothed indexing throughput in blocks per second")
+EVENTS_INDEXED = counter("indexer_events_total", "Marketplace events applied, by event type", ["event"])
+LAST_INDEXED_BLOCK = gauge("indexer_last_indexed_block", "Last block applied to the database")
+LATEST_BLOCK = gauge("indexer_latest_block", "Latest block seen on chain")
+HEAD_LAG_BLOCKS = gauge("indexer_head_lag_blocks", "Blocks between the chain head and the last indexed block")
+HEAD_LAG_SECONDS = gauge("indexer_head_lag_seconds", "Seconds since the timestamp of the last indexed block")
+BLOCK_RANGE = gauge("indexer_block_range", "Current eth_getLogs block range size")
+REORGS = counter("indexer_reorgs_total", "Chain reorganisations handled")
+
+# RPC
+RPC_LATENCY = histogram("rpc_request_duration_seconds", "JSON-RPC call latency by method", ["method"])
+RPC_ERRORS = counter("rpc_errors_total", "Failed JSON-RPC calls by method", ["method"])
+
+# 数据库
+DB_WRITE_LATENCY = histogram("db_write_duration_seconds", "Database write transaction latency", ["operation"])
+
+# 元数据
+METADATA_FETCH_LATENCY = histogram("metadata_fetch_duration_seconds", "Metadata fetch latency (cache misses only)")
+METADATA_FETCH_FAILURES = counter("metadata_fetch_failures_total", "Failed metadata fetches by reason", ["reason"])
+METADATA_CACHE_LOOKUPS = counter("metadata_cache_lookups_total", "Metadata disk cache lookups", ["result"])
+
+# API响应缓存
+RESPONSE_CACHE_LOOKUPS = counter("api_cache_lookups_total", "API response cache lookups by endpoint", ["endpoint", "result"])
+RESPONSE_CACHE_INVALIDATIONS = counter("api_cache_invalidated_entries_total", "API response cache entries invalidated")
+RESPONSE_CACHE_ENTRIES = gauge("api_cache_entries", "Entries in the in-process API response cache")
+
+# 并发查询合并：coalesced / (executed + coalesced) 即合并率
+SINGLEFLIGHT_CALLS = counter("api_singleflight_calls_total", "Coalescable API queries by query and result", ["query", "result"])
+
+
+def coalescing_ratio() -> Dict[str, dict]:
+    """按查询统计合并率"""
+    queries = sorted({key[0] for key in SINGLEFLIGHT_CALLS.values})
+    ratios = {}
+    for query in queries:
+        executed = SINGLEFLIGHT_CALLS.value(query=query, result="executed")
+        coalesced = SINGLEFLIGHT_CALLS.value(query=query, result="coalesced")
+        ratios[query] = {
+            "executed": executed,
+            "coalesced": coalesced,
+            "ratio": round(coalesced / (executed + coalesced), 3) if executed + coalesced else None,
+        }
+    return ratios
+
+
+def summary() -> dict:
+    """/health中的指标摘要"""
+    return {
+        "blocks_indexed": BLOCKS_INDEXED.value(),
+        "blocks_per_second": BLOCKS_PER_SECOND.value(),
+        "head_lag_blocks": HEAD_LAG_BLOCKS.value(),
+        "head_lag_seconds": HEAD_LAG_SECONDS.value(),
+        "block_range": BLOCK_RANGE.value(),
+        "events": {key[0]: value for key, value in sorted(EVENTS_INDEXED.values.items())},
+        "rpc_latency": RPC_LATENCY.summary(),
+        "rpc_errors": {key[0]: value for key, value in sorted(RPC_ERRORS.values.items())},
+        "db_write_latency": DB_WRITE_LATENCY.summary(),
+        "metadata_fetch_latency": METADATA_FETCH_LATENCY.summary(),
+        "metadata_fetch_failures": {key[0]: value for key, value in sorted(METADATA_FETCH_FAILURES.values.items())},
+        "response_cache": {",".join(key): value for key, value in sorted(RESPONSE_CACHE_LOOKUPS.values.items())},
+        "singleflight": coalescing_ratio(),
+    }
+
+
+async def serve_metrics(host: str, port: int):
+    """独立worker进程的最小HTTP服务，只提供GET /metrics"""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            # 读完请求头
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode(errors="replace").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, body = "200 OK", REGISTRY.render().encode()
+            else:
+                status, body = "404 Not Found", b"not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    print(f"📈 Serving metrics on http://{host}:{port}/metrics")
+    async with server:
+        await server.serve_forever()
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, Numeric, Boolean, DateTime, Text, Index
+from sqlalchemy import Column, Integer, BigInteger, String, Numeric, Boolean, DateTime, Text, Index, UniqueConstraint, Computed, ForeignKey
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -29,6 +31,24 @@ class NFT(Base):
     # 状态
     is_burned = Column(Boolean, default=False, index=True)
     
+    # 最后一个已应用事件的位置，重放旧区块时不会覆盖更新的状态
+    last_event_block = Column(Integer, nullable=False, default=0)
+    last_event_log_index = Column(Integer, nullable=False, default=0)
+    
+    # 最后一个事件是否已达到确认深度（False表示pending，可能因重组回滚）
+    is_final = Column(Boolean, nullable=False, default=True)
+    
+    # 全文检索向量（数据库生成列，列表查询不加载）
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(category, '')), 'B') || "
+            "setweight(to_tsvector('simple', coalesce(description, '')), 'C')",
+            persisted=True,
+        ),
+    ))
+    
     # 时间戳
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -45,7 +65,8 @@ class Transaction(Base):
     __tablename__ = "transactions"
     
     id = Column(Integer, primary_key=True, index=True)
-    tx_hash = Column(String(66), unique=True, nullable=False, index=True)
+    tx_hash = Column(String(66), nullable=False, index=True)
+    log_index = Column(Integer, nullable=False, default=0)
     block_number = Column(Integer, nullable=False, index=True)
     
     # 交易类型: mint, list, buy, cancel, burn
@@ -61,6 +82,9 @@ class Transaction(Base):
     # 价格（如果适用）
     price = Column(Numeric(precision=78, scale=0), nullable=True)
     
+    # 是否已达到确认深度（False表示pending，可能因重组回滚）
+    is_final = Column(Boolean, nullable=False, default=True)
+    
     # 时间戳
     timestamp = Column(DateTime(timezone=True), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -69,6 +93,8 @@ class Transaction(Base):
     __table_args__ = (
         Index('idx_token_type', 'token_id', 'tx_type'),
         Index('idx_from_type', 'from_address', 'tx_type'),
+        # 一笔交易可以产生多个事件，以(tx_hash, log_index)唯一标识
+        UniqueConstraint('tx_hash', 'log_index', name='uq_transactions_tx_log'),
     )
 
 
@@ -77,4 +103,51 @@ class IndexerState(Base):
     
     id = Column(Integer, primary_key=True)
     last_indexed_block = Column(Integer, nullable=False, default=0)
+    last_indexed_hash = Column(String(66))  # 检查点区块哈希，用于检测重组
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class Block(Base):
+    __tablename__ = "blocks"
+    
+    number = Column(Integer, primary_key=True)
+    hash = Column(String(66), nullable=False)
+    parent_hash = Column(String(66), nullable=False)
+    timestamp = Column(BigInteger, nullable=False)  # Unix时间戳（秒）
+
+
+class LegacyLogIndex(Base):
+    """V3之前写入、log_index待核实的交易记录"""
+    __tablename__ = "legacy_log_index"
+    
+    transaction_id = Column(Integer, ForeignKey("transactions.id", ondelete="CASCADE"), primary_key=True)
+    block_number = Column(Integer, nullable=False, index=True)
+
+
+class MetadataTask(Base):
+    __tablename__ = "metadata_queue"
+    
+    token_id = Column(Integer, primary_key=True)
+    token_uri = Column(Text, nullable=False)
+    
+    # 状态: pending, done, failed
+    status = Column(String(20), nullable=False, default="pending", index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_error = Column(Text)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+class MarketStats(Base):
+    """市场统计汇总（单行，由数据库触发器增量维护）"""
+    __tablename__ = "market_stats"
+    
+    id = Column(Integer, primary_key=True)
+    total_nfts = Column(BigInteger, nullable=False, default=0)
+    total_listed = Column(BigInteger, nullable=False, default=0)
+    total_sold = Column(BigInteger, nullable=False, default=0)
+    total_volume = Column(Numeric(precision=78, scale=0), nullable=False, default=0)
+    floor_price = Column(Numeric(precision=78, scale=0), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
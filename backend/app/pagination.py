@@ -0,0 +1,79 @@
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Optional, Tuple
+from sqlalchemy import and_, or_, tuple_
+
+
+class InvalidCursor(ValueError):
+    """游标无法解析或与当前排序不匹配"""
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(sort_key: str, value: Any, row_id: int) -> str:
+    """把最后一行的排序值和id编码成不透明游标"""
+    payload = json.dumps([sort_key, _encode_value(value), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_key: str, column) -> Tuple[Any, int]:
+    """解析游标，返回(排序值, id)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key, value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor("Malformed cursor") from e
+    if key != sort_key or not isinstance(row_id, int):
+        raise InvalidCursor("Cursor does not match the requested sort")
+
+    if value is None:
+        return None, row_id
+    try:
+        python_type = column.type.python_type
+        if python_type is datetime:
+            value = datetime.fromisoformat(value)
+        elif python_type is Decimal:
+            value = Decimal(value)
+    except (ValueError, TypeError, ArithmeticError) as e:
+        raise InvalidCursor("Malformed cursor value") from e
+    return value, row_id
+
+
+def keyset_condition(column, id_column, value: Any, row_id: int, descending: bool, nullable: bool = False):
+    """ORDER BY (column, id) 中位于游标之后的行；可空列按NULLS LAST排序"""
+    if value is None:
+        # 已经翻到NULL部分，只按id继续
+        return and_(column.is_(None), id_column < row_id if descending else id_column > row_id)
+
+    if descending:
+        condition = tuple_(column, id_column) < tuple_(value, row_id)
+    else:
+        condition = tuple_(column, id_column) > tuple_(value, row_id)
+    if nullable:
+        condition = or_(condition, column.is_(None))
+    return condition
+
+
+def order_by(column, id_column, descending: bool, nullable: bool = False) -> tuple:
+    if descending:
+        primary = column.desc().nulls_last() if nullable else column.desc()
+        return primary, id_column.desc()
+    primary = column.asc().nulls_last() if nullable else column.asc()
+    return primary, id_column.asc()
+
+
+def next_cursor(rows: list, limit: int, sort_key: str, column_name: str) -> Tuple[list, Optional[str]]:
+    """多取一行判断是否还有下一页，返回(本页行, 下一页游标)"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(sort_key, getattr(last, column_name), last.id)
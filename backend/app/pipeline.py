@@ -0,0 +1,158 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+from app.config import settings
+
+
+class RangeJob:
+    """流水线中的一个区块范围，各阶段依次填充结果"""
+
+    __slots__ = ("from_block", "to_block", "logs", "events", "headers")
+
+    def __init__(self, from_block: int, to_block: int):
+        self.from_block = from_block
+        self.to_block = to_block
+        self.logs = None
+        self.events = None
+        self.headers = None
+
+
+class Stage:
+    """流水线阶段：从inbox按顺序取任务，最多concurrency个并发执行
+
+    输出队列里放的是按输入顺序排列的task，下游按顺序等待，
+    因此并发执行也不会打乱区块顺序；输出队列满时阻塞（背压）。
+    """
+
+    def __init__(self, name: str, fn: Callable[[RangeJob], Awaitable[None]], concurrency: int, queue_size: int):
+        self.name = name
+        self.fn = fn
+        self.concurrency = concurrency
+        self.outbox = asyncio.Queue(maxsize=queue_size)
+        self.busy = 0
+        self.processed = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._tasks = set()
+
+    async def _process(self, item) -> RangeJob:
+        try:
+            # 上游阶段的task，先等它完成
+            job = await item if isinstance(item, asyncio.Future) else item
+            self.busy += 1
+            try:
+                await self.fn(job)
+            finally:
+                self.busy -= 1
+            self.processed += 1
+            return job
+        finally:
+            self._semaphore.release()
+
+    async def run(self, inbox: asyncio.Queue):
+        while True:
+            item = await inbox.get()
+            await self._semaphore.acquire()
+            task = asyncio.create_task(self._process(item))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            await self.outbox.put(task)
+
+    def cancel(self):
+        for task in list(self._tasks):
+            task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.outbox.qsize(),
+            "busy": self.busy,
+            "concurrency": self.concurrency,
+            "processed": self.processed,
+        }
+
+
+class IndexPipeline:
+    """索引流水线：范围规划 → 获取日志 → 解码 → 获取区块头 → 有序写库
+
+    各阶段通过有界队列连接，写入范围N时范围N+1已经在获取，RPC和数据库同时忙碌。
+    任何阶段出错（包括检测到重组）都会终止整条流水线，由索引循环处理后从检查点重建。
+    元数据不在流水线中获取，由MetadataEnricher从metadata_queue异步补全。
+    """
+
+    def __init__(self, indexer):
+        self.indexer = indexer
+        queue_size = settings.PIPELINE_QUEUE_SIZE
+        self.planned = asyncio.Queue(maxsize=queue_size)
+        self.stages = [
+            Stage("fetch", self.fetch, settings.PIPELINE_FETCH_WORKERS, queue_size),
+            Stage("decode", self.decode, settings.PIPELINE_DECODE_WORKERS, queue_size),
+            Stage("headers", self.fetch_headers, settings.PIPELINE_HEADER_WORKERS, queue_size),
+        ]
+        self.written = 0
+        self.cursor: Optional[int] = None
+
+    async def fetch(self, job: RangeJob):
+        job.logs = await self.indexer.fetch_logs(job.from_block, job.to_block)
+
+    async def decode(self, job: RangeJob):
+        job.events = self.indexer.decode_logs(job.logs)
+
+    async def fetch_headers(self, job: RangeJob):
+        job.headers = await self.indexer.fetch_range_headers(job.from_block, job.to_block, job.events)
+
+    async def plan(self, last_block: int):
+        """按AIMD窗口切分区块范围，追上最新区块后等待新区块"""
+        indexer = self.indexer
+        self.cursor = last_block
+        while True:
+            if self.cursor < indexer.latest_block:
+                to_block = min(self.cursor + indexer.ranges.window, indexer.latest_block)
+                await self.planned.put(RangeJob(self.cursor + 1, to_block))
+                self.cursor = to_block
+                continue
+
+            await indexer.wait_for_new_head()
+            indexer.latest_block = await indexer.get_latest_block()
+
+    async def write(self):
+        """唯一的写入者：按范围顺序应用并推进检查点"""
+        indexer = self.indexer
+        started = time.monotonic()
+        while True:
+            job = await self.stages[-1].outbox.get()
+            job = await job
+            await indexer.apply_range(job.from_block, job.to_block, job.events, job.headers, job.logs)
+            self.written += 1
+
+            elapsed = time.monotonic() - started
+            indexer.ranges.record_progress(job.to_block - job.from_block + 1, elapsed)
+            started = time.monotonic()
+            print(f"✅ Indexed blocks {job.from_block} to {job.to_block}")
+
+    async def run(self, last_block: int):
+        """从last_block之后开始运行，直到某个阶段出错"""
+        inbox = self.planned
+        tasks = [asyncio.create_task(self.plan(last_block))]
+        for stage in self.stages:
+            tasks.append(asyncio.create_task(stage.run(inbox)))
+            inbox = stage.outbox
+        tasks.append(asyncio.create_task(self.write()))
+
+        try:
+            # 各阶段都是无限循环，任何一个结束都意味着出错
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            for stage in self.stages:
+                stage.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "planned_queue_depth": self.planned.qsize(),
+            "planned_up_to": self.cursor,
+            "stages": {stage.name: stage.stats() for stage in self.stages},
+            "written_ranges": self.written,
+        }
@@ -0,0 +1,71 @@
+import httpx
+from app.config import settings
+from app.rpc import RPCError, RANGE_ERROR_HINTS, is_endpoint_failure
+
+
+def is_range_error(exc: Exception) -> bool:
+    """判断错误是否意味着应该缩小getLogs的区块范围
+    
+    限流等节点故障（如"rate limit exceeded"）不算：拆分范围只会让请求翻倍，应该退避重试。
+    """
+    if isinstance(exc, httpx.TimeoutException):
+        return True
+    if is_endpoint_failure(exc):
+        return False
+    if isinstance(exc, RPCError):
+        message = exc.message.lower()
+        return any(hint in message for hint in RANGE_ERROR_HINTS)
+    return False
+
+
+class AdaptiveRangeController:
+    """eth_getLogs区块范围的AIMD控制器：响应小且快时加性增大，失败时乘性减半"""
+
+    def __init__(
+        self,
+        initial: int = None,
+        min_range: int = None,
+        max_range: int = None,
+        increase: int = None,
+        target_logs: int = None,
+        target_seconds: float = None,
+    ):
+        self.min_range = min_range or settings.MIN_BLOCK_RANGE
+        self.max_range = max_range or settings.MAX_BLOCK_RANGE
+        self.increase = increase or settings.BLOCK_RANGE_INCREASE
+        self.target_logs = target_logs or settings.BLOCK_RANGE_TARGET_LOGS
+        self.target_seconds = target_seconds or settings.BLOCK_RANGE_TARGET_SECONDS
+        initial = initial or settings.INITIAL_BLOCK_RANGE
+        self.window = max(self.min_range, min(initial, self.max_range))
+        self.blocks_per_sec = 0.0
+        self.failures = 0
+
+    def on_success(self, logs: int, elapsed: float):
+        """一次getLogs成功：结果少且耗时短则扩大窗口"""
+        if logs < self.target_logs and elapsed < self.target_seconds:
+            self.window = min(self.max_range, self.window + self.increase)
+        elif logs > self.target_logs * 2:
+            # 结果过多时提前收缩，避免下一次触发节点限制
+            self.window = max(self.min_range, self.window * 3 // 4)
+
+    def on_failure(self):
+        """范围过大/超时：窗口减半"""
+        self.failures += 1
+        self.window = max(self.min_range, self.window // 2)
+
+    def record_progress(self, blocks: int, elapsed: float):
+        """记录索引吞吐量（指数移动平均）"""
+        if elapsed <= 0:
+            return
+        rate = blocks / elapsed
+        if self.blocks_per_sec:
+            self.blocks_per_sec = 0.8 * self.blocks_per_sec + 0.2 * rate
+        else:
+            self.blocks_per_sec = rate
+
+    def stats(self) -> dict:
+        return {
+            "block_range": self.window,
+            "blocks_per_sec": round(self.blocks_per_sec, 2),
+            "range_failures": self.failures,
+        }
@@ -0,0 +1,227 @@
+import asyncio
+from typing import Dict, List, Optional
+from hexbytes import HexBytes
+from web3 import Web3
+from app.database import AsyncSessionLocal
+from app.config import settings
+from app.indexer import CONTRACT_ABI
+from app.rpc import RPCPool
+from app import crud
+
+
+# Multicall3 aggregate3 的最小ABI
+MULTICALL3_ABI = [
+    {
+        "name": "aggregate3",
+        "type": "function",
+        "stateMutability": "payable",
+        "inputs": [
+            {
+                "name": "calls",
+                "type": "tuple[]",
+                "components": [
+                    {"name": "target", "type": "address"},
+                    {"name": "allowFailure", "type": "bool"},
+                    {"name": "callData", "type": "bytes"},
+                ],
+            }
+        ],
+        "outputs": [
+            {
+                "name": "returnData",
+                "type": "tuple[]",
+                "components": [
+                    {"name": "success", "type": "bool"},
+                    {"name": "returnData", "type": "bytes"},
+                ],
+            }
+        ],
+    }
+]
+
+# 每个token读取的合约方法
+RECONCILE_CALLS = ("ownerOf", "getNFTInfo", "getListing")
+
+
+class Reconciler:
+    """链上状态对账：通过Multicall3批量读取ownerOf/getNFTInfo/getListing，与nfts表比对并修复"""
+
+    def __init__(self, rpc: RPCPool = None):
+        self.rpc = rpc or RPCPool()
+        self.w3 = Web3()
+        self.contract = self.w3.eth.contract(
+            address=Web3.to_checksum_address(settings.CONTRACT_ADDRESS),
+            abi=CONTRACT_ABI,
+        )
+        self.multicall = self.w3.eth.contract(
+            address=Web3.to_checksum_address(settings.MULTICALL3_ADDRESS),
+            abi=MULTICALL3_ABI,
+        )
+        self.output_types = {
+            name: [output["type"] for output in self.contract.get_function_by_name(name).abi["outputs"]]
+            for name in RECONCILE_CALLS + ("getTotalMinted",)
+        }
+        self.multicall_available = None
+
+    async def close(self):
+        await self.rpc.close()
+
+    async def eth_call(self, to: str, data: str, block: int) -> HexBytes:
+        return HexBytes(await self.rpc.call("eth_call", [{"to": to, "data": data}, hex(block)]))
+
+    async def read_calls(self, call_data: List[str], block: int) -> List[Optional[bytes]]:
+        """执行一组合约调用，失败（revert）的调用返回None"""
+        if self.multicall_available is None:
+            code = await self.rpc.call("eth_getCode", [self.multicall.address, hex(block)])
+            self.multicall_available = code not in (None, "0x", "0x0")
+            if not self.multicall_available:
+                print("⚠️  Multicall3 not deployed, falling back to batched eth_call")
+
+        if self.multicall_available:
+            data = self.multicall.encodeABI(
+                fn_name="aggregate3",
+                args=[[(self.contract.address, True, HexBytes(item)) for item in call_data]],
+            )
+            result = await self.eth_call(self.multicall.address, data, block)
+            (returns,) = self.w3.codec.decode(["(bool,bytes)[]"], result)
+            return [return_data if success else None for success, return_data in returns]
+
+        # 没有Multicall3（如本地开发链）：并发的eth_call会被RPC客户端合并成批量请求
+        results = await asyncio.gather(
+            *(self.eth_call(self.contract.address, item, block) for item in call_data),
+            return_exceptions=True,
+        )
+        return [None if isinstance(result, BaseException) else result for result in results]
+
+    async def read_chain_state(self, token_ids: List[int], block: int) -> Dict[int, Optional[dict]]:
+        """读取一批token在指定区块的链上状态；不存在或已销毁的token为None"""
+        call_data = [
+            self.contract.encodeABI(fn_name=name, args=[token_id])
+            for token_id in token_ids
+            for name in RECONCILE_CALLS
+        ]
+        results = await self.read_calls(call_data, block)
+
+        states = {}
+        for i, token_id in enumerate(token_ids):
+            owner_data, info_data, listing_data = results[i * 3:i * 3 + 3]
+            if owner_data is None or info_data is None:
+                states[token_id] = None
+                continue
+            (owner,) = self.w3.codec.decode(self.output_types["ownerOf"], owner_data)
+            creator, royalty_percent, category, _, uri = self.w3.codec.decode(
+                self.output_types["getNFTInfo"], info_data
+            )
+            price, seller, is_listed = self.w3.codec.decode(self.output_types["getListing"], listing_data)
+            states[token_id] = {
+                "owner": owner.lower(),
+                "creator": creator.lower(),
+                "royalty_percent": royalty_percent,
+                "category": category,
+                "token_uri": uri,
+                "is_listed": is_listed,
+                "price": str(price) if is_listed else None,
+                "seller": seller.lower() if is_listed else None,
+                "is_burned": False,
+            }
+        return states
+
+    @staticmethod
+    def diff(nft, chain: Optional[dict]) -> Optional[dict]:
+        """返回需要修复的列；一致时返回None"""
+        if chain is None:
+            if nft.is_burned:
+                return None
+            return {"is_burned": True, "is_listed": False, "price": None, "seller": None}
+
+        changes = {}
+        for column, value in chain.items():
+            current = getattr(nft, column)
+            if column == "price" and current is not None:
+                current = str(current)
+            if current != value:
+                changes[column] = value
+        return changes or None
+
+    async def reconcile_tokens(
+        self,
+        token_ids: List[int],
+        block: int,
+        dry_run: bool = False,
+        report: Optional[dict] = None,
+    ) -> dict:
+        """按区块block的链上状态对账一组token（不超过RECONCILE_BATCH_SIZE），统计累加到report"""
+        if report is None:
+            report = {"block": block, "checked": 0, "mismatched": 0, "repaired": 0, "missing": 0, "inserted": 0}
+        chain_states = await self.read_chain_state(token_ids, block)
+
+        async with AsyncSessionLocal() as db:
+            nfts = {nft.token_id: nft for nft in await crud.get_nfts_by_token_ids(db, token_ids)}
+
+            repairs = {}
+            missing = []
+            for token_id in token_ids:
+                chain = chain_states[token_id]
+                nft = nfts.get(token_id)
+                if nft is None:
+                    if chain is not None:
+                        missing.append({"token_id": token_id, **chain})
+                    continue
+                changes = self.diff(nft, chain)
+                if changes:
+                    repairs[token_id] = changes
+
+            report["checked"] += len(token_ids)
+            report["mismatched"] += len(repairs)
+            report["missing"] += len(missing)
+            if not dry_run and (repairs or missing):
+                await crud.repair_nfts(db, repairs, missing, block)
+                report["repaired"] += len(repairs)
+                report["inserted"] += len(missing)
+
+        print(f"🔍 Reconciled tokens {token_ids[0]} to {token_ids[-1]} "
+              f"({len(repairs)} mismatched, {len(missing)} missing)")
+        return report
+
+    async def run(self, from_token: int = 0, to_token: int = None, dry_run: bool = False) -> dict:
+        """对账token区间[from_token, to_token]，返回统计"""
+        async with AsyncSessionLocal() as db:
+            state = await crud.get_indexer_state(db)
+        # 在索引器检查点所在区块读取链上状态，保证与数据库可比
+        block = state.last_indexed_block if state else await self.rpc.block_number()
+
+        if to_token is None:
+            data = self.contract.encodeABI(fn_name="getTotalMinted")
+            (total,) = self.w3.codec.decode(
+                self.output_types["getTotalMinted"],
+                await self.eth_call(self.contract.address, data, block),
+            )
+            to_token = total - 1
+
+        report = {"block": block, "checked": 0, "mismatched": 0, "repaired": 0, "missing": 0, "inserted": 0}
+        batch_size = settings.RECONCILE_BATCH_SIZE
+        for start in range(from_token, to_token + 1, batch_size):
+            token_ids = list(range(start, min(start + batch_size, to_token + 1)))
+            await self.reconcile_tokens(token_ids, block, dry_run, report)
+
+        return report
+
+
+async def start_reconciler():
+    """定期运行对账"""
+    if not settings.RECONCILE_INTERVAL:
+        return
+
+    reconciler = Reconciler()
+    try:
+        while True:
+            await asyncio.sleep(settings.RECONCILE_INTERVAL)
+            try:
+                report = await reconciler.run()
+                print(f"✅ Reconciliation finished: {report}")
+            except Exception as e:
+                print(f"❌ Reconciliation error: {e}")
+                import traceback
+                traceback.print_exc()
+    finally:
+        await reconciler.close()
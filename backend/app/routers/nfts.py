@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from app.database import get_db
 from app import crud, schemas
+from app.pagination import InvalidCursor
+from app.cache import response_cache, make_key, list_tags, token_tag
+from app.singleflight import coalesced_query
 
 router = APIRouter(prefix="/nfts", tags=["NFTs"])
 
@@ -11,28 +14,38 @@ router = APIRouter(prefix="/nfts", tags=["NFTs"])
 async def list_nfts(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="上一页返回的next_cursor；传入时忽略skip"),
+    include_total: bool = Query(True, description="是否计算总数（无限滚动可关闭）"),
     category: Optional[str] = None,
     is_listed: Optional[bool] = None,
     owner: Optional[str] = None,
     creator: Optional[str] = None,
     search: Optional[str] = None,
-    sort_by: str = Query("created_at", regex="^(created_at|price|token_id)$"),
+    search_mode: str = Query("substring", regex="^(fulltext|substring|prefix)$"),
+    sort_by: str = Query("created_at", regex="^(created_at|price|token_id|relevance)$"),
     sort_order: str = Query("desc", regex="^(asc|desc)$"),
-    db: AsyncSession = Depends(get_db),
 ):
-    """获取NFT列表"""
-    nfts, total = await crud.get_nfts(
-        db=db,
-        skip=skip,
-        limit=limit,
-        category=category,
-        is_listed=is_listed,
-        owner=owner,
-        creator=creator,
-        search=search,
-        sort_by=sort_by,
-        sort_order=sort_order,
+    """获取NFT列表（响应缓存，NFT变更时按分类/拥有者/创作者失效；相同的并发查询合并执行）"""
+    params = {
+        "skip": skip, "limit": limit, "cursor": cursor, "include_total": include_total,
+        "category": category, "is_listed": is_listed, "owner": owner, "creator": creator,
+        "search": search, "search_mode": search_mode, "sort_by": sort_by, "sort_order": sort_order,
+    }
+    
+    async def load() -> bytes:
+        return (await _list_nfts(params)).model_dump_json().encode()
+    
+    content = await response_cache.get_or_load(
+        "nfts:list", make_key("nfts:list", params), list_tags(category, owner, creator), load
     )
+    return Response(content=content, media_type="application/json")
+
+
+async def _list_nfts(params: dict) -> schemas.NFTListResponse:
+    try:
+        nfts, total, next_cursor = await coalesced_query("nfts:list", crud.get_nfts, **params)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     # 转换price为字符串
     nft_responses = []
@@ -52,12 +65,13 @@ async def list_nfts(
             "price": str(nft.price) if nft.price else None,
             "seller": nft.seller,
             "is_burned": nft.is_burned,
+            "is_final": nft.is_final,
             "created_at": nft.created_at,
             "updated_at": nft.updated_at,
         }
         nft_responses.append(schemas.NFTResponse(**nft_dict))
     
-    return schemas.NFTListResponse(total=total, items=nft_responses)
+    return schemas.NFTListResponse(total=total, items=nft_responses, next_cursor=next_cursor)
 
 
 @router.get("/{token_id}", response_model=schemas.NFTResponse)
@@ -65,7 +79,18 @@ async def get_nft(
     token_id: int,
     db: AsyncSession = Depends(get_db),
 ):
-    """获取单个NFT详情"""
+    """获取单个NFT详情（响应缓存，该token变更时失效）"""
+    
+    async def load() -> bytes:
+        return (await _get_nft(db, token_id)).model_dump_json().encode()
+    
+    content = await response_cache.get_or_load(
+        "nfts:detail", make_key("nfts:detail", {"token_id": token_id}), [token_tag(token_id)], load
+    )
+    return Response(content=content, media_type="application/json")
+
+
+async def _get_nft(db: AsyncSession, token_id: int) -> schemas.NFTResponse:
     nft = await crud.get_nft_by_token_id(db, token_id)
     
     if not nft:
@@ -86,6 +111,7 @@ async def get_nft(
         "price": str(nft.price) if nft.price else None,
         "seller": nft.seller,
         "is_burned": nft.is_burned,
+        "is_final": nft.is_final,
         "created_at": nft.created_at,
         "updated_at": nft.updated_at,
     }
@@ -94,9 +120,7 @@ async def get_nft(
 
 
 @router.get("/stats/summary", response_model=schemas.StatsResponse)
-async def get_stats(
-    db: AsyncSession = Depends(get_db),
-):
-    """获取市场统计数据"""
-    stats = await crud.get_stats(db)
+async def get_stats():
+    """获取市场统计数据（相同的并发查询合并执行）"""
+    stats = await coalesced_query("stats", crud.get_stats)
     return schemas.StatsResponse(**stats)
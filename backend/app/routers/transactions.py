@@ -1,8 +1,8 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, HTTPException, Query
 from typing import Optional
-from app.database import get_db
 from app import crud, schemas
+from app.pagination import InvalidCursor
+from app.singleflight import coalesced_query
 
 router = APIRouter(prefix="/transactions", tags=["Transactions"])
 
@@ -11,20 +11,27 @@ router = APIRouter(prefix="/transactions", tags=["Transactions"])
 async def list_transactions(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="上一页返回的next_cursor；传入时忽略skip"),
+    include_total: bool = Query(True, description="是否计算总数（无限滚动可关闭）"),
     token_id: Optional[int] = None,
     tx_type: Optional[str] = None,
     address: Optional[str] = None,
-    db: AsyncSession = Depends(get_db),
 ):
-    """获取交易列表"""
-    transactions, total = await crud.get_transactions(
-        db=db,
-        skip=skip,
-        limit=limit,
-        token_id=token_id,
-        tx_type=tx_type,
-        address=address,
-    )
+    """获取交易列表（相同的并发查询合并执行）"""
+    try:
+        transactions, total, next_cursor = await coalesced_query(
+            "transactions:list",
+            crud.get_transactions,
+            skip=skip,
+            limit=limit,
+            token_id=token_id,
+            tx_type=tx_type,
+            address=address,
+            cursor=cursor,
+            include_total=include_total,
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     # 转换price为字符串
     tx_responses = []
@@ -32,15 +39,17 @@ async def list_transactions(
         tx_dict = {
             "id": tx.id,
             "tx_hash": tx.tx_hash,
+            "log_index": tx.log_index,
             "block_number": tx.block_number,
             "tx_type": tx.tx_type,
             "token_id": tx.token_id,
             "from_address": tx.from_address,
             "to_address": tx.to_address,
             "price": str(tx.price) if tx.price else None,
+            "is_final": tx.is_final,
             "timestamp": tx.timestamp,
             "created_at": tx.created_at,
         }
         tx_responses.append(schemas.TransactionResponse(**tx_dict))
     
-    return schemas.TransactionListResponse(total=total, items=tx_responses)
+    return schemas.TransactionListResponse(total=total, items=tx_responses, next_cursor=next_cursor)
@@ -0,0 +1,442 @@
+import asyncio
+import itertools
+import time
+from typing import Any, List, Sequence, Tuple
+from hexbytes import HexBytes
+from web3 import Web3
+from web3.datastructures import AttributeDict
+from app.config import settings
+from app import metrics
+import httpx
+
+
+class RPCError(Exception):
+    """JSON-RPC返回的错误"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"RPC error {code}: {message}")
+        self.code = code
+        self.message = message
+
+
+def format_log(log: dict) -> AttributeDict:
+    """把eth_getLogs的原始JSON转换成web3事件解码所需的格式"""
+    return AttributeDict({
+        'address': Web3.to_checksum_address(log['address']),
+        'blockHash': HexBytes(log['blockHash']),
+        'blockNumber': int(log['blockNumber'], 16),
+        'data': HexBytes(log['data']),
+        'logIndex': int(log['logIndex'], 16),
+        'removed': log.get('removed', False),
+        'topics': [HexBytes(topic) for topic in log['topics']],
+        'transactionHash': HexBytes(log['transactionHash']),
+        'transactionIndex': int(log['transactionIndex'], 16),
+    })
+
+
+class RPCMethods:
+    """基于call()的常用RPC方法"""
+
+    async def block_number(self) -> int:
+        return int(await self.call("eth_blockNumber"), 16)
+
+    async def get_raw_logs(self, filter_params: dict) -> List[dict]:
+        """eth_getLogs原始JSON结果（由app.decoder直接解码）"""
+        params = dict(filter_params)
+        for key in ('fromBlock', 'toBlock'):
+            if isinstance(params.get(key), int):
+                params[key] = hex(params[key])
+        return await self.call("eth_getLogs", [params])
+
+    async def get_logs(self, filter_params: dict) -> List[AttributeDict]:
+        return [format_log(log) for log in await self.get_raw_logs(filter_params)]
+
+
+class RPCClient(RPCMethods):
+    """非阻塞JSON-RPC客户端（共享连接池 + 并发上限）
+    
+    并发的单个请求会在batch_window内被收集起来，作为一个JSON-RPC批量请求发送；
+    节点不支持批量请求时自动退回逐个发送。
+    """
+
+    def __init__(
+        self,
+        url: str = None,
+        max_concurrency: int = None,
+        timeout: float = None,
+        batch_window: float = None,
+        max_batch_size: int = None,
+    ):
+        self.url = url or settings.RPC_URL
+        max_concurrency = max_concurrency or settings.RPC_MAX_CONCURRENCY
+        self.batch_window = settings.RPC_BATCH_WINDOW if batch_window is None else batch_window
+        self.max_batch_size = max_batch_size or settings.RPC_MAX_BATCH_SIZE
+        self.batch_supported = True
+        self.batches_sent = 0
+        self.batched_calls = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._ids = itertools.count(1)
+        self._pending = []
+        self._flush_handle = None
+        self._dispatching = set()
+        self._client = httpx.AsyncClient(
+            timeout=timeout or settings.RPC_TIMEOUT,
+            limits=httpx.Limits(max_connections=max_concurrency),
+        )
+
+    async def close(self):
+        self._flush()
+        if self._dispatching:
+            await asyncio.gather(*self._dispatching, return_exceptions=True)
+        await self._client.aclose()
+
+    async def _post(self, payload):
+        async with self._semaphore:
+            response = await self._client.post(self.url, json=payload)
+        response.raise_for_status()
+        return response.json()
+
+    @staticmethod
+    def _unwrap(item: dict) -> Any:
+        error = item.get('error')
+        if error:
+            raise RPCError(error.get('code', 0), error.get('message', ''))
+        return item.get('result')
+
+    @staticmethod
+    def _outcome(item: dict) -> Any:
+        """批量响应中的单项：成功返回结果，失败返回RPCError实例"""
+        try:
+            return RPCClient._unwrap(item)
+        except RPCError as e:
+            return e
+
+    async def _call_single(self, method: str, params: Sequence) -> Any:
+        payload = {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": list(params)}
+        return self._unwrap(await self._post(payload))
+
+    async def _send_batch(self, calls: Sequence[Tuple[str, Sequence]]) -> List[Any]:
+        """发送一个批量请求，返回每个调用的结果或RPCError"""
+        if self.batch_supported and len(calls) > 1:
+            ids = [next(self._ids) for _ in calls]
+            payload = [
+                {"jsonrpc": "2.0", "id": request_id, "method": method, "params": list(params)}
+                for request_id, (method, params) in zip(ids, calls)
+            ]
+            try:
+                response = await self._post(payload)
+            except httpx.HTTPStatusError as e:
+                # 429/5xx是节点问题；其余4xx视为不支持批量请求
+                if e.response.status_code == 429 or e.response.status_code >= 500:
+                    raise
+                response = None
+
+            if isinstance(response, list):
+                self.batches_sent += 1
+                self.batched_calls += len(calls)
+                # 批量响应不保证顺序，按id对应
+                by_id = {item.get('id'): item for item in response}
+                return [
+                    self._outcome(by_id[request_id]) if request_id in by_id
+                    # 节点丢掉了某一项：不能当作null结果
+                    else RPCError(-32603, f"missing response for batch request id {request_id}")
+                    for request_id in ids
+                ]
+
+            # 部分节点对整个批量请求只返回一个错误对象，之后改为逐个发送
+            self.batch_supported = False
+            print(f"⚠️  RPC endpoint {self.url} rejected batch request, sending calls individually")
+
+        return await asyncio.gather(
+            *(self._call_single(method, params) for method, params in calls),
+            return_exceptions=True,
+        )
+
+    def _flush(self):
+        """把收集到的请求作为一个批量请求发出"""
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, []
+        if pending:
+            task = asyncio.create_task(self._dispatch(pending))
+            self._dispatching.add(task)
+            task.add_done_callback(self._dispatching.discard)
+
+    async def _dispatch(self, pending: list):
+        try:
+            outcomes = await self._send_batch([(method, params) for method, params, _ in pending])
+        except Exception as e:
+            outcomes = [e] * len(pending)
+        for (_, _, future), outcome in zip(pending, outcomes):
+            if future.done():
+                continue
+            if isinstance(outcome, BaseException):
+                future.set_exception(outcome)
+            else:
+                future.set_result(outcome)
+
+    async def call(self, method: str, params: Sequence = ()) -> Any:
+        """发送单个JSON-RPC请求（可能与其它并发请求合并成批量请求）"""
+        if not self.batch_window or not self.batch_supported or method in UNBATCHED_METHODS:
+            return await self._call_single(method, params)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((method, params, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.batch_window, self._flush)
+        return await future
+
+    async def batch(self, calls: Sequence[Tuple[str, Sequence]]) -> List[Any]:
+        """发送JSON-RPC批量请求，按调用顺序返回结果"""
+        results = []
+        for i in range(0, len(calls), self.max_batch_size):
+            for outcome in await self._send_batch(calls[i:i + self.max_batch_size]):
+                if isinstance(outcome, BaseException):
+                    raise outcome
+                results.append(outcome)
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "batch_supported": self.batch_supported,
+            "batches_sent": self.batches_sent,
+            "batched_calls": self.batched_calls,
+        }
+
+
+# 不参与自动合并的方法（响应大、耗时长，合并会拖慢同批的其它请求）
+UNBATCHED_METHODS = ("eth_getLogs",)
+
+
+# 节点限流的JSON-RPC错误码
+RATE_LIMIT_CODES = (-32005, 429)
+
+# 明确表示限流的错误提示（优先于RANGE_ERROR_HINTS判断）
+RATE_LIMIT_HINTS = (
+    "rate limit",
+    "too many requests",
+    "request rate",
+    "request count",
+    "requests per",
+)
+
+# 各RPC节点对区块范围/结果数量限制的错误提示
+RANGE_ERROR_HINTS = (
+    "too many",
+    "range",
+    "limit",
+    "exceed",
+    "more than",
+    "timeout",
+    "timed out",
+    "response size",
+)
+
+
+def is_rate_limited(exc: RPCError) -> bool:
+    """判断RPC错误是否为限流
+    
+    -32005也被用于"query returned more than 10000 results"这类结果过多的错误，
+    消息命中范围提示时按范围错误处理，不能把健康的节点当成限流切走或隔离。
+    """
+    message = exc.message.lower()
+    if any(hint in message for hint in RATE_LIMIT_HINTS):
+        return True
+    if exc.code in RATE_LIMIT_CODES:
+        return not any(hint in message for hint in RANGE_ERROR_HINTS)
+    return False
+
+
+def is_endpoint_failure(exc: Exception) -> bool:
+    """判断错误是否属于节点本身的问题（网络、超时、限流、5xx），需要换节点重试"""
+    if isinstance(exc, RPCError):
+        return is_rate_limited(exc)
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code == 429 or exc.response.status_code >= 500
+    return isinstance(exc, (httpx.TransportError, ValueError))
+
+
+class Endpoint:
+    """单个RPC节点及其健康统计"""
+
+    def __init__(self, client: RPCClient):
+        self.client = client
+        self.url = client.url
+        self.latency = None  # 指数移动平均（秒）
+        self.error_rate = 0.0  # 指数移动平均
+        self.requests = 0
+        self.errors = 0
+        self.hedges = 0
+        self.consecutive_failures = 0
+        self.quarantined_until = 0.0
+
+    @property
+    def quarantined(self) -> bool:
+        return self.quarantined_until > time.monotonic()
+
+    def score(self) -> float:
+        """越小越好：延迟按错误率加权；还没有样本的节点优先尝试"""
+        if self.latency is None:
+            return 0.0
+        return self.latency * (1 + 10 * self.error_rate)
+
+    def record_success(self, elapsed: float):
+        self.requests += 1
+        self.consecutive_failures = 0
+        self.latency = elapsed if self.latency is None else 0.8 * self.latency + 0.2 * elapsed
+        self.error_rate *= 0.8
+
+    def record_cancelled(self, elapsed: float):
+        """对冲落败被取消：实际延迟至少为elapsed，计入延迟但不影响错误统计
+        
+        否则没有样本的慢节点得分一直为0，始终排在最前，每次请求都要等对冲延迟。
+        """
+        self.requests += 1
+        self.latency = elapsed if self.latency is None else 0.8 * self.latency + 0.2 * max(elapsed, self.latency)
+
+    def record_failure(self):
+        self.requests += 1
+        self.errors += 1
+        self.consecutive_failures += 1
+        self.error_rate = 0.8 * self.error_rate + 0.2
+        if self.consecutive_failures >= settings.RPC_QUARANTINE_THRESHOLD:
+            self.quarantined_until = time.monotonic() + settings.RPC_QUARANTINE_SECONDS
+            print(f"🚧 RPC endpoint {self.url} quarantined for {settings.RPC_QUARANTINE_SECONDS}s")
+
+    def stats(self) -> dict:
+        return {
+            "url": self.url,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 4),
+            "requests": self.requests,
+            "errors": self.errors,
+            "hedges": self.hedges,
+            "quarantined": self.quarantined,
+            **self.client.stats(),
+        }
+
+
+class RPCPool(RPCMethods):
+    """多节点RPC池：按延迟和错误率选择最佳节点，失败时切换节点，慢的getLogs对冲到第二个节点"""
+
+    def __init__(self, urls: List[str] = None, hedge_delay: float = None):
+        urls = urls or settings.rpc_urls_list
+        self.endpoints = [Endpoint(RPCClient(url)) for url in urls]
+        self.hedge_delay = hedge_delay or settings.RPC_HEDGE_DELAY
+
+    async def close(self):
+        for endpoint in self.endpoints:
+            await endpoint.client.close()
+
+    def ranked(self) -> List[Endpoint]:
+        """健康节点按得分排序；全部被隔离时按最早解除隔离的顺序"""
+        healthy = [endpoint for endpoint in self.endpoints if not endpoint.quarantined]
+        if healthy:
+            return sorted(healthy, key=lambda endpoint: endpoint.score())
+        return sorted(self.endpoints, key=lambda endpoint: endpoint.quarantined_until)
+
+    async def _request(self, endpoint: Endpoint, send):
+        started = time.monotonic()
+        try:
+            result = await send(endpoint.client)
+        except asyncio.CancelledError:
+            endpoint.record_cancelled(time.monotonic() - started)
+            raise
+        except Exception as e:
+            if is_endpoint_failure(e):
+                endpoint.record_failure()
+            else:
+                endpoint.record_success(time.monotonic() - started)
+            raise
+        endpoint.record_success(time.monotonic() - started)
+        return result
+
+    async def _with_failover(self, send):
+        """依次尝试各节点，节点故障时切换到下一个"""
+        error = None
+        for endpoint in self.ranked():
+            try:
+                return await self._request(endpoint, send)
+            except Exception as e:
+                if not is_endpoint_failure(e):
+                    raise
+                error = e
+        raise error
+
+    async def _hedged(self, send):
+        """先发给最佳节点，超过hedge_delay未返回时再发给次优节点，取先成功的结果"""
+        endpoints = self.ranked()
+        if len(endpoints) < 2:
+            return await self._with_failover(send)
+
+        primary, secondary = endpoints[0], endpoints[1]
+        tasks = [asyncio.create_task(self._request(primary, send))]
+        tried = [primary]
+        error = None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay)
+            if not done:
+                secondary.hedges += 1
+                tasks.append(asyncio.create_task(self._request(secondary, send)))
+                tried.append(secondary)
+
+            while tasks:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tasks.remove(task)
+                    if task.exception() is None:
+                        return task.result()
+                    if not is_endpoint_failure(task.exception()):
+                        raise task.exception()
+                    error = task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+            # 等取消完成，落败节点的延迟在下一次排序前记录下来
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        # 已发出的请求都因节点故障失败，交给其余节点
+        for endpoint in self.ranked():
+            if endpoint in tried:
+                continue
+            try:
+                return await self._request(endpoint, send)
+            except Exception as e:
+                if not is_endpoint_failure(e):
+                    raise
+                error = e
+        raise error
+
+    async def call(self, method: str, params: Sequence = ()) -> Any:
+        send = lambda client: client.call(method, params)
+        try:
+            with metrics.RPC_LATENCY.time(method=method):
+                if method in HEDGED_METHODS:
+                    return await self._hedged(send)
+                return await self._with_failover(send)
+        except Exception:
+            metrics.RPC_ERRORS.inc(method=method)
+            raise
+
+    async def batch(self, calls: Sequence[Tuple[str, Sequence]]) -> List[Any]:
+        if not calls:
+            return []
+        # 批量请求按其中的方法计时（混合方法记为batch）
+        methods = {method for method, _ in calls}
+        method = methods.pop() if len(methods) == 1 else "batch"
+        try:
+            with metrics.RPC_LATENCY.time(method=method):
+                return await self._with_failover(lambda client: client.batch(calls))
+        except Exception:
+            metrics.RPC_ERRORS.inc(method=method)
+            raise
+
+    def stats(self) -> List[dict]:
+        return [endpoint.stats() for endpoint in self.endpoints]
+
+
+# 耗时长、值得对冲的方法
+HEDGED_METHODS = ("eth_getLogs",)
@@ -37,6 +37,7 @@ class NFTResponse(NFTBase):
     price: Optional[str] = None  # Wei as string
     seller: Optional[str] = None
     is_burned: bool
+    is_final: bool = True
     created_at: datetime
     updated_at: Optional[datetime] = None
     
@@ -46,6 +47,7 @@ class NFTResponse(NFTBase):
 
 class TransactionBase(BaseModel):
     tx_hash: str
+    log_index: int = 0
     block_number: int
     tx_type: str
     token_id: int
@@ -63,6 +65,7 @@ class TransactionResponse(TransactionBase):
     from_address: Optional[str] = None
     to_address: Optional[str] = None
     price: Optional[str] = None
+    is_final: bool = True
     created_at: datetime
     
     class Config:
@@ -70,13 +73,15 @@ class TransactionResponse(TransactionBase):
 
 
 class NFTListResponse(BaseModel):
-    total: int
+    total: Optional[int] = None  # include_total=false时为空
     items: list[NFTResponse]
+    next_cursor: Optional[str] = None  # 没有下一页时为空
 
 
 class TransactionListResponse(BaseModel):
-    total: int
+    total: Optional[int] = None  # include_total=false时为空
     items: list[TransactionResponse]
+    next_cursor: Optional[str] = None  # 没有下一页时为空
 
 
 class StatsResponse(BaseModel):
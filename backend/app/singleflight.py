@@ -0,0 +1,63 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+from app.database import AsyncSessionLocal
+from app.cache import make_key
+from app import metrics
+
+
+class SingleFlight:
+    """合并相同的并发查询：同一个key同时只执行一次，其余调用者等待并共享结果（或异常）
+
+    查询在独立的任务中运行，发起请求的客户端断开不会取消其它调用者等待的查询。
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[Hashable, asyncio.Task] = {}
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        # 所有调用者都已取消时也取出异常，避免"exception was never retrieved"
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._flights.get(key)
+        if task is None:
+            metrics.SINGLEFLIGHT_CALLS.inc(query=self.name, result="executed")
+            task = asyncio.create_task(fn())
+            self._flights[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            metrics.SINGLEFLIGHT_CALLS.inc(query=self.name, result="coalesced")
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+
+_groups: Dict[str, SingleFlight] = {}
+
+
+def group(name: str) -> SingleFlight:
+    if name not in _groups:
+        _groups[name] = SingleFlight(name)
+    return _groups[name]
+
+
+async def coalesced_query(name: str, fn: Callable[..., Awaitable[Any]], **params) -> Any:
+    """以fn(db, **params)执行crud查询，参数相同的并发调用共享一次执行
+
+    查询使用自己的会话，不依赖某一个请求的会话生命周期；返回的ORM对象在调用者之间共享，只能读取。
+    """
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            return await fn(db, **params)
+
+    return await group(name).do(make_key(name, params), run)
+
+
+def stats() -> dict:
+    return {name: flight.in_flight() for name, flight in sorted(_groups.items())}
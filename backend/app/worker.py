@@ -0,0 +1,36 @@
+import asyncio
+from app.config import settings
+from app.indexer import BlockchainIndexer
+from app.enrichment import MetadataEnricher
+from app.reconcile import start_reconciler
+from app.leader import LeaderElection
+
+
+async def run_leader_tasks(indexer: BlockchainIndexer):
+    """只在主节点上运行的任务：索引器和定期对账"""
+    tasks = [indexer.run()]
+    if settings.RECONCILE_INTERVAL:
+        tasks.append(start_reconciler())
+    await asyncio.gather(*tasks)
+
+
+async def start_worker(
+    indexer: BlockchainIndexer = None,
+    enricher: MetadataEnricher = None,
+    election: LeaderElection = None,
+):
+    """启动后台任务：索引器通过advisory lock选主，只有一个实例在索引；
+    元数据补全用SKIP LOCKED领取任务，所有实例都可以运行
+    """
+    indexer = indexer or BlockchainIndexer()
+    enricher = enricher or MetadataEnricher()
+    election = election or LeaderElection()
+    try:
+        await asyncio.gather(
+            election.run(lambda: run_leader_tasks(indexer)),
+            enricher.run(),
+        )
+    finally:
+        await election.release()
+        await indexer.rpc.close()
+        await enricher.close()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Parallel historical backfill of marketplace events"""
+
+import argparse
+import asyncio
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.indexer import BlockchainIndexer, run_backfill
+from app import crud
+
+
+async def backfill(args):
+    indexer = BlockchainIndexer()
+    try:
+        from_block = args.from_block
+        if from_block is None:
+            async with AsyncSessionLocal() as db:
+                state = await crud.get_indexer_state(db)
+            last_block = state.last_indexed_block if state else settings.INDEXER_START_BLOCK
+            from_block = last_block + 1
+        # 确认深度以链头计算：未设置时所有行都会被标记为pending，区块头也绕过缓存
+        indexer.latest_block = await indexer.rpc.block_number()
+        to_block = args.to_block if args.to_block is not None else indexer.latest_block
+
+        if from_block > to_block:
+            print(f"✅ Nothing to backfill (from {from_block} > to {to_block})")
+            return
+
+        await run_backfill(indexer, from_block, to_block, args.workers, args.shard_size)
+        print(f"✅ Backfill finished at block {to_block}")
+    finally:
+        await indexer.rpc.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--from-block", type=int, help="first block (default: checkpoint + 1)")
+    parser.add_argument("--to-block", type=int, help="last block (default: latest block)")
+    parser.add_argument("--workers", type=int, default=settings.BACKFILL_WORKERS)
+    parser.add_argument("--shard-size", type=int, default=settings.BACKFILL_SHARD_SIZE)
+    asyncio.run(backfill(parser.parse_args()))
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: precompiled raw log decoder vs web3 event processing"""
+
+import argparse
+import random
+import time
+from eth_abi import encode
+from eth_utils import event_abi_to_log_topic
+from web3 import Web3
+from app.indexer import CONTRACT_ABI
+from app.decoder import LogDecoder
+from app.rpc import format_log
+
+EVENT_NAMES = ("NFTMinted", "NFTListed", "NFTSold", "ListingCancelled", "NFTBurned")
+CONTRACT_ADDRESS = "0x" + "ab" * 20
+
+
+def random_value(abi_type: str, rng: random.Random):
+    if abi_type == "address":
+        return Web3.to_checksum_address("0x" + rng.randbytes(20).hex())
+    if abi_type == "string":
+        return f"ipfs://Qm{rng.randbytes(22).hex()}"
+    if abi_type == "bool":
+        return rng.random() < 0.5
+    return rng.randrange(10 ** 18)
+
+
+def make_logs(count: int, seed: int = 1) -> list:
+    """按真实eth_getLogs格式生成五种市场事件的原始日志"""
+    rng = random.Random(seed)
+    events = {item["name"]: item for item in CONTRACT_ABI if item.get("type") == "event"}
+    logs = []
+    for i in range(count):
+        event_abi = events[EVENT_NAMES[i % len(EVENT_NAMES)]]
+        topics = ["0x" + event_abi_to_log_topic(event_abi).hex()]
+        data_types, data_values = [], []
+        for param in event_abi["inputs"]:
+            value = random_value(param["type"], rng)
+            if param["indexed"]:
+                topics.append("0x" + encode([param["type"]], [value]).hex())
+            else:
+                data_types.append(param["type"])
+                data_values.append(value)
+        logs.append({
+            "address": CONTRACT_ADDRESS,
+            "blockHash": "0x" + rng.randbytes(32).hex(),
+            "blockNumber": hex(1000000 + i // 10),
+            "data": "0x" + encode(data_types, data_values).hex(),
+            "logIndex": hex(i % 10),
+            "removed": False,
+            "topics": topics,
+            "transactionHash": "0x" + rng.randbytes(32).hex(),
+            "transactionIndex": hex(i % 10),
+        })
+    return logs
+
+
+def web3_decode(logs: list, contract, processors: dict) -> list:
+    """原路径：format_log + contract.events.X().process_log"""
+    return [processors[log["topics"][0]].process_log(format_log(log)) for log in logs]
+
+
+def fast_decode(logs: list, decoder: LogDecoder) -> list:
+    return [decoder.decode(log) for log in logs]
+
+
+def bench(name: str, fn, logs: list, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn(logs)
+        best = min(best, time.perf_counter() - started)
+    rate = len(logs) / best
+    print(f"{name:<10} {rate:>12,.0f} logs/sec  ({best * 1000:.1f} ms for {len(logs)} logs)")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logs", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    w3 = Web3()
+    contract = w3.eth.contract(address=Web3.to_checksum_address(CONTRACT_ADDRESS), abi=CONTRACT_ABI)
+    processors = {}
+    for event_name in EVENT_NAMES:
+        processor = getattr(contract.events, event_name)()
+        processors["0x" + event_abi_to_log_topic(processor.abi).hex()] = processor
+    decoder = LogDecoder(CONTRACT_ABI, EVENT_NAMES)
+
+    logs = make_logs(args.logs)
+
+    # 两条路径的解码结果必须一致
+    for slow, fast in zip(web3_decode(logs[:500], contract, processors), fast_decode(logs[:500], decoder)):
+        assert slow["event"] == fast.name
+        assert slow["blockNumber"] == fast.block_number and slow["logIndex"] == fast.log_index
+        for key, value in slow["args"].items():
+            expected = value.lower() if isinstance(value, str) and value.startswith("0x") else value
+            assert fast.args[key] == expected, (key, fast.args[key], expected)
+
+    slow_rate = bench("web3", lambda batch: web3_decode(batch, contract, processors), logs, args.rounds)
+    fast_rate = bench("fast", lambda batch: fast_decode(batch, decoder), logs, args.rounds)
+    print(f"speedup    {fast_rate / slow_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""Benchmark: NFT search modes (legacy seq-scan ILIKE vs trigram / full-text indexes)
+
+在bench_nfts（结构和索引复制自nfts，需要先执行V8迁移）中生成N个NFT，
+对比旧的ILIKE顺序扫描与新的三元组子串、前缀和全文检索查询的延迟。
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import asyncpg
+from app.config import settings
+
+WORDS = [
+    "cosmic", "pixel", "ape", "dragon", "neon", "genesis", "punk", "azure", "shadow", "golden",
+    "crystal", "samurai", "robot", "lotus", "phoenix", "abstract", "cyber", "ocean", "forest", "ember",
+    "lunar", "solar", "glitch", "vapor", "marble", "velvet", "quantum", "wild", "silent", "crimson",
+]
+CATEGORIES = ["art", "collectibles", "gaming", "music", "photography", "sports", "utility", "virtual-worlds"]
+
+# 与crud.search_condition生成的SQL一致
+QUERIES = {
+    "legacy ilike": (
+        "SELECT id FROM bench_nfts WHERE NOT is_burned AND (name ILIKE $1 OR description ILIKE $1) "
+        "ORDER BY created_at DESC, id DESC LIMIT 20",
+        lambda term: f"%{term}%",
+    ),
+    "substring": (
+        "SELECT id FROM bench_nfts WHERE NOT is_burned AND (name ILIKE $1 OR description ILIKE $1) "
+        "ORDER BY created_at DESC, id DESC LIMIT 20",
+        lambda term: f"%{term}%",
+    ),
+    "prefix": (
+        "SELECT id FROM bench_nfts WHERE NOT is_burned AND name ILIKE $1 "
+        "ORDER BY created_at DESC, id DESC LIMIT 20",
+        lambda term: f"{term}%",
+    ),
+    "fulltext": (
+        "SELECT id FROM bench_nfts WHERE NOT is_burned AND search_vector @@ websearch_to_tsquery('simple', $1) "
+        "ORDER BY ts_rank_cd(search_vector, websearch_to_tsquery('simple', $1)) DESC, id DESC LIMIT 20",
+        lambda term: term,
+    ),
+}
+
+# (查询模式, 搜索词)：常见词、少见组合、几乎无结果
+TERMS = {
+    "legacy ilike": ["dragon", "quantum lotus", "zzqx"],
+    "substring": ["dragon", "quantum lotus", "zzqx"],
+    "prefix": ["cosmic", "crimson ph", "zzqx"],
+    "fulltext": ["dragon", "quantum lotus", "zzqx"],
+}
+
+
+def asyncpg_dsn() -> str:
+    return settings.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://")
+
+
+async def seed(conn, count: int):
+    print(f"📦 Seeding {count:,} rows into bench_nfts...")
+    started = time.perf_counter()
+    await conn.execute("DROP TABLE IF EXISTS bench_nfts")
+    await conn.execute("CREATE TABLE bench_nfts (LIKE nfts INCLUDING ALL)")
+    await conn.execute(
+        """
+        INSERT INTO bench_nfts (
+            id, token_id, token_uri, name, description, image_url, creator, owner, category,
+            royalty_percent, is_listed, price, seller, is_burned,
+            last_event_block, last_event_log_index, is_final, created_at
+        )
+        SELECT
+            n, n, 'ipfs://bench/' || n,
+            initcap(w[1 + (n * 7) % $2]) || ' ' || initcap(w[1 + (n * 13 / 3) % $2]) || ' #' || n,
+            'A ' || w[1 + (n * 11) % $2] || ' ' || w[1 + (n * 17 / 5) % $2] || ' piece from the '
+                || w[1 + (n * 19 / 7) % $2] || ' collection',
+            '', '0x' || lpad(to_hex(n % 5000), 40, '0'), '0x' || lpad(to_hex(n % 50000), 40, '0'),
+            c[1 + n % $3], 500, n % 5 = 0, CASE WHEN n % 5 = 0 THEN n::numeric * 1000000000 END,
+            NULL, n % 100 = 0, n, 0, true, now() - make_interval(secs => n)
+        FROM generate_series(1, $1) AS n, (SELECT $4::text[] AS w, $5::text[] AS c) AS v
+        """,
+        count, len(WORDS), len(CATEGORIES), WORDS, CATEGORIES,
+    )
+    await conn.execute("ANALYZE bench_nfts")
+    print(f"✅ Seeded in {time.perf_counter() - started:.1f}s")
+
+
+async def bench(conn, mode: str, term: str, rounds: int) -> float:
+    sql, make_arg = QUERIES[mode]
+    arg = make_arg(term)
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await conn.fetch(sql, arg)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--skip-seed", action="store_true", help="复用已有的bench_nfts")
+    parser.add_argument("--keep", action="store_true", help="结束后保留bench_nfts")
+    args = parser.parse_args()
+
+    conn = await asyncpg.connect(asyncpg_dsn())
+    try:
+        if not args.skip_seed:
+            await seed(conn, args.rows)
+
+        print(f"{'mode':<14} {'term':<16} {'median':>10}")
+        for mode, terms in TERMS.items():
+            # 旧实现用不上任何索引：关掉索引扫描模拟迁移前的顺序扫描
+            legacy = mode == "legacy ilike"
+            if legacy:
+                await conn.execute("SET enable_bitmapscan = off")
+                await conn.execute("SET enable_indexscan = off")
+            for term in terms:
+                median = await bench(conn, mode, term, args.rounds)
+                print(f"{mode:<14} {term!r:<16} {median:>8.2f}ms")
+            if legacy:
+                await conn.execute("RESET enable_bitmapscan")
+                await conn.execute("RESET enable_indexscan")
+    finally:
+        if not args.keep:
+            await conn.execute("DROP TABLE IF EXISTS bench_nfts")
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Load test: identical concurrent get_nfts calls, with and without single-flight coalescing"""
+
+import argparse
+import asyncio
+import time
+from app.database import AsyncSessionLocal, engine
+from app import crud, metrics
+from app.singleflight import coalesced_query
+
+PARAMS = {"skip": 0, "limit": 20, "is_listed": True, "sort_by": "created_at", "sort_order": "desc"}
+
+
+async def direct_query(category: str):
+    """原路径：每个请求各自打开会话执行查询"""
+    async with AsyncSessionLocal() as db:
+        return await crud.get_nfts(db, category=category, **PARAMS)
+
+
+async def run_wave(name: str, fn, clients: int, waves: int) -> float:
+    started = time.perf_counter()
+    for _ in range(waves):
+        await asyncio.gather(*[fn() for _ in range(clients)])
+    elapsed = time.perf_counter() - started
+    print(f"{name:<12} {clients * waves / elapsed:>10,.0f} req/sec  ({elapsed * 1000:.0f} ms for {clients * waves} requests)")
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=200, help="每一波同时发起的相同请求数")
+    parser.add_argument("--waves", type=int, default=20)
+    parser.add_argument("--category", default="art")
+    args = parser.parse_args()
+
+    # 关闭SQL回显，避免日志输出影响计时
+    engine.echo = False
+    try:
+        await run_wave("direct", lambda: direct_query(args.category), args.clients, args.waves)
+        await run_wave(
+            "coalesced",
+            lambda: coalesced_query("nfts:list", crud.get_nfts, category=args.category, **PARAMS),
+            args.clients,
+            args.waves,
+        )
+        for query, stats in metrics.coalescing_ratio().items():
+            print(f"{query}: executed={stats['executed']:.0f} coalesced={stats['coalesced']:.0f} ratio={stats['ratio']}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,5 @@
+-- 价格倒序翻页：ORDER BY price DESC NULLS LAST, id DESC
+-- btree默认ASC NULLS LAST，反向扫描得到的是DESC NULLS FIRST，与查询顺序不一致，
+-- V7的(price, id)索引在倒序时用不上，需要单独的倒序索引
+CREATE INDEX idx_nfts_price_desc_id ON nfts(price DESC NULLS LAST, id DESC) WHERE NOT is_burned;
+CREATE INDEX idx_nfts_listed_price_desc_id ON nfts(is_listed, price DESC NULLS LAST, id DESC) WHERE NOT is_burned;
@@ -0,0 +1,14 @@
+-- V3之前写入的交易记录没有log_index，ADD COLUMN时一律填成了0，而tx_hash唯一约束已删除：
+-- 重新索引这些区块时(tx_hash, 真实log_index)与旧行不冲突，同一事件会重复入库、market_stats重复计数。
+-- 记录log_index待核实的行：repair_log_index.py按链上日志修正（或删除已重复的旧行），
+-- 在此之前索引器拒绝重新写入包含这些行的区块范围。
+-- V3之后log_index真为0的行也会被列入，核实时原样保留。
+CREATE TABLE legacy_log_index (
+    transaction_id INTEGER PRIMARY KEY REFERENCES transactions(id) ON DELETE CASCADE,
+    block_number INTEGER NOT NULL
+);
+
+CREATE INDEX idx_legacy_log_index_block ON legacy_log_index(block_number);
+
+INSERT INTO legacy_log_index (transaction_id, block_number)
+SELECT id, block_number FROM transactions WHERE log_index = 0;
@@ -0,0 +1,30 @@
+-- 修正V6的nfts更新触发器
+--
+-- V6的注释说executemany不会逐行争用汇总行，这是错的：asyncpg的executemany对每组参数各执行一次语句，
+-- 语句级触发器随之逐行触发（V9的缓存通知同理）。而且旧函数只看转换表里是否有在售行，
+-- 在售NFT只改元数据（名称、图片等）也会重算地板价并锁住market_stats。
+--
+-- 现在按id连接old_rows和new_rows，只统计is_listed/price/is_burned真正变化的行；
+-- 没有这类变化时直接返回，不碰汇总行。
+CREATE OR REPLACE FUNCTION market_stats_nfts_update()
+RETURNS TRIGGER AS $$
+DECLARE
+    d_total BIGINT;
+    d_listed BIGINT;
+    listing_changed BOOLEAN;
+BEGIN
+    SELECT
+        coalesce(sum((NOT n.is_burned)::INT - (NOT o.is_burned)::INT), 0),
+        coalesce(sum((n.is_listed AND NOT n.is_burned)::INT - (o.is_listed AND NOT o.is_burned)::INT), 0),
+        coalesce(bool_or(n.is_listed OR o.is_listed), FALSE)
+    INTO d_total, d_listed, listing_changed
+    FROM old_rows o
+    JOIN new_rows n ON n.id = o.id
+    WHERE n.is_listed IS DISTINCT FROM o.is_listed
+       OR n.price IS DISTINCT FROM o.price
+       OR n.is_burned IS DISTINCT FROM o.is_burned;
+
+    PERFORM market_stats_nfts_apply(d_total, d_listed, listing_changed);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,8 @@
+-- 区块头缓存表（区块号 → 哈希、父哈希、时间戳）
+
+CREATE TABLE blocks (
+    number INTEGER PRIMARY KEY,
+    hash VARCHAR(66) NOT NULL,
+    parent_hash VARCHAR(66) NOT NULL,
+    timestamp BIGINT NOT NULL
+);
@@ -0,0 +1,18 @@
+-- 事件以(tx_hash, log_index)为自然键，支持幂等重放
+
+-- 一笔交易可以产生多个市场事件，tx_hash不再唯一
+ALTER TABLE transactions ADD COLUMN log_index INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE transactions DROP CONSTRAINT transactions_tx_hash_key;
+ALTER TABLE transactions ADD CONSTRAINT uq_transactions_tx_log UNIQUE (tx_hash, log_index);
+
+-- NFT最后一个已应用事件的位置，重放旧区块时不会覆盖更新的状态
+ALTER TABLE nfts ADD COLUMN last_event_block INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE nfts ADD COLUMN last_event_log_index INTEGER NOT NULL DEFAULT 0;
+
+UPDATE nfts SET last_event_block = t.block_number
+FROM (
+    SELECT token_id, MAX(block_number) AS block_number
+    FROM transactions
+    GROUP BY token_id
+) t
+WHERE nfts.token_id = t.token_id;
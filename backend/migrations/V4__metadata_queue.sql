@@ -0,0 +1,21 @@
+-- NFT元数据补全队列（铸造时先写占位名称，由后台任务异步获取元数据）
+
+CREATE TABLE metadata_queue (
+    token_id INTEGER PRIMARY KEY,
+    token_uri TEXT NOT NULL,
+    
+    -- 状态: pending, done, failed
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_error TEXT,
+    
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX idx_metadata_queue_due ON metadata_queue(next_attempt_at) WHERE status = 'pending';
+CREATE INDEX idx_metadata_queue_status ON metadata_queue(status);
+
+CREATE TRIGGER update_metadata_queue_updated_at BEFORE UPDATE ON metadata_queue
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
@@ -0,0 +1,10 @@
+-- 链重组处理：记录检查点区块哈希，未达到确认深度的数据标记为pending
+
+ALTER TABLE indexer_state ADD COLUMN last_indexed_hash VARCHAR(66);
+
+ALTER TABLE transactions ADD COLUMN is_final BOOLEAN NOT NULL DEFAULT TRUE;
+ALTER TABLE nfts ADD COLUMN is_final BOOLEAN NOT NULL DEFAULT TRUE;
+
+-- 只索引pending行，转为final的更新只扫描少量数据
+CREATE INDEX idx_transactions_pending ON transactions(block_number) WHERE NOT is_final;
+CREATE INDEX idx_nfts_pending ON nfts(last_event_block) WHERE NOT is_final;
@@ -0,0 +1,152 @@
+-- 市场统计汇总：由触发器在写入nfts/transactions的同一事务中增量维护，
+-- /api/nfts/stats/summary 只读这一行
+
+CREATE TABLE market_stats (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    total_nfts BIGINT NOT NULL DEFAULT 0,
+    total_listed BIGINT NOT NULL DEFAULT 0,
+    total_sold BIGINT NOT NULL DEFAULT 0,
+    total_volume NUMERIC(78, 0) NOT NULL DEFAULT 0,
+    floor_price NUMERIC(78, 0),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 在售NFT按价格有序，地板价是索引的第一项
+CREATE INDEX idx_nfts_active_listing_price ON nfts(price) WHERE is_listed AND NOT is_burned;
+
+-- 地板价：沿在售价格索引取最小值（O(log n)）
+CREATE OR REPLACE FUNCTION active_floor_price()
+RETURNS NUMERIC AS $$
+    SELECT price FROM nfts
+    WHERE is_listed AND NOT is_burned AND price IS NOT NULL
+    ORDER BY price
+    LIMIT 1;
+$$ LANGUAGE sql STABLE;
+
+-- 全量重算（初始化，或批量导入/清表后修正）
+CREATE OR REPLACE FUNCTION refresh_market_stats()
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO market_stats (id, total_nfts, total_listed, total_sold, total_volume, floor_price, updated_at)
+    SELECT
+        1,
+        (SELECT count(*) FROM nfts WHERE NOT is_burned),
+        (SELECT count(*) FROM nfts WHERE is_listed AND NOT is_burned),
+        (SELECT count(*) FROM transactions WHERE tx_type = 'buy'),
+        (SELECT coalesce(sum(price), 0) FROM transactions WHERE tx_type = 'buy'),
+        active_floor_price(),
+        CURRENT_TIMESTAMP
+    ON CONFLICT (id) DO UPDATE SET
+        total_nfts = EXCLUDED.total_nfts,
+        total_listed = EXCLUDED.total_listed,
+        total_sold = EXCLUDED.total_sold,
+        total_volume = EXCLUDED.total_volume,
+        floor_price = EXCLUDED.floor_price,
+        updated_at = EXCLUDED.updated_at;
+END;
+$$ LANGUAGE plpgsql;
+
+-- nfts：语句级触发器，每条语句只更新一次汇总行（批量upsert/executemany不会逐行争用）
+-- 转换表只能用于单一事件，所以INSERT/UPDATE/DELETE各一个函数
+CREATE OR REPLACE FUNCTION market_stats_nfts_apply(d_total BIGINT, d_listed BIGINT, listing_changed BOOLEAN)
+RETURNS VOID AS $$
+BEGIN
+    -- 只改元数据等其它列时不碰汇总行，避免与索引器争用行锁
+    IF d_total = 0 AND d_listed = 0 AND NOT listing_changed THEN
+        RETURN;
+    END IF;
+    
+    UPDATE market_stats SET
+        total_nfts = total_nfts + d_total,
+        total_listed = total_listed + d_listed,
+        floor_price = CASE WHEN listing_changed THEN active_floor_price() ELSE floor_price END,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = 1;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION market_stats_nfts_insert()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM market_stats_nfts_apply(
+        (SELECT count(*) FROM new_rows WHERE NOT is_burned),
+        (SELECT count(*) FROM new_rows WHERE is_listed AND NOT is_burned),
+        EXISTS (SELECT 1 FROM new_rows WHERE is_listed)
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION market_stats_nfts_update()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM market_stats_nfts_apply(
+        (SELECT count(*) FROM new_rows WHERE NOT is_burned) - (SELECT count(*) FROM old_rows WHERE NOT is_burned),
+        (SELECT count(*) FROM new_rows WHERE is_listed AND NOT is_burned)
+            - (SELECT count(*) FROM old_rows WHERE is_listed AND NOT is_burned),
+        EXISTS (SELECT 1 FROM new_rows WHERE is_listed) OR EXISTS (SELECT 1 FROM old_rows WHERE is_listed)
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION market_stats_nfts_delete()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM market_stats_nfts_apply(
+        -(SELECT count(*) FROM old_rows WHERE NOT is_burned),
+        -(SELECT count(*) FROM old_rows WHERE is_listed AND NOT is_burned),
+        EXISTS (SELECT 1 FROM old_rows WHERE is_listed)
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER market_stats_nfts_insert AFTER INSERT ON nfts
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION market_stats_nfts_insert();
+
+CREATE TRIGGER market_stats_nfts_update AFTER UPDATE ON nfts
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION market_stats_nfts_update();
+
+CREATE TRIGGER market_stats_nfts_delete AFTER DELETE ON nfts
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION market_stats_nfts_delete();
+
+-- transactions：成交笔数和成交额（重复事件被ON CONFLICT DO NOTHING跳过，不会触发）
+CREATE OR REPLACE FUNCTION market_stats_transactions_insert()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE market_stats SET
+        total_sold = total_sold + (SELECT count(*) FROM new_rows WHERE tx_type = 'buy'),
+        total_volume = total_volume + (SELECT coalesce(sum(price), 0) FROM new_rows WHERE tx_type = 'buy'),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = 1 AND EXISTS (SELECT 1 FROM new_rows WHERE tx_type = 'buy');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 重组回滚删除交易时扣减
+CREATE OR REPLACE FUNCTION market_stats_transactions_delete()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE market_stats SET
+        total_sold = total_sold - (SELECT count(*) FROM old_rows WHERE tx_type = 'buy'),
+        total_volume = total_volume - (SELECT coalesce(sum(price), 0) FROM old_rows WHERE tx_type = 'buy'),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = 1 AND EXISTS (SELECT 1 FROM old_rows WHERE tx_type = 'buy');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER market_stats_transactions_insert AFTER INSERT ON transactions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION market_stats_transactions_insert();
+
+CREATE TRIGGER market_stats_transactions_delete AFTER DELETE ON transactions
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION market_stats_transactions_delete();
+
+-- 用现有数据初始化
+SELECT refresh_market_stats();
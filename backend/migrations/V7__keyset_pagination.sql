@@ -0,0 +1,14 @@
+-- 游标分页：(排序列, id) 复合索引，与列表查询的过滤条件和排序一致，
+-- 任意深度的翻页都只需沿索引顺序扫描limit+1行
+
+-- NFT列表只返回未销毁的NFT
+CREATE INDEX idx_nfts_created_id ON nfts(created_at, id) WHERE NOT is_burned;
+CREATE INDEX idx_nfts_price_id ON nfts(price, id) WHERE NOT is_burned;
+CREATE INDEX idx_nfts_listed_created_id ON nfts(is_listed, created_at, id) WHERE NOT is_burned;
+CREATE INDEX idx_nfts_listed_price_id ON nfts(is_listed, price, id) WHERE NOT is_burned;
+CREATE INDEX idx_nfts_category_created_id ON nfts(category, created_at, id) WHERE NOT is_burned;
+
+-- 交易列表按时间倒序
+CREATE INDEX idx_transactions_timestamp_id ON transactions(timestamp, id);
+CREATE INDEX idx_transactions_token_timestamp_id ON transactions(token_id, timestamp, id);
+CREATE INDEX idx_transactions_type_timestamp_id ON transactions(tx_type, timestamp, id);
@@ -0,0 +1,16 @@
+-- NFT搜索：全文检索（带权重排序）+ 三元组索引（子串和前缀匹配/自动补全）
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- 名称权重最高，其次分类和描述；使用simple配置，不做词干处理，中英文名称都能按词匹配
+ALTER TABLE nfts ADD COLUMN search_vector TSVECTOR GENERATED ALWAYS AS (
+    setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(category, '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce(description, '')), 'C')
+) STORED;
+
+CREATE INDEX idx_nfts_search_vector ON nfts USING GIN (search_vector) WHERE NOT is_burned;
+
+-- ILIKE '%x%' / 'x%' 可以走三元组GIN索引（至少3个字符）
+CREATE INDEX idx_nfts_name_trgm ON nfts USING GIN (name gin_trgm_ops) WHERE NOT is_burned;
+CREATE INDEX idx_nfts_description_trgm ON nfts USING GIN (description gin_trgm_ops) WHERE NOT is_burned;
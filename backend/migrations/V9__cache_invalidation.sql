@@ -0,0 +1,94 @@
+-- API响应缓存失效通知：nfts的写入（索引器、元数据补全、对账、重组回滚）提交后，
+-- 通过NOTIFY nft_cache发送受影响的token、分类、拥有者和创作者，API进程据此精确失效缓存
+
+CREATE OR REPLACE FUNCTION nft_cache_notify(token_ids BIGINT[], categories TEXT[], owners TEXT[], creators TEXT[])
+RETURNS VOID AS $$
+DECLARE
+    payload TEXT;
+BEGIN
+    IF coalesce(array_length(token_ids, 1), 0) = 0 THEN
+        RETURN;
+    END IF;
+
+    payload := json_build_object(
+        'tokens', token_ids,
+        'categories', categories,
+        'owners', owners,
+        'creators', creators
+    )::text;
+
+    -- NOTIFY负载上限8000字节，批量写入过大时让所有缓存失效
+    IF octet_length(payload) > 7900 THEN
+        payload := '{"all": true}';
+    END IF;
+
+    PERFORM pg_notify('nft_cache', payload);
+END;
+$$ LANGUAGE plpgsql;
+
+-- 与market_stats相同：语句级触发器 + 转换表，每条语句只发一条通知
+CREATE OR REPLACE FUNCTION nft_cache_nfts_insert()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM nft_cache_notify(
+        ARRAY(SELECT DISTINCT token_id::BIGINT FROM new_rows),
+        ARRAY(SELECT DISTINCT category::TEXT FROM new_rows WHERE category IS NOT NULL),
+        ARRAY(SELECT DISTINCT owner::TEXT FROM new_rows),
+        ARRAY(SELECT DISTINCT creator::TEXT FROM new_rows)
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 更新同时包含旧值和新值：转移后旧拥有者和新拥有者的列表都要失效
+CREATE OR REPLACE FUNCTION nft_cache_nfts_update()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM nft_cache_notify(
+        ARRAY(SELECT DISTINCT token_id::BIGINT FROM new_rows),
+        ARRAY(
+            SELECT category::TEXT FROM new_rows WHERE category IS NOT NULL
+            UNION SELECT category::TEXT FROM old_rows WHERE category IS NOT NULL
+        ),
+        ARRAY(SELECT owner::TEXT FROM new_rows UNION SELECT owner::TEXT FROM old_rows),
+        ARRAY(SELECT creator::TEXT FROM new_rows UNION SELECT creator::TEXT FROM old_rows)
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION nft_cache_nfts_delete()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM nft_cache_notify(
+        ARRAY(SELECT DISTINCT token_id::BIGINT FROM old_rows),
+        ARRAY(SELECT DISTINCT category::TEXT FROM old_rows WHERE category IS NOT NULL),
+        ARRAY(SELECT DISTINCT owner::TEXT FROM old_rows),
+        ARRAY(SELECT DISTINCT creator::TEXT FROM old_rows)
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION nft_cache_nfts_truncate()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('nft_cache', '{"all": true}');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER nft_cache_nfts_insert AFTER INSERT ON nfts
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION nft_cache_nfts_insert();
+
+CREATE TRIGGER nft_cache_nfts_update AFTER UPDATE ON nfts
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION nft_cache_nfts_update();
+
+CREATE TRIGGER nft_cache_nfts_delete AFTER DELETE ON nfts
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION nft_cache_nfts_delete();
+
+CREATE TRIGGER nft_cache_nfts_truncate AFTER TRUNCATE ON nfts
+    FOR EACH STATEMENT EXECUTE FUNCTION nft_cache_nfts_truncate();
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""Reconcile the nfts table against on-chain state via Multicall3"""
+
+import argparse
+import asyncio
+from app.config import settings
+from app.reconcile import Reconciler
+
+
+async def reconcile(args):
+    reconciler = Reconciler()
+    try:
+        report = await reconciler.run(args.from_token, args.to_token, dry_run=args.dry_run)
+        print(f"✅ Reconciliation finished at block {report['block']}")
+        print(f"   checked:    {report['checked']}")
+        print(f"   mismatched: {report['mismatched']} (repaired {report['repaired']})")
+        print(f"   missing:    {report['missing']} (inserted {report['inserted']})")
+    finally:
+        await reconciler.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--from-token", type=int, default=0, help="first token id (default: 0)")
+    parser.add_argument("--to-token", type=int, help="last token id (default: total minted - 1)")
+    parser.add_argument("--batch-size", type=int, default=settings.RECONCILE_BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="report mismatches without repairing")
+    args = parser.parse_args()
+    settings.RECONCILE_BATCH_SIZE = args.batch_size
+    asyncio.run(reconcile(args))
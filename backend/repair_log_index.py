@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""Fill in log_index for transactions written before V3 and drop the duplicates re-indexing created"""
+
+import argparse
+import asyncio
+from app.database import AsyncSessionLocal
+from app.indexer import BlockchainIndexer
+from app import crud
+
+# 事件名 → transactions.tx_type
+EVENT_TX_TYPES = {
+    'NFTMinted': 'mint',
+    'NFTListed': 'list',
+    'NFTSold': 'buy',
+    'ListingCancelled': 'cancel',
+    'NFTBurned': 'burn',
+}
+
+
+async def repair(args):
+    indexer = BlockchainIndexer()
+    totals = {"fixed": 0, "deduplicated": 0, "unmatched": 0}
+    try:
+        async with AsyncSessionLocal() as db:
+            span = await crud.get_legacy_log_index_span(db)
+        if span is None:
+            print("✅ No transactions with unverified log_index")
+            return
+        
+        from_block, last_block = span
+        print(f"🔧 Repairing log_index for blocks {from_block}-{last_block}")
+        while from_block <= last_block:
+            to_block = min(from_block + indexer.ranges.window - 1, last_block)
+            events = indexer.decode_logs(await indexer.fetch_logs(from_block, to_block))
+            async with AsyncSessionLocal() as db:
+                report = await crud.repair_legacy_log_index(db, from_block, to_block, [
+                    {"tx_hash": event.tx_hash, "tx_type": EVENT_TX_TYPES[event.name], "log_index": event.log_index}
+                    for event in events
+                ])
+            for key, value in report.items():
+                totals[key] += value
+            from_block = to_block + 1
+        
+        print(f"✅ Repair finished: fixed {totals['fixed']}, removed {totals['deduplicated']} duplicates")
+        if totals["unmatched"]:
+            print(f"⚠️  {totals['unmatched']} transactions have no matching on-chain event and still block re-indexing")
+    finally:
+        await indexer.rpc.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    args = parser.parse_args()
+    asyncio.run(repair(args))
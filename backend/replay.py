@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""Rebuild the database from the local raw-log archive without touching the RPC"""
+
+import argparse
+import asyncio
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.archive import ArchiveGapError, LogArchive
+from app.indexer import BlockchainIndexer, replay_archive
+from app import crud
+
+
+async def replay(args):
+    indexer = BlockchainIndexer()
+    archive = LogArchive(args.archive_dir)
+    # 重放时不再写归档
+    indexer.archive = None
+    try:
+        from_block = args.from_block
+        if from_block is None:
+            async with AsyncSessionLocal() as db:
+                state = await crud.get_indexer_state(db)
+            from_block = state.last_indexed_block + 1 if state else None
+
+        try:
+            report = await replay_archive(indexer, archive, from_block, args.to_block)
+        except ArchiveGapError as e:
+            # 检查点停在最后一个连续重放的区块
+            print(f"❌ {e}; replay stopped at block {indexer.last_indexed_block}")
+            raise SystemExit(1)
+        print(f"✅ Replay finished: {report}")
+    finally:
+        await indexer.rpc.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--archive-dir", default=settings.ARCHIVE_DIR or None, help="archive directory (default: ARCHIVE_DIR)")
+    parser.add_argument("--from-block", type=int, help="first block (default: checkpoint + 1)")
+    parser.add_argument("--to-block", type=int, help="last block (default: end of archive)")
+    args = parser.parse_args()
+    if not args.archive_dir:
+        parser.error("--archive-dir is required when ARCHIVE_DIR is not set")
+    asyncio.run(replay(args))
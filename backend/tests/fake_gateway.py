@@ -0,0 +1,66 @@
+import asyncio
+from typing import Dict, List, Optional
+
+
+class FakeGateway:
+    """本地IPFS HTTP网关替身：GET /ipfs/<key> 返回files中的内容
+
+    status不为200时所有请求都返回该状态码；delay是每个请求的响应延迟。
+    """
+
+    def __init__(self, files: Dict[str, bytes] = None, delay: float = 0.0, status: int = 200):
+        self.files = files if files is not None else {}
+        self.delay = delay
+        self.status = status
+        self.requests: List[str] = []
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers = set()
+
+    @property
+    def url(self) -> str:
+        """网关前缀，与IPFS_GATEWAYS的格式相同"""
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}/ipfs/"
+
+    def respond(self, path: str) -> tuple:
+        key = path[len("/ipfs/"):]
+        if self.status != 200:
+            return self.status, b"gateway error"
+        if key not in self.files:
+            return 404, b"not found"
+        return 200, self.files[key]
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._writers.add(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                path = request_line.decode().split()[1]
+                self.requests.append(path)
+
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                status, body = self.respond(path)
+                writer.write(
+                    f"HTTP/1.1 {status} X\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def start(self) -> "FakeGateway":
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def stop(self):
+        self._server.close()
+        for writer in list(self._writers):
+            writer.close()
+        await self._server.wait_closed()
@@ -0,0 +1,166 @@
+import asyncio
+import json
+from typing import Callable, Dict, List, Optional
+import websockets
+
+
+def block_hash(number: int) -> str:
+    return "0x" + f"{number:064x}"
+
+
+def block_json(number: int, timestamp: int = None) -> dict:
+    return {
+        "number": hex(number),
+        "hash": block_hash(number),
+        "parentHash": block_hash(number - 1),
+        "timestamp": hex(timestamp if timestamp is not None else 1700000000 + number * 2),
+    }
+
+
+class FakeRPCError(Exception):
+    """处理函数抛出时返回JSON-RPC error对象（如eth_call revert）"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class FakeRPCServer:
+    """本地JSON-RPC节点替身（HTTP/1.1 keep-alive，支持批量请求）
+
+    delay是每个请求的响应延迟；errors可以注入某个方法的错误（返回JSON-RPC error对象）。
+    """
+
+    def __init__(self, head: int = 1000, delay: float = 0.0):
+        self.head = head
+        self.delay = delay
+        self.logs: List[dict] = []
+        self.errors: Dict[str, dict] = {}
+        self.requests: List[str] = []
+        self.handlers: Dict[str, Callable[[list], object]] = {
+            "eth_chainId": lambda params: "0x7a69",
+            "eth_blockNumber": lambda params: hex(self.head),
+            "eth_getBlockByNumber": lambda params: block_json(int(params[0], 16)),
+            "eth_getLogs": self.get_logs,
+        }
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers = set()
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def get_logs(self, params: list) -> list:
+        from_block, to_block = int(params[0]["fromBlock"], 16), int(params[0]["toBlock"], 16)
+        return [log for log in self.logs if from_block <= int(log["blockNumber"], 16) <= to_block]
+
+    def handle_call(self, call: dict) -> dict:
+        method = call["method"]
+        self.requests.append(method)
+        if method in self.errors:
+            return {"jsonrpc": "2.0", "id": call["id"], "error": self.errors[method]}
+        try:
+            result = self.handlers[method](call.get("params") or [])
+        except FakeRPCError as e:
+            return {"jsonrpc": "2.0", "id": call["id"], "error": {"code": e.code, "message": e.message}}
+        return {"jsonrpc": "2.0", "id": call["id"], "result": result}
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._writers.add(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                length = 0
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode().partition(":")
+                    if name.strip().lower() == "content-length":
+                        length = int(value.strip())
+                payload = json.loads(await reader.readexactly(length))
+
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                if isinstance(payload, list):
+                    # handle_call返回None表示响应中丢掉这一项
+                    response = [item for item in map(self.handle_call, payload) if item is not None]
+                else:
+                    response = self.handle_call(payload)
+
+                body = json.dumps(response).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(body)}\r\n\r\n".encode()
+                    + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def start(self) -> "FakeRPCServer":
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def stop(self):
+        self._server.close()
+        for writer in list(self._writers):
+            writer.close()
+        await self._server.wait_closed()
+
+
+class FakeHeadServer:
+    """本地WebSocket节点替身：响应eth_subscribe("newHeads")，push_head向所有订阅者推送新区块头"""
+
+    SUBSCRIPTION_ID = "0x1"
+
+    def __init__(self):
+        self.connections = set()
+        self.subscribed = asyncio.Event()
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        host, port = next(iter(self._server.sockets)).getsockname()[:2]
+        return f"ws://{host}:{port}"
+
+    async def _handle(self, ws, path=None):
+        try:
+            async for message in ws:
+                request = json.loads(message)
+                if request.get("method") == "eth_subscribe":
+                    await ws.send(json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": self.SUBSCRIPTION_ID}))
+                    self.connections.add(ws)
+                    self.subscribed.set()
+        finally:
+            self.connections.discard(ws)
+
+    async def push_head(self, number: int, timestamp: int = None):
+        message = json.dumps({
+            "jsonrpc": "2.0",
+            "method": "eth_subscription",
+            "params": {"subscription": self.SUBSCRIPTION_ID, "result": block_json(number, timestamp)},
+        })
+        for ws in list(self.connections):
+            await ws.send(message)
+
+    async def drop_connections(self):
+        """模拟订阅断开"""
+        self.subscribed.clear()
+        for ws in list(self.connections):
+            await ws.close()
+
+    async def start(self) -> "FakeHeadServer":
+        self._server = await websockets.serve(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
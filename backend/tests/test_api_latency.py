@@ -0,0 +1,84 @@
+"""索引慢RPC期间API的延迟应与空闲时接近（索引器的RPC调用不能阻塞事件循环）"""
+
+import asyncio
+import time
+import httpx
+from app.config import settings
+from tests.fake_rpc import FakeRPCServer
+
+RPC_DELAY = 0.2
+REQUESTS = 200
+APPLIED_RANGES = 5
+
+
+def p99(samples: list) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+
+async def measure(client: httpx.AsyncClient, until=lambda: True) -> list:
+    """至少发REQUESTS个请求，并持续到until()为真"""
+    latencies = []
+    while len(latencies) < REQUESTS or not until():
+        started = time.perf_counter()
+        response = await client.get("/api/nfts/stats/summary")
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200
+    return latencies
+
+
+async def fake_stats(db):
+    return {"total_nfts": 1, "total_listed": 0, "total_sold": 0, "total_volume": "0", "floor_price": None}
+
+
+async def run_latency_check(monkeypatch):
+    rpc = await FakeRPCServer(head=1_000_000, delay=RPC_DELAY).start()
+    monkeypatch.setattr(settings, "RPC_URL", rpc.url)
+    monkeypatch.setattr(settings, "RPC_URLS", "")
+
+    from app.main import app
+    from app.indexer import BlockchainIndexer
+    from app.pipeline import IndexPipeline
+    from app import crud
+
+    # API不访问数据库；索引器的区块头直接走RPC，写库替换为只推进进度
+    monkeypatch.setattr(crud, "get_stats", fake_stats)
+    indexer = BlockchainIndexer()
+    indexer.latest_block = rpc.head
+
+    async def fetch_range_headers(from_block, to_block, events):
+        return await indexer.blocks.fetch_headers({from_block, to_block} | {event.block_number for event in events})
+
+    async def apply_range(from_block, to_block, events, headers, logs=None):
+        indexer.last_indexed_block = to_block
+
+    indexer.fetch_range_headers = fetch_range_headers
+    indexer.apply_range = apply_range
+
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            idle = await measure(client)
+
+            pipeline_task = asyncio.create_task(IndexPipeline(indexer).run(0))
+            while "eth_getLogs" not in rpc.requests:
+                await asyncio.sleep(0.01)
+            # 覆盖多个完整的 获取日志→区块头→写库 周期
+            target = APPLIED_RANGES * settings.INITIAL_BLOCK_RANGE
+            busy = await measure(client, until=lambda: (indexer.last_indexed_block or 0) >= target)
+            pipeline_task.cancel()
+            await asyncio.gather(pipeline_task, return_exceptions=True)
+    finally:
+        await indexer.rpc.close()
+        await rpc.stop()
+
+    return idle, busy, indexer
+
+
+def test_api_p99_during_indexing_matches_idle(monkeypatch):
+    idle, busy, indexer = asyncio.run(run_latency_check(monkeypatch))
+
+    # 测量期间索引器确实在处理慢RPC
+    assert indexer.last_indexed_block and indexer.last_indexed_block > 0
+    # 阻塞式RPC会让请求等待整个RPC_DELAY；非阻塞时p99只受调度抖动影响
+    assert p99(busy) < p99(idle) + RPC_DELAY / 4, (p99(idle), p99(busy))
@@ -0,0 +1,57 @@
+"""归档重放：缺口或损坏的段不能让检查点越过未重放的区块"""
+
+import pytest
+from app.archive import ArchiveGapError, LogArchive
+from app.blocks import BlockHeader
+from tests.fake_rpc import block_hash
+
+
+def header(number: int) -> BlockHeader:
+    return BlockHeader(number, block_hash(number), block_hash(number - 1), 1700000000 + number * 2)
+
+
+def write_segment(archive: LogArchive, from_block: int, to_block: int, numbers=None):
+    numbers = numbers if numbers is not None else [from_block, to_block]
+    archive._write(from_block, to_block, [], {number: header(number) for number in numbers})
+
+
+def test_contiguous_segments(tmp_path):
+    archive = LogArchive(str(tmp_path))
+    write_segment(archive, 1, 10)
+    write_segment(archive, 11, 20)
+    assert [(start, end) for start, end, _, _ in archive.iter_ranges(1)] == [(1, 10), (11, 20)]
+
+
+def test_gap_stops_replay(tmp_path):
+    archive = LogArchive(str(tmp_path))
+    write_segment(archive, 1, 10)
+    write_segment(archive, 21, 30)
+    ranges = archive.iter_ranges(1)
+    assert next(ranges)[:2] == (1, 10)
+    with pytest.raises(ArchiveGapError, match="11 to 20"):
+        next(ranges)
+
+
+def test_missing_start_of_archive(tmp_path):
+    archive = LogArchive(str(tmp_path))
+    write_segment(archive, 11, 20)
+    with pytest.raises(ArchiveGapError):
+        list(archive.iter_ranges(1))
+
+
+def test_segment_without_split_header(tmp_path):
+    archive = LogArchive(str(tmp_path))
+    write_segment(archive, 1, 10)
+    # 与上一段重叠，但没有区块11的区块头，无法从中截取11-20
+    write_segment(archive, 5, 20, numbers=[5, 20])
+    ranges = archive.iter_ranges(1)
+    assert next(ranges)[:2] == (1, 10)
+    with pytest.raises(ArchiveGapError, match="11-20"):
+        next(ranges)
+
+
+def test_corrupted_segment_missing_end_header(tmp_path):
+    archive = LogArchive(str(tmp_path))
+    write_segment(archive, 1, 10, numbers=[1])
+    with pytest.raises(ArchiveGapError):
+        list(archive.iter_ranges(1))
@@ -0,0 +1,28 @@
+"""无效游标在执行任何查询之前就被拒绝"""
+
+import asyncio
+import pytest
+from app import crud
+from app.pagination import InvalidCursor, encode_cursor
+
+
+class NoQuerySession:
+    """执行任何查询都视为失败"""
+
+    async def execute(self, *args, **kwargs):
+        raise AssertionError("query executed before the cursor was validated")
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"search": "sun", "sort_by": "relevance", "cursor": encode_cursor("relevance:desc", 1, 1)},
+    {"sort_by": "price", "sort_order": "desc", "cursor": "not-a-cursor"},
+    {"sort_by": "price", "sort_order": "desc", "cursor": encode_cursor("created_at:desc", None, 1)},
+])
+def test_invalid_nft_cursor_runs_no_queries(kwargs):
+    with pytest.raises(InvalidCursor):
+        asyncio.run(crud.get_nfts(NoQuerySession(), include_total=True, **kwargs))
+
+
+def test_invalid_transaction_cursor_runs_no_queries():
+    with pytest.raises(InvalidCursor):
+        asyncio.run(crud.get_transactions(NoQuerySession(), cursor="not-a-cursor"))
@@ -0,0 +1,108 @@
+"""元数据获取：本地缓存、网关熔断与恢复、网关回退顺序"""
+
+import asyncio
+import json
+import time
+import httpx
+import pytest
+from app.config import settings
+from app.enrichment import GatewayUnavailable, MetadataEnricher
+from app.metadata_cache import MetadataCache
+from tests.fake_gateway import FakeGateway
+
+METADATA = {"name": "Sunset", "description": "", "image": "ipfs://image"}
+
+
+def files(*keys):
+    return {key: json.dumps({**METADATA, "name": key}).encode() for key in keys}
+
+
+async def with_enricher(tmp_path, gateways, run):
+    servers = [await gateway.start() for gateway in gateways]
+    enricher = MetadataEnricher(
+        gateways=[server.url for server in servers],
+        cache=MetadataCache(str(tmp_path)),
+    )
+    try:
+        return await run(enricher)
+    finally:
+        await enricher.close()
+        for server in servers:
+            await server.stop()
+
+
+def test_cache_miss_then_hit(tmp_path):
+    gateway = FakeGateway(files("cid1"))
+
+    async def run(enricher):
+        first = await enricher.fetch_metadata("ipfs://cid1")
+        # 网关地址形式的同一内容也命中缓存
+        second = await enricher.fetch_metadata("https://ipfs.io/ipfs/cid1")
+        return first, second, enricher.cache.stats()
+
+    first, second, stats = asyncio.run(with_enricher(tmp_path, [gateway], run))
+    assert first == second and first["name"] == "cid1"
+    assert gateway.requests == ["/ipfs/cid1"]
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+
+def test_fallback_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "GATEWAY_RACE_DELAY", 0.1)
+    broken = FakeGateway(status=502)
+    slow = FakeGateway(files("cid1", "cid2"), delay=1.0)
+    healthy = FakeGateway(files("cid1", "cid2"))
+
+    async def run(enricher):
+        started = time.perf_counter()
+        metadata = await enricher.fetch_metadata("ipfs://cid1")
+        return metadata, time.perf_counter() - started
+
+    # 首个网关失败后立即尝试下一个
+    metadata, _ = asyncio.run(with_enricher(tmp_path / "a", [broken, healthy], run))
+    assert metadata["name"] == "cid1"
+    assert broken.requests == ["/ipfs/cid1"] and healthy.requests == ["/ipfs/cid1"]
+
+    # 首个网关慢：错开GATEWAY_RACE_DELAY后启动下一个，不等慢网关返回
+    metadata, elapsed = asyncio.run(with_enricher(tmp_path / "b", [slow, healthy], run))
+    assert metadata["name"] == "cid1"
+    assert slow.requests == ["/ipfs/cid1"]
+    assert 0.1 <= elapsed < 0.8
+
+
+def test_circuit_breaker_opens_and_recovers(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "GATEWAY_FAILURE_THRESHOLD", 2)
+    monkeypatch.setattr(settings, "GATEWAY_COOLDOWN", 1)
+    gateway = FakeGateway(files("cid1", "cid2", "cid3"), status=503)
+
+    async def run(enricher):
+        for key in ("cid1", "cid2"):
+            with pytest.raises(httpx.HTTPStatusError):
+                await enricher.fetch_metadata(f"ipfs://{key}")
+        # 熔断期间不再请求网关
+        with pytest.raises(GatewayUnavailable):
+            await enricher.fetch_metadata("ipfs://cid3")
+        requests_while_open = len(gateway.requests)
+
+        gateway.status = 200
+        await asyncio.sleep(1.1)
+        metadata = await enricher.fetch_metadata("ipfs://cid3")
+        return requests_while_open, metadata, enricher.failures
+
+    requests_while_open, metadata, failures = asyncio.run(with_enricher(tmp_path, [gateway], run))
+    assert requests_while_open == 2
+    assert metadata["name"] == "cid3"
+    assert failures == 2
+
+
+def test_cache_write_failure_keeps_result(tmp_path, monkeypatch):
+    gateway = FakeGateway(files("cid1"))
+
+    async def run(enricher):
+        async def put(key, content):
+            raise OSError(28, "No space left on device")
+
+        monkeypatch.setattr(enricher.cache, "put", put)
+        return await enricher.fetch_metadata("ipfs://cid1"), enricher.failures
+
+    metadata, failures = asyncio.run(with_enricher(tmp_path, [gateway], run))
+    assert metadata["name"] == "cid1" and failures == 0
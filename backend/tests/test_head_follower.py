@@ -0,0 +1,96 @@
+"""newHeads订阅：推送及时唤醒索引器，未确认区块直接使用推送的区块头，断开后退回轮询"""
+
+import asyncio
+import time
+from app.config import settings
+from tests.fake_rpc import FakeHeadServer, FakeRPCServer, block_json
+
+HEAD = 100
+
+
+async def wait_until(predicate, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+async def run_head_follower(monkeypatch):
+    rpc = await FakeRPCServer(head=HEAD).start()
+    ws = await FakeHeadServer().start()
+    monkeypatch.setattr(settings, "RPC_URL", rpc.url)
+    monkeypatch.setattr(settings, "RPC_URLS", "")
+    monkeypatch.setattr(settings, "WS_RPC_URL", ws.url)
+
+    from app.indexer import BlockchainIndexer
+    from app import crud
+
+    saved = []
+
+    async def save_blocks(db, rows):
+        saved.extend(row["number"] for row in rows)
+
+    monkeypatch.setattr(crud, "save_blocks", save_blocks)
+    indexer = BlockchainIndexer()
+    heads_task = asyncio.create_task(indexer.heads.run())
+    result = {}
+    try:
+        await asyncio.wait_for(ws.subscribed.wait(), timeout=5)
+        await wait_until(lambda: indexer.heads.connected)
+
+        # 推送到回调的延迟
+        for number in range(HEAD + 1, HEAD + 4):
+            started = time.perf_counter()
+            await ws.push_head(number)
+            await asyncio.wait_for(indexer.new_head.wait(), timeout=1)
+            result.setdefault("latencies", []).append(time.perf_counter() - started)
+            indexer.new_head.clear()
+        result["latest_block"] = indexer.latest_block
+        result["subscribed_latest"] = await indexer.get_latest_block()
+
+        # 未确认区块：哈希连续的推送区块头不再请求RPC，推送缺失的仍从RPC获取
+        rpc.requests.clear()
+        headers = await indexer.blocks.get_headers(None, [HEAD, HEAD + 1, HEAD + 3], fresh_after=HEAD - 10)
+        result["headers"] = headers
+        result["rpc_header_requests"] = rpc.requests.count("eth_getBlockByNumber")
+        result["saved"] = sorted(saved)
+
+        # 断开后hash不连续的推送不可信
+        await ws.push_head(HEAD + 5)
+        await asyncio.wait_for(indexer.new_head.wait(), timeout=1)
+        rpc.requests.clear()
+        await indexer.blocks.get_headers(None, [HEAD + 3, HEAD + 5], fresh_after=HEAD - 10)
+        result["rpc_after_gap"] = rpc.requests.count("eth_getBlockByNumber")
+
+        # 订阅断开：退回RPC查询最新区块，之后自动重连
+        await ws.drop_connections()
+        await wait_until(lambda: not indexer.heads.connected)
+        result["fallback_latest"] = await indexer.get_latest_block()
+        await asyncio.wait_for(ws.subscribed.wait(), timeout=5)
+        await wait_until(lambda: indexer.heads.connected)
+        result["reconnects"] = indexer.heads.reconnects
+    finally:
+        heads_task.cancel()
+        await asyncio.gather(heads_task, return_exceptions=True)
+        await indexer.rpc.close()
+        await ws.stop()
+        await rpc.stop()
+    return result
+
+
+def test_head_subscription(monkeypatch):
+    result = asyncio.run(run_head_follower(monkeypatch))
+
+    assert max(result["latencies"]) < 0.5, result["latencies"]
+    assert result["latest_block"] == HEAD + 3
+    assert result["subscribed_latest"] == HEAD + 3
+
+    # HEAD没有推送，从RPC取；HEAD+1和HEAD+3来自推送
+    assert result["rpc_header_requests"] == 1
+    assert result["headers"][HEAD + 3].hash == block_json(HEAD + 3)["hash"]
+    assert result["saved"] == [HEAD, HEAD + 1, HEAD + 3]
+    # HEAD+4缺失，HEAD+3与HEAD+5不连续，只有最新的HEAD+5可用
+    assert result["rpc_after_gap"] == 1
+
+    assert result["fallback_latest"] == HEAD
+    assert result["reconnects"] >= 1
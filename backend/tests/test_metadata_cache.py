@@ -0,0 +1,29 @@
+"""元数据磁盘缓存：容量统计与淘汰"""
+
+import asyncio
+from app.metadata_cache import MetadataCache
+
+
+async def overwrite_same_key(cache: MetadataCache):
+    await cache.put("cid", b"x" * 100)
+    for _ in range(5):
+        await cache.put("cid", b"y" * 100)
+    await cache.put("other", b"z" * 50)
+    return await cache.get("cid"), await cache.get("other")
+
+
+def test_overwrite_does_not_inflate_size(tmp_path):
+    cache = MetadataCache(str(tmp_path), max_bytes=10_000)
+    cid, other = asyncio.run(overwrite_same_key(cache))
+
+    assert cache.stats()["size_bytes"] == 150
+    assert cid == b"y" * 100 and other == b"z" * 50
+
+
+def test_overwrite_does_not_evict_early(tmp_path):
+    cache = MetadataCache(str(tmp_path), max_bytes=400)
+    cid, other = asyncio.run(overwrite_same_key(cache))
+
+    # 实际只占150字节，不应淘汰任何文件
+    assert cid is not None and other is not None
+    assert cache.stats()["size_bytes"] == 150
@@ -0,0 +1,26 @@
+"""getLogs错误分类：范围过大应拆分，限流应退避"""
+
+import httpx
+from app.ranges import is_range_error
+from app.rpc import RPCError, is_endpoint_failure
+
+
+def test_range_errors_split():
+    assert is_range_error(RPCError(-32602, "block range too large"))
+    assert is_range_error(RPCError(-32000, "response size exceeded"))
+    assert is_range_error(httpx.ReadTimeout("timed out"))
+
+
+def test_rate_limits_are_not_range_errors():
+    for exc in (RPCError(429, "Too Many Requests"), RPCError(-32000, "rate limit exceeded")):
+        assert is_endpoint_failure(exc)
+        assert not is_range_error(exc)
+
+
+def test_result_limit_with_rate_limit_code_is_range_error():
+    # 部分节点对结果过多也返回-32005
+    exc = RPCError(-32005, "query returned more than 10000 results")
+    assert not is_endpoint_failure(exc)
+    assert is_range_error(exc)
+    assert is_endpoint_failure(RPCError(-32005, "project ID request rate exceeded"))
+    assert is_endpoint_failure(RPCError(-32005, "daily request count exceeded, request rate limited"))
@@ -0,0 +1,149 @@
+"""链上状态对账：没有Multicall3时退回批量eth_call，检测并修复与链上不一致的行"""
+
+import asyncio
+from types import SimpleNamespace
+from app.config import settings
+from app.rpc import RPCPool
+from tests.fake_rpc import FakeRPCError, FakeRPCServer
+
+BLOCK = 500
+CREATOR = "0x" + "11" * 20
+ALICE = "0x" + "22" * 20
+BOB = "0x" + "33" * 20
+NOBODY = "0x" + "00" * 20
+
+# 链上状态：token 2已销毁（调用revert），token 3尚未入库
+CHAIN = {
+    0: {"owner": ALICE, "token_uri": "ipfs://cid0", "listing": (0, NOBODY, False)},
+    1: {"owner": BOB, "token_uri": "ipfs://cid1-v2", "listing": (0, NOBODY, False)},
+    3: {"owner": ALICE, "token_uri": "ipfs://cid3", "listing": (10**18, ALICE, True)},
+}
+
+
+def nft_row(token_id: int, **overrides) -> SimpleNamespace:
+    row = {
+        "token_id": token_id,
+        "owner": ALICE,
+        "creator": CREATOR,
+        "royalty_percent": 5,
+        "category": "art",
+        "token_uri": f"ipfs://cid{token_id}",
+        "is_listed": False,
+        "price": None,
+        "seller": None,
+        "is_burned": False,
+    }
+    row.update(overrides)
+    return SimpleNamespace(**row)
+
+
+# 数据库：token 1的拥有者和URI漂移，token 2没记录到销毁
+DB_ROWS = [nft_row(0), nft_row(1), nft_row(2)]
+
+
+class FakeChain:
+    """按calldata的函数选择器和tokenId返回ABI编码的合约状态"""
+
+    def __init__(self, reconciler):
+        self.reconciler = reconciler
+        contract = reconciler.contract
+        self.selectors = {
+            contract.encodeABI(fn_name=name, args=[0])[:10]: name
+            for name in ("ownerOf", "getNFTInfo", "getListing")
+        }
+        self.requested_blocks = set()
+
+    def eth_call(self, params):
+        call, block = params
+        self.requested_blocks.add(int(block, 16))
+        data = call["data"]
+        name = self.selectors[data[:10]]
+        token_id = int(data[10:], 16)
+        state = CHAIN.get(token_id)
+        if state is None:
+            raise FakeRPCError(3, "execution reverted: token does not exist")
+        values = {
+            "ownerOf": [state["owner"]],
+            "getNFTInfo": [CREATOR, 5, "art", state["owner"], state["token_uri"]],
+            "getListing": list(state["listing"]),
+        }[name]
+        encoded = self.reconciler.w3.codec.encode(self.reconciler.output_types[name], values)
+        return "0x" + encoded.hex()
+
+
+class FakeSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+async def run_reconcile(monkeypatch, dry_run: bool):
+    rpc = await FakeRPCServer(head=BLOCK).start()
+    monkeypatch.setattr(settings, "RPC_URL", rpc.url)
+    monkeypatch.setattr(settings, "RPC_URLS", "")
+
+    from app import crud, reconcile
+
+    repaired = []
+
+    async def get_nfts_by_token_ids(db, token_ids):
+        return [row for row in DB_ROWS if row.token_id in token_ids]
+
+    async def repair_nfts(db, repairs, missing, block):
+        repaired.append((repairs, missing, block))
+
+    monkeypatch.setattr(reconcile, "AsyncSessionLocal", FakeSession)
+    monkeypatch.setattr(crud, "get_nfts_by_token_ids", get_nfts_by_token_ids)
+    monkeypatch.setattr(crud, "repair_nfts", repair_nfts)
+
+    reconciler = reconcile.Reconciler(RPCPool([rpc.url]))
+    chain = FakeChain(reconciler)
+    rpc.handlers["eth_getCode"] = lambda params: "0x"
+    rpc.handlers["eth_call"] = chain.eth_call
+    try:
+        report = await reconciler.reconcile_tokens([0, 1, 2, 3], BLOCK, dry_run=dry_run)
+    finally:
+        await reconciler.close()
+        await rpc.stop()
+    return reconciler, report, repaired, chain, rpc.requests
+
+
+def test_detects_and_repairs_drift(monkeypatch):
+    reconciler, report, repaired, chain, requests = asyncio.run(run_reconcile(monkeypatch, dry_run=False))
+
+    # Multicall3未部署：退回逐个eth_call（由客户端合并成批量请求）
+    assert reconciler.multicall_available is False
+    assert requests.count("eth_call") == 4 * 3
+    assert chain.requested_blocks == {BLOCK}
+
+    assert report["checked"] == 4
+    assert report["mismatched"] == 2 and report["repaired"] == 2
+    assert report["missing"] == 1 and report["inserted"] == 1
+
+    (repairs, missing, block), = repaired
+    assert block == BLOCK
+    assert repairs[1] == {"owner": BOB, "token_uri": "ipfs://cid1-v2"}
+    assert repairs[2] == {"is_burned": True, "is_listed": False, "price": None, "seller": None}
+    assert 0 not in repairs
+    assert missing == [{
+        "token_id": 3,
+        "owner": ALICE,
+        "creator": CREATOR,
+        "royalty_percent": 5,
+        "category": "art",
+        "token_uri": "ipfs://cid3",
+        "is_listed": True,
+        "price": str(10**18),
+        "seller": ALICE,
+        "is_burned": False,
+    }]
+
+
+def test_dry_run_reports_without_repairing(monkeypatch):
+    _, report, repaired, _, _ = asyncio.run(run_reconcile(monkeypatch, dry_run=True))
+
+    assert report["mismatched"] == 2 and report["missing"] == 1
+    assert report["repaired"] == 0 and report["inserted"] == 0
+    assert repaired == []
@@ -0,0 +1,23 @@
+"""批量请求：响应缺少某一项时应抛出RPCError，而不是当作null结果"""
+
+import asyncio
+import pytest
+from app.rpc import RPCClient, RPCError
+from tests.fake_rpc import FakeRPCServer
+
+
+async def batch_with_dropped_item():
+    server = await FakeRPCServer(head=1234).start()
+    handle_call = server.handle_call
+    server.handle_call = lambda call: None if call["method"] == "eth_blockNumber" else handle_call(call)
+    client = RPCClient(server.url)
+    try:
+        return await client.batch([("eth_chainId", []), ("eth_blockNumber", [])])
+    finally:
+        await client.close()
+        await server.stop()
+
+
+def test_missing_batch_item_raises():
+    with pytest.raises(RPCError, match="missing response"):
+        asyncio.run(batch_with_dropped_item())
@@ -0,0 +1,117 @@
+"""多节点RPC池：对冲、故障切换与隔离、结果过多不切换节点、节点统计"""
+
+import asyncio
+import time
+import pytest
+from app.config import settings
+from app.rpc import RPCError, RPCPool
+from tests.fake_rpc import FakeRPCServer
+
+HEDGE_DELAY = 0.1
+LOG_FILTER = {"fromBlock": 1, "toBlock": 2}
+
+
+async def start_servers(*delays):
+    return [await FakeRPCServer(delay=delay).start() for delay in delays]
+
+
+async def stop(pool, servers):
+    await pool.close()
+    for server in servers:
+        await server.stop()
+
+
+async def run_hedging():
+    servers = slow, fast = await start_servers(1.0, 0.0)
+    pool = RPCPool([slow.url, fast.url], hedge_delay=HEDGE_DELAY)
+    try:
+        elapsed = []
+        for _ in range(3):
+            started = time.perf_counter()
+            assert await pool.get_raw_logs(LOG_FILTER) == []
+            elapsed.append(time.perf_counter() - started)
+        return pool, elapsed, [endpoint.url for endpoint in pool.ranked()]
+    finally:
+        await stop(pool, servers)
+
+
+def test_hedge_to_second_endpoint_and_rank_loser_last():
+    pool, elapsed, ranked = asyncio.run(run_hedging())
+    slow, fast = pool.endpoints
+
+    # 第一次请求对冲到快节点，不用等慢节点
+    assert HEDGE_DELAY <= elapsed[0] < 0.5
+    assert fast.hedges == 1
+    # 被取消的慢节点也记录了延迟，之后的请求直接发给快节点
+    assert slow.latency is not None and slow.latency >= HEDGE_DELAY
+    assert ranked[0] == fast.url
+    assert max(elapsed[1:]) < HEDGE_DELAY
+    assert slow.errors == 0
+
+
+async def run_failover(monkeypatch):
+    monkeypatch.setattr(settings, "RPC_QUARANTINE_THRESHOLD", 3)
+    servers = broken, healthy = await start_servers(0.0, 0.0)
+    broken.errors["eth_blockNumber"] = {"code": 429, "message": "Too Many Requests"}
+    pool = RPCPool([broken.url, healthy.url], hedge_delay=HEDGE_DELAY)
+    try:
+        results = [await pool.block_number() for _ in range(4)]
+        return pool, results, broken.requests.count("eth_blockNumber")
+    finally:
+        await stop(pool, servers)
+
+
+def test_failover_and_quarantine(monkeypatch):
+    pool, results, broken_requests = asyncio.run(run_failover(monkeypatch))
+    broken, healthy = pool.endpoints
+
+    assert results == [1000] * 4
+    # 连续3次失败后隔离，第4次请求不再发给故障节点
+    assert broken_requests == 3
+    assert broken.quarantined
+    assert broken.errors == 3 and broken.consecutive_failures == 3
+    assert healthy.errors == 0 and healthy.requests == 4
+    assert pool.ranked() == [healthy]
+
+
+async def run_result_limit():
+    servers = first, second = await start_servers(0.0, 0.0)
+    first.errors["eth_getLogs"] = {"code": -32005, "message": "query returned more than 10000 results"}
+    pool = RPCPool([first.url, second.url], hedge_delay=HEDGE_DELAY)
+    try:
+        with pytest.raises(RPCError, match="more than 10000"):
+            await pool.get_raw_logs(LOG_FILTER)
+        return pool, second.requests
+    finally:
+        await stop(pool, servers)
+
+
+def test_result_limit_does_not_fail_over():
+    pool, second_requests = asyncio.run(run_result_limit())
+    first = pool.endpoints[0]
+
+    # 健康节点返回的范围错误不切换、不计入错误，由调用方缩小范围
+    assert second_requests == []
+    assert first.errors == 0 and not first.quarantined
+
+
+async def run_stats():
+    servers = await start_servers(0.05, 0.0)
+    pool = RPCPool([server.url for server in servers], hedge_delay=HEDGE_DELAY)
+    try:
+        for _ in range(5):
+            await pool.block_number()
+        return pool.stats()
+    finally:
+        await stop(pool, servers)
+
+
+def test_endpoint_stats():
+    stats = asyncio.run(run_stats())
+
+    assert len(stats) == 2
+    assert sum(endpoint["requests"] for endpoint in stats) == 5
+    used = [endpoint for endpoint in stats if endpoint["requests"]]
+    for endpoint in used:
+        assert endpoint["latency_ms"] is not None and endpoint["error_rate"] == 0
+        assert {"url", "errors", "hedges", "quarantined", "batches_sent"} <= endpoint.keys()
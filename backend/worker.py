@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""Standalone background worker: leader-elected indexer, reconciler and metadata enricher"""
+
+import asyncio
+from app.config import settings
+from app.metrics import serve_metrics
+from app.worker import start_worker
+
+
+async def main():
+    tasks = [start_worker()]
+    if settings.METRICS_PORT:
+        # worker没有API，单独提供/metrics
+        tasks.append(serve_metrics(settings.API_HOST, settings.METRICS_PORT))
+    await asyncio.gather(*tasks)
+
+
+if __name__ == "__main__":
+    print("🚀 Starting NFT Marketplace worker...")
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("👋 Shutting down...")